@@ -1,22 +1,21 @@
 from pymodm import EmbeddedMongoModel, fields
 
 import pyfastocloud_models.constants as constants
+from pyfastocloud_models.utils.id_generator import CounterIdGenerator
 
 
 class Url(EmbeddedMongoModel):
     class Meta:
         allow_inheritance = True
 
-    _next_url_id = 0
+    ID_GENERATOR = CounterIdGenerator('url_id')  # unique across processes
 
     id = fields.IntegerField(default=lambda: Url.generate_id(), required=True)
     uri = fields.CharField(default='test', max_length=constants.MAX_URL_LENGTH, required=True)
 
     @staticmethod
     def generate_id():
-        current_value = Url._next_url_id
-        Url._next_url_id += 1
-        return current_value
+        return Url.ID_GENERATOR.generate()
 
 
 class HttpProxy(EmbeddedMongoModel):
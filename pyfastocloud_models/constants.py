@@ -1,4 +1,5 @@
 from enum import IntEnum
+from types import MappingProxyType
 
 MIN_COUNTRY_LENGTH = 2
 MAX_COUNTRY_LENGTH = 2048
@@ -377,6 +378,40 @@ AVAILABLE_COUNTRIES = [('AF', 'Afghanistan'),
                        ('ZM', 'Zambia'),
                        ('ZW', 'Zimbabwe')]
 
+# read-only lookup tables built once from AVAILABLE_COUNTRIES and AVAILABLE_LOCALES_PAIRS
+COUNTRIES_CODES = frozenset(code for code, _ in AVAILABLE_COUNTRIES)
+COUNTRIES_NAMES_BY_CODE = MappingProxyType(dict(AVAILABLE_COUNTRIES))
+COUNTRIES_CODES_BY_NAME = MappingProxyType({name.casefold(): code for code, name in AVAILABLE_COUNTRIES})
+LOCALES_CODES = frozenset(code for code, _ in AVAILABLE_LOCALES_PAIRS)
+LOCALES_NAMES_BY_CODE = MappingProxyType(dict(AVAILABLE_LOCALES_PAIRS))
+
+
+def is_valid_country_code(code: str) -> bool:
+    return code in COUNTRIES_CODES
+
+
+def get_country_name(code: str, default=None):
+    return COUNTRIES_NAMES_BY_CODE.get(code, default)
+
+
+def get_country_code_by_name(name: str):
+    # case insensitive, surrounding spaces ignored
+    return COUNTRIES_CODES_BY_NAME.get(name.strip().casefold())
+
+
+def validate_country_code(code: str):
+    # pymodm field validator
+    if code not in COUNTRIES_CODES:
+        raise ValueError('unknown country code: {0}'.format(code))
+
+
+def is_valid_locale(code: str) -> bool:
+    return code in LOCALES_CODES
+
+
+def get_locale_name(code: str, default=None):
+    return LOCALES_NAMES_BY_CODE.get(code, default)
+
 
 def round_value(value: float):
     return round(value, PRECISION)
@@ -473,6 +508,22 @@ class StreamType(IntEnum):
         return str(self.value)
 
 
+# stream types classification
+LIVE_STREAM_TYPES = frozenset([StreamType.PROXY, StreamType.RELAY, StreamType.ENCODE, StreamType.TIMESHIFT_PLAYER,
+                               StreamType.COD_RELAY, StreamType.COD_ENCODE, StreamType.EVENT])
+VOD_STREAM_TYPES = frozenset([StreamType.VOD_PROXY, StreamType.VOD_RELAY, StreamType.VOD_ENCODE])
+CATCHUP_STREAM_TYPES = frozenset([StreamType.CATCHUP])
+SUBSCRIBERS_STREAM_TYPES = LIVE_STREAM_TYPES | VOD_STREAM_TYPES | CATCHUP_STREAM_TYPES
+# types which outputs are listed in playlists
+PLAYLIST_OUTPUT_STREAM_TYPES = frozenset([StreamType.PROXY, StreamType.VOD_PROXY, StreamType.RELAY,
+                                          StreamType.VOD_RELAY, StreamType.COD_RELAY, StreamType.ENCODE,
+                                          StreamType.VOD_ENCODE, StreamType.COD_ENCODE, StreamType.TIMESHIFT_PLAYER,
+                                          StreamType.CATCHUP])
+# types which inputs are listed in input playlists
+INPUT_PLAYLIST_STREAM_TYPES = frozenset([StreamType.RELAY, StreamType.ENCODE, StreamType.TIMESHIFT_PLAYER,
+                                         StreamType.VOD_RELAY, StreamType.VOD_ENCODE])
+
+
 class VodType(IntEnum):
     VODS = 0
     SERIES = 1
@@ -0,0 +1,60 @@
+import argparse
+import gzip
+import os
+import resource
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from pyfastocloud_models.epg.xmltv import XMLTV_TIME_FORMAT, iter_xmltv, open_xmltv
+from pyfastocloud_models.utils.benchmark import measure
+
+DEFAULT_PROGRAMMES_COUNT = 1000000
+DEFAULT_CHANNELS_COUNT = 1000
+
+
+def generate_xmltv(path: str, channels_count: int, programmes_count: int):
+    # synthetic gzipped guide
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    per_channel = max(1, programmes_count // channels_count)
+    with gzip.open(path, 'wt', encoding='utf-8') as file:
+        file.write('<?xml version="1.0" encoding="UTF-8"?>\n<tv>\n')
+        for channel in range(channels_count):
+            file.write('<channel id="ch{0}"><display-name>Channel {0}</display-name></channel>\n'.format(channel))
+        for pos in range(programmes_count):
+            begin = start + timedelta(minutes=30 * (pos % per_channel))
+            end = begin + timedelta(minutes=30)
+            file.write('<programme start="{0} +0000" stop="{1} +0000" channel="ch{2}"><title>Programme {3}</title>'
+                       '<desc>Description of programme {3}</desc></programme>\n'.format(
+                           begin.strftime(XMLTV_TIME_FORMAT), end.strftime(XMLTV_TIME_FORMAT),
+                           pos // per_channel, pos))
+        file.write('</tv>\n')
+
+
+def count_programmes(path: str) -> int:
+    count = 0
+    with open_xmltv(path) as fileobj:
+        for kind, _ in iter_xmltv(fileobj):
+            count += kind == 'programme'
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='XMLTV streaming parser benchmark on a synthetic guide.')
+    parser.add_argument('--programmes', type=int, default=DEFAULT_PROGRAMMES_COUNT, help='programmes count')
+    parser.add_argument('--channels', type=int, default=DEFAULT_CHANNELS_COUNT, help='channels count')
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.xml.gz')
+    os.close(fd)
+    try:
+        generate_xmltv(path, args.channels, args.programmes)
+        result = []
+        elapsed = measure(lambda: result.append(count_programmes(path)))
+        print('{0} programmes, {1:.2f}s, {2:.0f} programmes/s, peak rss {3} KB'.format(
+            result[0], elapsed, result[0] / elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,13 @@
+from datetime import datetime
+
+from bson.objectid import ObjectId
 from pymodm import MongoModel, fields
+from pymongo import IndexModel, ASCENDING
 
 import pyfastocloud_models.constants as constants
+from pyfastocloud_models.utils.interval_index import IntervalIndex
+
+PROGRAMMES_INDEX_TTL = 300  # seconds, bounds staleness of programmes imported by other processes
 
 
 class Epg(MongoModel):
@@ -16,3 +23,60 @@ class Epg(MongoModel):
 
     uri = fields.CharField(default='http://0.0.0.0/epg.xml', max_length=constants.MAX_URL_LENGTH, required=True)
     extension = fields.CharField(max_length=5, required=False)
+
+    def import_programmes(self, source=None, **kwargs) -> dict:
+        # streaming XMLTV import from source (path, url or file object), uri by default
+        from pyfastocloud_models.epg.xmltv import import_epg
+        return import_epg(self, source, **kwargs)
+
+    def find_programmes(self, channel: str, start: datetime, stop: datetime):
+        # programmes of the channel (tvg_id) overlapping [start, stop)
+        return Programme.objects.raw({'epg': self.pk, 'channel': channel, 'start': {'$lt': stop},
+                                      'stop': {'$gt': start}}).order_by([('start', ASCENDING)])
+
+
+class Programme(MongoModel):
+    class Meta:
+        collection_name = 'programmes'
+        final = True  # bulk written as raw documents, without _cls
+        indexes = [IndexModel([('epg', ASCENDING), ('channel', ASCENDING), ('start', ASCENDING)])]
+
+    epg = fields.ReferenceField(Epg, on_delete=fields.ReferenceField.CASCADE)
+    channel = fields.CharField(required=True)  # XMLTV channel id, matched with IStream.tvg_id
+    start = fields.DateTimeField(required=True)  # UTC
+    stop = fields.DateTimeField(required=True)  # UTC
+    title = fields.CharField(blank=True)
+    description = fields.CharField(blank=True)
+    category = fields.CharField(blank=True)
+
+    def get_id(self) -> str:
+        return str(self.pk)
+
+    @property
+    def id(self):
+        return self.pk
+
+
+def _load_channel_programmes(key):
+    epg, channel = key
+    cursor = Programme._mongometa.collection.find({'epg': epg, 'channel': channel}).sort('start', ASCENDING)
+    return [(doc['start'], doc['stop'], doc['_id'], Programme.from_document(doc)) for doc in cursor]
+
+
+# (epg id, channel) -> programmes, loaded on first query of the channel
+PROGRAMMES_INDEX = IntervalIndex(_load_channel_programmes, PROGRAMMES_INDEX_TTL)
+
+
+def get_current_programme(epg: ObjectId, channel: str, moment=None):
+    # programme of the epg on the channel at moment (UTC, now by default) or None
+    programmes = PROGRAMMES_INDEX.at((epg, channel), moment or datetime.utcnow())
+    return programmes[-1] if programmes else None
+
+
+def get_next_programmes(epg: ObjectId, channel: str, moment=None, count=1) -> [Programme]:
+    return PROGRAMMES_INDEX.next((epg, channel), moment or datetime.utcnow(), count)
+
+
+def get_programmes(epg: ObjectId, channel: str, start: datetime, stop: datetime) -> [Programme]:
+    # programmes of the epg on the channel overlapping [start, stop), ordered by start
+    return PROGRAMMES_INDEX.overlapping((epg, channel), start, stop)
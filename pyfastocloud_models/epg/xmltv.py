@@ -0,0 +1,152 @@
+import gzip
+import io
+import lzma
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from xml.etree.ElementTree import iterparse
+
+import requests
+from bson.objectid import ObjectId
+
+from pyfastocloud_models.epg.entry import Epg, Programme, PROGRAMMES_INDEX
+from pyfastocloud_models.stream.entry import IStream
+
+IMPORT_CHUNK_SIZE = 5000
+DOWNLOAD_TIMEOUT = 30
+XMLTV_TIME_FORMAT = '%Y%m%d%H%M%S'  # followed by an optional ' +HHMM' zone
+
+GZIP_MAGIC = b'\x1f\x8b'
+XZ_MAGIC = b'\xfd7zXZ\x00'
+
+
+def open_stream(fileobj):
+    # binary file object, decompressed on the fly if gzip or xz
+    buffered = fileobj if isinstance(fileobj, io.BufferedReader) else io.BufferedReader(fileobj)
+    magic = buffered.peek(len(XZ_MAGIC))[:len(XZ_MAGIC)]
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.GzipFile(fileobj=buffered)
+    if magic.startswith(XZ_MAGIC):
+        return lzma.LZMAFile(buffered)
+    return buffered
+
+
+@contextmanager
+def open_xmltv(source):
+    # source: file path, http(s) url or binary file object (not closed)
+    if not isinstance(source, str):
+        yield open_stream(source)
+        return
+
+    if source.startswith('http://') or source.startswith('https://'):
+        response = requests.get(source, stream=True, timeout=DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+        response.raw.decode_content = True  # transfer encoding, the file compression is detected by magic
+        raw = response
+        stream = open_stream(response.raw)
+    else:
+        raw = open(source, 'rb')
+        stream = open_stream(raw)
+
+    try:
+        yield stream
+    finally:
+        stream.close()
+        raw.close()
+
+
+def parse_xmltv_time(value: str):
+    # '20200101120000 +0100' -> naive UTC datetime, None if malformed
+    try:
+        digits, _, zone = value.partition(' ')
+        date = datetime(int(digits[0:4]), int(digits[4:6]), int(digits[6:8]), int(digits[8:10] or 0),
+                        int(digits[10:12] or 0), int(digits[12:14] or 0))
+    except (AttributeError, ValueError):
+        return None
+
+    zone = zone.strip()
+    if len(zone) == 5 and zone[0] in '+-' and zone[1:].isdigit():
+        offset = timedelta(hours=int(zone[1:3]), minutes=int(zone[3:5]))
+        date = date - offset if zone[0] == '+' else date + offset
+    return date
+
+
+def iter_xmltv(fileobj):
+    # yields ('channel', {'id', 'display_name', 'icon'}) and ('programme', {'channel', 'start', 'stop', 'title',
+    # 'description', 'category'}), parsed elements are cleared so memory does not grow with the file
+    context = iterparse(fileobj, events=('start', 'end'))
+    _, root = next(context)
+    for event, element in context:
+        if event != 'end':
+            continue
+
+        if element.tag == 'programme':
+            yield 'programme', {'channel': element.get('channel'), 'start': parse_xmltv_time(element.get('start')),
+                                'stop': parse_xmltv_time(element.get('stop')), 'title': element.findtext('title', ''),
+                                'description': element.findtext('desc', ''),
+                                'category': element.findtext('category', '')}
+            root.clear()
+        elif element.tag == 'channel':
+            icon = element.find('icon')
+            yield 'channel', {'id': element.get('id'), 'display_name': element.findtext('display-name', ''),
+                              'icon': icon.get('src') if icon is not None else None}
+            root.clear()
+
+
+def get_streams_tvg_ids() -> set:
+    return set(IStream._mongometa.collection.distinct('tvg_id'))
+
+
+def import_epg(epg: Epg, source=None, chunk_size=IMPORT_CHUNK_SIZE, channels=None) -> dict:
+    # programmes of channels (tvg_id set, streams tvg_id by default) replace the previous ones of this epg
+    # they are bulk written in chunks, the previous programmes are removed once the import succeeded
+    # a missing stop is the start of the next programme of the channel, the last one without stop is skipped
+    if channels is None:
+        channels = get_streams_tvg_ids()
+
+    collection = Programme._mongometa.collection
+    boundary = ObjectId()
+    stats = {'channels': 0, 'programmes': 0, 'inferred': 0, 'skipped': 0}
+    chunk = []
+    without_stop = {}  # channel -> last programme without stop
+
+    def write(entry: dict):
+        entry['_id'] = ObjectId()
+        entry['epg'] = epg.pk
+        chunk.append(entry)
+        if len(chunk) >= chunk_size:
+            collection.insert_many(chunk, ordered=False)
+            stats['programmes'] += len(chunk)
+            chunk.clear()
+
+    with open_xmltv(source or epg.uri) as fileobj:
+        for kind, entry in iter_xmltv(fileobj):
+            if kind == 'channel':
+                stats['channels'] += 1
+                continue
+
+            if entry['channel'] not in channels or entry['start'] is None:
+                stats['skipped'] += 1
+                continue
+
+            previous = without_stop.pop(entry['channel'], None)
+            if previous is not None:
+                if previous['start'] < entry['start']:
+                    previous['stop'] = entry['start']
+                    stats['inferred'] += 1
+                    write(previous)
+                else:
+                    stats['skipped'] += 1
+
+            if entry['stop'] is None:
+                without_stop[entry['channel']] = entry
+            else:
+                write(entry)
+
+    stats['skipped'] += len(without_stop)
+    if chunk:
+        collection.insert_many(chunk, ordered=False)
+        stats['programmes'] += len(chunk)
+
+    collection.delete_many({'epg': epg.pk, '_id': {'$lt': boundary}})
+    PROGRAMMES_INDEX.invalidate()
+    return stats
@@ -2,10 +2,11 @@ from datetime import datetime
 from enum import IntEnum
 
 from pymodm import MongoModel, fields
-from werkzeug.security import generate_password_hash, check_password_hash
 
 from pyfastocloud_models.service.entry import ServiceSettings
 import pyfastocloud_models.constants as constants
+from pyfastocloud_models.utils.hashers import PasswordHashers, VerificationCache, PBKDF2PasswordHasher, \
+    ScryptPasswordHasher, WerkzeugPasswordHasher, check_password
 
 
 class Provider(MongoModel):
@@ -22,12 +23,16 @@ class Provider(MongoModel):
         collection_name = 'providers'
         allow_inheritance = True
 
+    # werkzeug hashes of existing providers are verified and rehashed on login
+    PASSWORD_HASHERS = PasswordHashers(PBKDF2PasswordHasher(), ScryptPasswordHasher(), WerkzeugPasswordHasher())
+    PASSWORD_VERIFICATION_CACHE = VerificationCache()
+
     email = fields.CharField(max_length=64, required=True)
     password = fields.CharField(required=True)
     created_date = fields.DateTimeField(default=datetime.now)
     status = fields.IntegerField(default=Status.NO_ACTIVE)
     type = fields.IntegerField(default=Type.USER)
-    country = fields.CharField(min_length=2, max_length=3, required=True)
+    country = fields.CharField(min_length=2, max_length=3, required=True, validators=[constants.validate_country_code])
     language = fields.CharField(default=constants.DEFAULT_LOCALE, required=True)
 
     servers = fields.ListField(fields.ReferenceField(ServiceSettings, on_delete=fields.ReferenceField.PULL), default=[])
@@ -49,11 +54,24 @@ class Provider(MongoModel):
 
     @staticmethod
     def generate_password_hash(password: str) -> str:
-        return generate_password_hash(password, method='sha256')
+        return Provider.PASSWORD_HASHERS.encode(password)
 
     @staticmethod
     def check_password_hash(hash_str: str, password: str) -> bool:
-        return check_password_hash(hash_str, password)
+        return Provider.PASSWORD_HASHERS.verify(password, hash_str)
+
+    def check_password(self, password: str) -> bool:
+        # cached verification, a hash in an outdated format is replaced on success
+        hashers = Provider.PASSWORD_HASHERS
+        if not check_password(hashers, Provider.PASSWORD_VERIFICATION_CACHE, self.pk, password, self.password):
+            return False
+
+        if hashers.needs_rehash(self.password):
+            old_hash, self.password = self.password, hashers.encode(password)
+            if self.pk is not None:
+                self._mongometa.collection.update_one({'_id': self.pk, 'password': old_hash},
+                                                      {'$set': {'password': self.password}})
+        return True
 
     @classmethod
     def make_provider(cls, email: str, password: str, country: str, language: str):
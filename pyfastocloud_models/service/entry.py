@@ -2,11 +2,20 @@ from enum import IntEnum
 
 from bson import ObjectId
 from pymodm import MongoModel, fields, EmbeddedMongoModel
+from pymodm.context_managers import no_auto_dereference
+from pymodm.errors import ValidationError
 
 import pyfastocloud_models.constants as constants
-from pyfastocloud_models.common_entries import HostAndPort
-from pyfastocloud_models.stream.entry import IStream
+from pyfastocloud_models.common_entries import HostAndPort, InputUrl, OutputUrl
+from pyfastocloud_models.stream.entry import IStream, ProxyStream, HardwareStream, M3U_HEADER, write_playlist, \
+    iter_streams_by_ids, invalidate_streams_caches
 from pyfastocloud_models.series.entry import Serial
+from pyfastocloud_models.utils.m3u_parser import iter_entries, UNKNOWN_VALUE
+from pyfastocloud_models.utils.cache import LRUCache
+
+PLAYLIST_CACHE_MAX_CHARS = 32 * 1024 * 1024
+# (service id, content version) -> playlist, bounded by the total length of the playlists
+PLAYLIST_CACHE = LRUCache(PLAYLIST_CACHE_MAX_CHARS, sizeof=len)
 
 
 # #EXTM3U
@@ -35,17 +44,83 @@ class ProviderPair(EmbeddedMongoModel):
     role = fields.IntegerField(min_value=Roles.READ, max_value=Roles.ADMIN, default=Roles.ADMIN)
 
 
+def _m3u_value(entry: dict, key: str, default: str, max_length: int) -> str:
+    value = entry.get(key, UNKNOWN_VALUE)
+    if value == UNKNOWN_VALUE:
+        return default
+    return value[:max_length]
+
+
+def _populate_defaults(model):
+    # defaults are stored only once read, save() does it in full_clean
+    for field in model._mongometa.get_fields():
+        value = field.value_from_object(model)
+        if isinstance(value, EmbeddedMongoModel):
+            _populate_defaults(value)
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, EmbeddedMongoModel):
+                    _populate_defaults(item)
+
+
+def make_stream_from_m3u_entry(entry: dict, stream_cls=ProxyStream) -> IStream:
+    stream = stream_cls(name=_m3u_value(entry, 'title', constants.DEFAULT_STREAM_NAME,
+                                        constants.MAX_STREAM_NAME_LENGTH),
+                        tvg_id=_m3u_value(entry, 'tvg-id', constants.DEFAULT_STREAM_TVG_ID,
+                                          constants.MAX_STREAM_TVG_ID_LENGTH),
+                        tvg_name=_m3u_value(entry, 'tvg-name', constants.DEFAULT_STREAM_TVG_NAME,
+                                            constants.MAX_STREAM_TVG_NAME_LENGTH),
+                        group=_m3u_value(entry, 'tvg-group', constants.DEFAULT_STREAM_GROUP_TITLE,
+                                         constants.MAX_STREAM_GROUP_TITLE_LENGTH))
+    logo = _m3u_value(entry, 'tvg-logo', str(), constants.MAX_URL_LENGTH)
+    if len(logo) >= constants.MIN_URL_LENGTH:
+        stream.tvg_logo = logo
+
+    link = entry['link']
+    if issubclass(stream_cls, HardwareStream):
+        stream.input = [InputUrl(uri=link)]
+    else:
+        stream.output = [OutputUrl(uri=link)]
+    return stream
+
+
+def _collect_streams_with_parts(sids: list) -> list:
+    # one query per parts nesting level
+    collected = list(sids)
+    seen = set(sids)
+    level = collected
+    while level:
+        next_level = []
+        for doc in IStream._mongometa.collection.find({'_id': {'$in': level}}, {'parts': 1}):
+            for part in doc.get('parts', []):
+                if part not in seen:
+                    seen.add(part)
+                    next_level.append(part)
+        collected.extend(next_level)
+        level = next_level
+    return collected
+
+
+def safe_delete_streams(streams: list):
+    # streams: IStream instances or ids
+    sids = [stream.pk if isinstance(stream, IStream) else stream for stream in streams if stream]
+    if not sids:
+        return
+
+    from pyfastocloud_models.subscriber.entry import Subscriber
+    sids = _collect_streams_with_parts(sids)
+    official = {'sid': {'$in': sids}, 'private': {'$ne': True}}
+    Subscriber._mongometa.collection.update_many(
+        {'$or': [{'streams.sid': {'$in': sids}}, {'vods.sid': {'$in': sids}}, {'catchups.sid': {'$in': sids}}]},
+        {'$pull': {'streams': official, 'vods': official, 'catchups': official}})
+    ServiceSettings.touch_content_by_streams(sids)
+    invalidate_streams_caches(sids)
+    IStream.objects.raw({'_id': {'$in': sids}}).delete()
+
+
 def safe_delete_stream(stream: IStream):
     if stream:
-        from pyfastocloud_models.subscriber.entry import Subscriber
-        subscribers = Subscriber.objects.all()
-        for subscriber in subscribers:
-            subscriber.remove_official_stream(stream)
-            subscriber.remove_official_vod(stream)
-            subscriber.remove_official_catchup(stream)
-        for catchup in stream.parts:
-            safe_delete_stream(catchup)
-        stream.delete()
+        safe_delete_streams([stream])
 
 
 class ServiceSettings(MongoModel):
@@ -75,11 +150,13 @@ class ServiceSettings(MongoModel):
     DEFAULT_SERVICE_CODS_HOST = 'localhost'
     DEFAULT_SERVICE_CODS_PORT = 6001
 
-    streams = fields.ListField(fields.ReferenceField(IStream, on_delete=fields.ReferenceField.PULL), default=[],
+    IMPORT_CHUNK_SIZE = 1000
+
+    streams = fields.ListField(fields.ReferenceField(IStream, on_delete=fields.ReferenceField.PULL), default=list,
                                blank=True)
-    series = fields.ListField(fields.ReferenceField(Serial, on_delete=fields.ReferenceField.PULL), default=[],
+    series = fields.ListField(fields.ReferenceField(Serial, on_delete=fields.ReferenceField.PULL), default=list,
                               blank=True)
-    providers = fields.EmbeddedDocumentListField(ProviderPair, default=[])
+    providers = fields.EmbeddedDocumentListField(ProviderPair, default=list)
 
     name = fields.CharField(default=DEFAULT_SERVICE_NAME, max_length=MAX_SERVICE_NAME_LENGTH,
                             min_length=MIN_SERVICE_NAME_LENGTH)
@@ -101,6 +178,8 @@ class ServiceSettings(MongoModel):
     vods_in_directory = fields.CharField(default=DEFAULT_VODS_IN_DIR_PATH)
     vods_directory = fields.CharField(default=DEFAULT_VODS_DIR_PATH)
     cods_directory = fields.CharField(default=DEFAULT_CODS_DIR_PATH)
+    # changed on every streams change, key of the playlist cache, see get_content_version
+    content_version = fields.ObjectIdField(blank=True)
 
     def get_id(self) -> str:
         return str(self.pk)
@@ -131,32 +210,104 @@ class ServiceSettings(MongoModel):
         return url.replace(self.cods_directory, self.get_cods_host())
 
     def generate_playlist(self) -> str:
-        result = '#EXTM3U\n'
-        for stream in self.streams:
-            result += stream.generate_playlist(False)
-
+        key = (self.pk, self.get_content_version())
+        result = PLAYLIST_CACHE.get(key)
+        if result is not None:
+            return result
+
+        result = ''.join(self.iter_playlist())
+        if self.pk is not None:
+            PLAYLIST_CACHE.put(key, result)
         return result
 
+    def iter_playlist(self):
+        # streams are fetched by chunks, not kept in memory
+        yield M3U_HEADER
+        for stream in iter_streams_by_ids(self.get_stream_ids()):
+            yield from stream.iter_playlist(False)
+
+    def write_playlist(self, fp):
+        write_playlist(fp, self.iter_playlist())
+
+    def touch_content(self):
+        self.content_version = ObjectId()
+
+    def get_content_version(self):
+        # documents stored without version get one on first use, a version stored meanwhile by another process wins
+        if self.content_version is None and self.pk is not None:
+            version = ObjectId()
+            collection = self._mongometa.collection
+            if collection.update_one({'_id': self.pk, 'content_version': None},
+                                     {'$set': {'content_version': version}}).matched_count:
+                self.content_version = version
+            else:
+                doc = collection.find_one({'_id': self.pk}, {'content_version': 1})
+                self.content_version = doc.get('content_version') if doc else None
+        return self.content_version
+
+    def save(self, *args, **kwargs):
+        if self.content_version is None:
+            self.content_version = ObjectId()
+        return super(ServiceSettings, self).save(*args, **kwargs)
+
     def add_streams(self, streams: [IStream]):
         for stream in streams:
             self.streams.append(stream)
+        self.touch_content()
         self.save()
 
     def add_stream(self, stream: IStream):
         self.streams.append(stream)
+        self.touch_content()
         self.save()
 
     def remove_stream(self, stream: IStream):
         self.streams.remove(stream)
         safe_delete_stream(stream)
+        self.touch_content()
         self.save()
 
     def remove_all_streams(self):
-        for stream in list(self.streams):
-            safe_delete_stream(stream)
+        safe_delete_streams(self.get_stream_ids())
         self.streams = []
+        self.touch_content()
         self.save()
 
+    def import_m3u(self, path_or_fileobj, stream_cls=ProxyStream, chunk_size=IMPORT_CHUNK_SIZE, invalid=None) -> int:
+        # streams are written with insert_many per chunk, references attached with one $push $each
+        # entries failing validation are skipped, invalid: list collecting (entry, ValidationError)
+        if self.pk is None:
+            raise ValueError('service should be saved before import')
+
+        imported = []
+        chunk = []
+        for entry in iter_entries(path_or_fileobj):
+            stream = make_stream_from_m3u_entry(entry, stream_cls)
+            try:
+                stream.full_clean()
+            except ValidationError as error:
+                if invalid is not None:
+                    invalid.append((entry, error))
+                continue
+
+            chunk.append(stream)
+            if len(chunk) == chunk_size:
+                self._bulk_insert_streams(chunk)
+                imported.extend(chunk)
+                chunk = []
+
+        if chunk:
+            self._bulk_insert_streams(chunk)
+            imported.extend(chunk)
+
+        if imported:
+            self.touch_content()
+            ServiceSettings.objects.raw({'_id': self.pk}).update(
+                {'$push': {'streams': {'$each': [stream.pk for stream in imported]}},
+                 '$set': {'content_version': self.content_version}})
+            self.streams.extend(imported)
+        return len(imported)
+
     def add_provider(self, user: ProviderPair):
         self.providers.append(user)
         self.save()
@@ -167,6 +318,11 @@ class ServiceSettings(MongoModel):
                 self.providers.remove(provider)
         self.save()
 
+    def get_stream_ids(self) -> [ObjectId]:
+        # without dereferencing streams
+        with no_auto_dereference(ServiceSettings):
+            return [stream.pk if isinstance(stream, IStream) else stream for stream in self.streams]
+
     def find_stream_settings_by_id(self, sid: ObjectId):
         for stream in self.streams:
             if stream.id == sid:
@@ -174,7 +330,24 @@ class ServiceSettings(MongoModel):
 
         return None
 
+    @staticmethod
+    def touch_content_by_stream(sid: ObjectId):
+        ServiceSettings.objects.raw({'streams': sid}).update({'$set': {'content_version': ObjectId()}})
+
+    @staticmethod
+    def touch_content_by_streams(sids: [ObjectId]):
+        ServiceSettings.objects.raw({'streams': {'$in': sids}}).update({'$set': {'content_version': ObjectId()}})
+
+    # private
+
+    @staticmethod
+    def _bulk_insert_streams(streams: [IStream]):
+        for stream in streams:
+            _populate_defaults(stream)
+        ids = IStream.objects.bulk_create(streams)
+        for stream, sid in zip(streams, ids):
+            stream.pk = sid
+
     def delete(self, *args, **kwargs):
-        for stream in self.streams:
-            safe_delete_stream(stream)
+        safe_delete_streams(self.get_stream_ids())
         return super(ServiceSettings, self).delete(*args, **kwargs)
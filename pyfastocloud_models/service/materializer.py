@@ -0,0 +1,229 @@
+import argparse
+import hashlib
+import os
+import tempfile
+import time
+from datetime import datetime
+from multiprocessing import Pool
+
+from bson.objectid import ObjectId
+from pymodm import connect
+
+from pyfastocloud_models.service.entry import ServiceSettings
+from pyfastocloud_models.stream.entry import IStream
+from pyfastocloud_models.subscriber.entry import Subscriber, Device
+
+PLAYLIST_EXTENSION = '.m3u'
+HASH_EXTENSION = '.sha1'  # content sha1 and source version of the playlist file
+SUBSCRIBERS_DIR_NAME = 'subscribers'
+
+
+def get_service_playlists_directory(service: ServiceSettings) -> str:
+    return os.path.abspath(os.path.expanduser(service.playlists_directory))
+
+
+def get_service_playlist_path(service: ServiceSettings) -> str:
+    return os.path.join(get_service_playlists_directory(service), service.get_id() + PLAYLIST_EXTENSION)
+
+
+def get_subscriber_playlist_path(service: ServiceSettings, subscriber: Subscriber, did: str) -> str:
+    # subscribers playlists are stored in the directory of their first server
+    return os.path.join(get_service_playlists_directory(service), SUBSCRIBERS_DIR_NAME, subscriber.get_id(),
+                        did + PLAYLIST_EXTENSION)
+
+
+def is_file_actual(path: str, version: str) -> bool:
+    # the file exists and was written from this source version
+    return version is not None and os.path.exists(path) and _read_hash(path + HASH_EXTENSION)[1] == version
+
+
+def write_file_atomic(path: str, fragments, version=None) -> bool:
+    # written through a temporary file and renamed, returns False if the content hash did not change
+    # version: source version stored next to the content hash, see is_file_actual
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    content_hash = hashlib.sha1()
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            for fragment in fragments:
+                content_hash.update(fragment.encode('utf-8'))
+                file.write(fragment)
+
+        digest = content_hash.hexdigest()
+        hash_path = path + HASH_EXTENSION
+        if os.path.exists(path) and _read_hash(hash_path)[0] == digest:
+            os.remove(tmp_path)
+            _write_hash(hash_path, digest, version)
+            return False
+
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+        _write_hash(hash_path, digest, version)
+        return True
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def make_subscriber_playlists_version(subscriber: Subscriber, lb_server_host_and_port: str) -> str:
+    # changes with anything rendered into the subscriber devices playlists: password, load balancer, streams list
+    # and versions of the streams (renewed by every stream save)
+    sids = [user_stream.get_stream_id() for user_stream in subscriber.streams]
+    versions = {doc['_id']: doc.get('version') for doc in
+                IStream._mongometa.collection.find({'_id': {'$in': sids}}, {'version': 1})} if sids else {}
+    version = hashlib.sha1('{0}\n{1}\n{2}\n'.format(subscriber.get_id(), subscriber.password,
+                                                     lb_server_host_and_port).encode('utf-8'))
+    for user_stream in subscriber.streams:
+        sid = user_stream.get_stream_id()
+        version.update('{0} {1} {2}\n'.format(sid, user_stream.private, versions.get(sid, '-')).encode('utf-8'))
+    return version.hexdigest()
+
+
+def materialize_service_playlist(service: ServiceSettings) -> bool:
+    # not rendered if the file was written from the current content version
+    path = get_service_playlist_path(service)
+    version = str(service.get_content_version())
+    if is_file_actual(path, version):
+        return False
+    return write_file_atomic(path, service.iter_playlist(), version)
+
+
+def materialize_subscriber_playlists(service: ServiceSettings, subscriber: Subscriber, lb_server_host_and_port: str,
+                                     kept=None) -> int:
+    # playlists of not banned devices, kept: set of the playlists paths of this run
+    version = None
+    written = 0
+    for device in subscriber.devices:
+        if device.status == Device.Status.BANNED:
+            continue
+
+        path = get_subscriber_playlist_path(service, subscriber, device.get_id())
+        if kept is not None:
+            kept.add(path)
+        if version is None:
+            version = make_subscriber_playlists_version(subscriber, lb_server_host_and_port)
+        if is_file_actual(path, version):
+            continue
+        if write_file_atomic(path, subscriber.iter_playlist(device.get_id(), lb_server_host_and_port), version):
+            written += 1
+    return written
+
+
+def materialize_shard(service: ServiceSettings, lb_server_host_and_port: str, kept=None) -> (int, int):
+    # a shard is the service and the active, not expired subscribers having it as first server
+    services_written = 1 if materialize_service_playlist(service) else 0
+    if kept is not None:
+        kept.add(get_service_playlist_path(service))
+    subscribers_written = 0
+    query = {'servers.0': service.pk, 'status': Subscriber.Status.ACTIVE, 'exp_date': {'$gt': datetime.now()}}
+    for subscriber in Subscriber.objects.raw(query):
+        subscribers_written += materialize_subscriber_playlists(service, subscriber, lb_server_host_and_port, kept)
+    return services_written, subscribers_written
+
+
+def prune_playlists(directory: str, kept: set) -> int:
+    # removes playlists (and hash files) written by previous runs but not by the last one: deleted services, removed
+    # or banned devices, deleted, disabled or expired subscribers, returns the number of removed playlists
+    if not os.path.isdir(directory):
+        return 0
+
+    removed = _prune_directory(directory, kept)
+    subscribers_directory = os.path.join(directory, SUBSCRIBERS_DIR_NAME)
+    if os.path.isdir(subscribers_directory):
+        for name in os.listdir(subscribers_directory):
+            subscriber_directory = os.path.join(subscribers_directory, name)
+            if ObjectId.is_valid(name) and os.path.isdir(subscriber_directory):
+                removed += _prune_directory(subscriber_directory, kept)
+                try:
+                    os.rmdir(subscriber_directory)
+                except OSError:  # not empty
+                    pass
+    return removed
+
+
+def materialize_all(lb_server_host_and_port: str, mongodb_uri: str, workers=1) -> (int, int, int):
+    # returns numbers of written services playlists, written subscribers playlists and removed stale playlists
+    services = list(ServiceSettings._mongometa.collection.find({}, {'_id': 1, 'playlists_directory': 1}))
+    sids = [doc['_id'] for doc in services]
+    if workers <= 1:
+        results = [_materialize_shard_by_id(sid, lb_server_host_and_port) for sid in sids]
+    else:
+        with Pool(workers, initializer=connect, initargs=(mongodb_uri,)) as pool:
+            results = pool.starmap(_materialize_shard_by_id, [(sid, lb_server_host_and_port) for sid in sids])
+
+    kept = set()
+    for result in results:
+        kept.update(result[2])
+    directories = {os.path.abspath(os.path.expanduser(
+        doc.get('playlists_directory', ServiceSettings.DEFAULT_PLAYLISTS_DIR_PATH))) for doc in services}
+    removed = sum(prune_playlists(directory, kept) for directory in directories)
+    return sum(result[0] for result in results), sum(result[1] for result in results), removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Materialize services and subscribers playlists files.')
+    parser.add_argument('--mongodb_uri', default='mongodb://localhost:27017/iptv', help='MongoDB uri')
+    parser.add_argument('--lb_server_host_and_port', required=True, help='load balancer host:port for device links')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes, sharded by service')
+    parser.add_argument('--interval', type=int, default=0, help='rebuild every interval seconds, 0 to run once')
+    args = parser.parse_args()
+
+    connect(args.mongodb_uri)
+    while True:
+        services, subscribers, removed = materialize_all(args.lb_server_host_and_port, args.mongodb_uri,
+                                                         args.workers)
+        print('Updated playlists, services: {0}, subscribers devices: {1}, removed: {2}'.format(services, subscribers,
+                                                                                               removed))
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+# private
+def _materialize_shard_by_id(sid, lb_server_host_and_port: str) -> (int, int, set):
+    try:
+        service = ServiceSettings.objects.get({'_id': sid})
+    except ServiceSettings.DoesNotExist:
+        return 0, 0, set()
+    kept = set()
+    services_written, subscribers_written = materialize_shard(service, lb_server_host_and_port, kept)
+    return services_written, subscribers_written, kept
+
+
+def _prune_directory(directory: str, kept: set) -> int:
+    # only '<object id>.m3u' playlists and their hash files are removed
+    removed = 0
+    for name in os.listdir(directory):
+        playlist_name = name[:-len(HASH_EXTENSION)] if name.endswith(HASH_EXTENSION) else name
+        if not playlist_name.endswith(PLAYLIST_EXTENSION) or not ObjectId.is_valid(
+                playlist_name[:-len(PLAYLIST_EXTENSION)]):
+            continue
+        if os.path.join(directory, playlist_name) in kept:
+            continue
+        os.remove(os.path.join(directory, name))
+        if name == playlist_name:
+            removed += 1
+    return removed
+
+
+def _read_hash(path: str) -> (str, str):
+    # (content sha1, source version), None for missing values
+    try:
+        with open(path) as file:
+            lines = file.read().split()
+    except OSError:
+        return None, None
+    return lines[0] if lines else None, lines[1] if len(lines) > 1 else None
+
+
+def _write_hash(path: str, digest: str, version=None):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as file:
+        file.write(digest if version is None else '{0}\n{1}\n'.format(digest, version))
+    os.replace(tmp_path, path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+import argparse
+import tracemalloc
+
+from pyfastocloud_models.stream.entry import IStream, find_stream_front_views
+from pyfastocloud_models.utils.benchmark import DEFAULT_BENCHMARK_MONGODB_URI, connect_benchmark_database, \
+    drop_benchmark_database, insert_benchmark_streams, measure
+
+DEFAULT_STREAMS_COUNT = 5000
+DEFAULT_REPEAT = 5
+
+
+def full_models_front_dicts(sids: list) -> list:
+    return [stream.to_front_dict() for stream in IStream.objects.raw({'_id': {'$in': sids}})]
+
+
+def front_views_front_dicts(sids: list) -> list:
+    return [view.to_front_dict() for view in find_stream_front_views(sids).values()]
+
+
+def measure_peak_memory(func) -> int:
+    # peak of python allocations during the call, in bytes
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Channel list front dicts from full models and from front views.')
+    parser.add_argument('--mongodb_uri', default=DEFAULT_BENCHMARK_MONGODB_URI, help='empty MongoDB database uri')
+    parser.add_argument('--streams', type=int, default=DEFAULT_STREAMS_COUNT, help='streams count')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='runs per path, the best is reported')
+    args = parser.parse_args()
+
+    connect_benchmark_database(args.mongodb_uri)
+    try:
+        sids = [stream.id for stream in insert_benchmark_streams(args.streams)]
+        for name, func in (('full models', full_models_front_dicts), ('front views', front_views_front_dicts)):
+            elapsed = measure(lambda: func(sids), args.repeat)
+            peak = measure_peak_memory(lambda: func(sids))
+            print('{0} streams, {1}: {2:.1f}ms, peak {3:.1f}MiB'.format(args.streams, name, elapsed * 1000,
+                                                                        peak / (1024 * 1024)))
+    finally:
+        drop_benchmark_database()
+
+
+if __name__ == '__main__':
+    main()
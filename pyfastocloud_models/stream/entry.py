@@ -4,11 +4,44 @@ from urllib.parse import urlparse
 import os
 
 from pymodm import MongoModel, fields, EmbeddedMongoModel
+from pymodm.errors import ModelDoesNotExist
 from bson.objectid import ObjectId
+from pymongo import UpdateOne, IndexModel, ASCENDING
 
 from pyfastocloud_models.utils.utils import date_to_utc_msec
 import pyfastocloud_models.constants as constants
-from pyfastocloud_models.common_entries import Rational, Size, Logo, RSVGLogo, InputUrl, OutputUrl
+from pyfastocloud_models.common_entries import Rational, Size, Logo, RSVGLogo, Url, InputUrl, OutputUrl
+from pyfastocloud_models.utils.cache import LRUCache
+from pyfastocloud_models.utils.interval_index import IntervalIndex
+
+M3U_HEADER = '#EXTM3U\n'
+EXTINF_ENTRY_FORMAT = '#EXTINF:-1 tvg-id="{0}" tvg-name="{1}" tvg-logo="{2}" group-title="{3}",{4}\n{5}\n'
+
+DEVICE_PLAYLIST_TEMPLATES_CACHE_SIZE = 100000
+DEVICE_PLAYLIST_TEMPLATES_TTL = 3600  # seconds, templates of old stream versions age out
+# (stream id, stream version) -> device playlist template, a save by any process changes the version
+DEVICE_PLAYLIST_TEMPLATES_CACHE = LRUCache(DEVICE_PLAYLIST_TEMPLATES_CACHE_SIZE, DEVICE_PLAYLIST_TEMPLATES_TTL)
+
+
+PLAYLIST_STREAMS_CHUNK_SIZE = 1000  # streams loaded per query by the playlist iterators
+
+CATCHUPS_INDEX_TTL = 60  # seconds, bounds staleness of catchups changed by other processes
+
+
+def write_playlist(fp, fragments):
+    for fragment in fragments:
+        fp.write(fragment)
+
+
+def make_device_playlist_link_prefix(uid: str, pass_hash: str, did: str, lb_server_host_and_port: str) -> str:
+    return '{0}/{1}/{2}/{3}/'.format(lb_server_host_and_port, uid, pass_hash, did)
+
+
+def render_device_playlist_template(result: list, template: tuple, link_prefix: str):
+    for prefix, suffix in template:
+        result.append(prefix)
+        result.append(link_prefix)
+        result.append(suffix)
 
 
 class BaseFields:
@@ -74,7 +107,25 @@ class StreamLogLevel(IntEnum):
         return str(self.value)
 
 
-class IStream(MongoModel):
+# _cls -> concrete stream class, StreamType -> concrete stream classes
+# every IStream subclass with a STREAM_TYPE is registered, see StreamModelMetaclass
+STREAM_CLASSES_BY_CLS_NAME = {}
+STREAM_CLASSES_BY_TYPE = {}
+
+
+class StreamModelMetaclass(type(MongoModel)):
+    # registers stream classes once pymodm set their _mongometa (__init_subclass__ runs before it)
+    def __new__(mcls, name, bases, attrs):
+        cls = super(StreamModelMetaclass, mcls).__new__(mcls, name, bases, attrs)
+        if cls.STREAM_TYPE is not None:
+            STREAM_CLASSES_BY_CLS_NAME[cls._mongometa.object_name] = cls
+            STREAM_CLASSES_BY_TYPE.setdefault(cls.STREAM_TYPE, []).append(cls)
+        return cls
+
+
+class IStream(MongoModel, metaclass=StreamModelMetaclass):
+    STREAM_TYPE = None  # constants.StreamType of concrete streams, registered in STREAM_CLASSES_BY_TYPE
+
     @staticmethod
     def get_stream_by_id(sid: ObjectId):
         try:
@@ -87,6 +138,7 @@ class IStream(MongoModel):
     class Meta:
         collection_name = 'streams'
         allow_inheritance = True
+        indexes = [IndexModel([('tvg_id', ASCENDING), ('start', ASCENDING)])]  # catchups of a channel
 
     created_date = fields.DateTimeField(default=datetime.now)  # for inner use
     name = fields.CharField(default=constants.DEFAULT_STREAM_NAME, max_length=constants.MAX_STREAM_NAME_LENGTH,
@@ -109,10 +161,27 @@ class IStream(MongoModel):
 
     parts = fields.ListField(fields.ReferenceField('IStream'), default=[], blank=True)
     output = fields.EmbeddedDocumentListField(OutputUrl, default=[])  #
+    version = fields.ObjectIdField(blank=True)  # renewed by every save, keys cached device playlist templates
 
     def add_part(self, stream):
         self.parts.append(stream)
         self.save()
+        if stream.get_type() == constants.StreamType.CATCHUP:
+            CATCHUPS_INDEX.add(self.pk, stream.start, stream.stop, stream.pk)
+
+    def save(self, *args, **kwargs):
+        self.version = ObjectId()
+        result = super(IStream, self).save(*args, **kwargs)
+        if self.STREAM_TYPE == constants.StreamType.CATCHUP:
+            CATCHUPS_INDEX.update(self.pk, self.start, self.stop)
+        self._touch_services_content()
+        return result
+
+    def delete(self, *args, **kwargs):
+        CATCHUPS_INDEX.remove(self.pk)
+        CATCHUPS_INDEX.invalidate(self.pk)
+        self._touch_services_content()
+        return super(IStream, self).delete(*args, **kwargs)
 
     def get_groups(self) -> list:
         return self.group.split(';')
@@ -125,7 +194,9 @@ class IStream(MongoModel):
                 StreamFields.IARC_FIELD: self.iarc, StreamFields.GROUP_FIELD: self.group}
 
     def get_type(self) -> constants.StreamType:
-        raise NotImplementedError('subclasses must override get_type()!')
+        if self.STREAM_TYPE is None:
+            raise NotImplementedError('subclasses must define STREAM_TYPE!')
+        return self.STREAM_TYPE
 
     @property
     def id(self) -> ObjectId:
@@ -135,55 +206,72 @@ class IStream(MongoModel):
         return str(self.pk)
 
     def generate_playlist(self, header=True) -> str:
-        result = '#EXTM3U\n' if header else ''
-        stream_type = self.get_type()
-        if stream_type == constants.StreamType.RELAY or stream_type == constants.StreamType.VOD_RELAY or \
-                stream_type == constants.StreamType.COD_RELAY or stream_type == constants.StreamType.ENCODE or \
-                stream_type == constants.StreamType.VOD_ENCODE or stream_type == constants.StreamType.COD_ENCODE or \
-                stream_type == constants.StreamType.PROXY or stream_type == constants.StreamType.VOD_PROXY or \
-                stream_type == constants.StreamType.VOD_ENCODE or \
-                stream_type == constants.StreamType.TIMESHIFT_PLAYER or stream_type == constants.StreamType.CATCHUP:
+        return ''.join(self.iter_playlist(header))
+
+    def iter_playlist(self, header=True):
+        if header:
+            yield M3U_HEADER
+        if self.get_type() in constants.PLAYLIST_OUTPUT_STREAM_TYPES:
             for out in self.output:
-                result += '#EXTINF:-1 tvg-id="{0}" tvg-name="{1}" tvg-logo="{2}" group-title="{3}",{4}\n{5}\n'.format(
-                    self.tvg_id, self.tvg_name, self.tvg_logo, self.group, self.name, out.uri)
+                yield EXTINF_ENTRY_FORMAT.format(self.tvg_id, self.tvg_name, self.tvg_logo, self.group, self.name,
+                                                 out.uri)
 
-        return result
+    def write_playlist(self, fp, header=True):
+        write_playlist(fp, self.iter_playlist(header))
 
     def generate_device_playlist(self, uid: str, pass_hash: str, did: str, lb_server_host_and_port: str,
                                  header=True) -> str:
-        result = '#EXTM3U\n' if header else ''
-        stream_type = self.get_type()
-        if stream_type == constants.StreamType.RELAY or stream_type == constants.StreamType.VOD_RELAY or \
-                stream_type == constants.StreamType.COD_RELAY or stream_type == constants.StreamType.ENCODE or \
-                stream_type == constants.StreamType.VOD_ENCODE or stream_type == constants.StreamType.COD_ENCODE or \
-                stream_type == constants.StreamType.PROXY or stream_type == constants.StreamType.VOD_PROXY or \
-                stream_type == constants.StreamType.VOD_ENCODE or \
-                stream_type == constants.StreamType.TIMESHIFT_PLAYER or stream_type == constants.StreamType.CATCHUP:
+        return ''.join(self.iter_device_playlist(uid, pass_hash, did, lb_server_host_and_port, header))
+
+    def iter_device_playlist(self, uid: str, pass_hash: str, did: str, lb_server_host_and_port: str, header=True):
+        result = [M3U_HEADER] if header else []
+        render_device_playlist_template(result, self.get_device_playlist_template(),
+                                        make_device_playlist_link_prefix(uid, pass_hash, did, lb_server_host_and_port))
+        return iter(result)
+
+    def get_device_playlist_template(self) -> tuple:
+        # ((entry prefix, entry suffix), ...) of the instance fields, device link prefix goes between them
+        # get_device_playlist_templates caches templates of stored streams
+        return self._make_device_playlist_template()
+
+    def generate_input_playlist(self, header=True) -> str:
+        return ''.join(self.iter_input_playlist(header))
+
+    def iter_input_playlist(self, header=True):
+        raise NotImplementedError('subclasses must override iter_input_playlist()!')
+
+    def write_input_playlist(self, fp, header=True):
+        write_playlist(fp, self.iter_input_playlist(header))
+
+    # private
+    def _make_device_playlist_template(self) -> tuple:
+        template = []
+        if self.get_type() in constants.PLAYLIST_OUTPUT_STREAM_TYPES:
             for out in self.output:
                 parsed_uri = urlparse(out.uri)
                 if parsed_uri.scheme == 'http' or parsed_uri.scheme == 'https':
                     file_name = os.path.basename(parsed_uri.path)
-                    url = 'http://{0}/{1}/{2}/{3}/{4}/{5}/{6}'.format(lb_server_host_and_port, uid, pass_hash, did,
-                                                                      self.id,
-                                                                      out.id, file_name)
-                    result += '#EXTINF:-1 tvg-id="{0}" tvg-name="{1}" tvg-logo="{2}" group-title="{3}",{4}\n{5}\n'.format(
-                        self.tvg_id, self.tvg_name, self.tvg_logo, self.group, self.name, url)
+                    prefix = EXTINF_ENTRY_FORMAT.format(self.tvg_id, self.tvg_name, self.tvg_logo, self.group,
+                                                        self.name, 'http://')[:-1]
+                    template.append((prefix, '{0}/{1}/{2}\n'.format(self.id, out.id, file_name)))
+        return tuple(template)
 
-        return result
+    def _touch_services_content(self):
+        if self.pk is None:
+            return
 
-    def generate_input_playlist(self, header=True) -> str:
-        raise NotImplementedError('subclasses must override generate_input_playlist()!')
+        from pyfastocloud_models.service.entry import ServiceSettings
+        ServiceSettings.touch_content_by_stream(self.pk)
 
 
 class ProxyStream(IStream):
+    STREAM_TYPE = constants.StreamType.PROXY
+
     def __init__(self, *args, **kwargs):
         super(ProxyStream, self).__init__(*args, **kwargs)
 
-    def get_type(self):
-        return constants.StreamType.PROXY
-
-    def generate_input_playlist(self, header=True) -> str:
-        return self.generate_playlist(header)
+    def iter_input_playlist(self, header=True):
+        return self.iter_playlist(header)
 
 
 class HardwareStream(IStream):
@@ -202,9 +290,6 @@ class HardwareStream(IStream):
     def __init__(self, *args, **kwargs):
         super(HardwareStream, self).__init__(*args, **kwargs)
 
-    def get_type(self) -> constants.StreamType:
-        raise NotImplementedError('subclasses must override get_type()!')
-
     def get_log_level(self):
         return self.log_level
 
@@ -229,29 +314,24 @@ class HardwareStream(IStream):
     def get_auto_exit_time(self):
         return self.auto_exit_time
 
-    def generate_input_playlist(self, header=True) -> str:
-        result = '#EXTM3U\n' if header else ''
-        stream_type = self.get_type()
-        if stream_type == constants.StreamType.RELAY or stream_type == constants.StreamType.ENCODE or \
-                stream_type == constants.StreamType.TIMESHIFT_PLAYER or \
-                stream_type == constants.StreamType.VOD_ENCODE or stream_type == constants.StreamType.VOD_RELAY:
+    def iter_input_playlist(self, header=True):
+        if header:
+            yield M3U_HEADER
+        if self.get_type() in constants.INPUT_PLAYLIST_STREAM_TYPES:
             for out in self.input:
-                result += '#EXTINF:-1 tvg-id="{0}" tvg-name="{1}" tvg-logo="{2}" group-title="{3}",{4}\n{5}\n'.format(
-                    self.tvg_id, self.tvg_name, self.tvg_logo, self.group, self.name, out.uri)
-
-        return result
+                yield EXTINF_ENTRY_FORMAT.format(self.tvg_id, self.tvg_name, self.tvg_logo, self.group, self.name,
+                                                 out.uri)
 
 
 class RelayStream(HardwareStream):
+    STREAM_TYPE = constants.StreamType.RELAY
+
     def __init__(self, *args, **kwargs):
         super(RelayStream, self).__init__(*args, **kwargs)
 
     video_parser = fields.CharField(default=constants.DEFAULT_VIDEO_PARSER, required=True)
     audio_parser = fields.CharField(default=constants.DEFAULT_AUDIO_PARSER, required=True)
 
-    def get_type(self) -> constants.StreamType:
-        return constants.StreamType.RELAY
-
     def get_video_parser(self):
         return self.video_parser
 
@@ -260,6 +340,8 @@ class RelayStream(HardwareStream):
 
 
 class EncodeStream(HardwareStream):
+    STREAM_TYPE = constants.StreamType.ENCODE
+
     def __init__(self, *args, **kwargs):
         super(EncodeStream, self).__init__(*args, **kwargs)
 
@@ -278,9 +360,6 @@ class EncodeStream(HardwareStream):
     rsvg_logo = fields.EmbeddedDocumentField(RSVGLogo, default=RSVGLogo())
     aspect_ratio = fields.EmbeddedDocumentField(Rational, default=Rational())
 
-    def get_type(self) -> constants.StreamType:
-        return constants.StreamType.ENCODE
-
     def get_relay_video(self):
         return self.relay_video
 
@@ -313,6 +392,8 @@ class EncodeStream(HardwareStream):
 
 
 class TimeshiftRecorderStream(RelayStream):
+    STREAM_TYPE = constants.StreamType.TIMESHIFT_RECORDER
+
     output = fields.EmbeddedDocumentListField(OutputUrl, default=[], blank=True)
     timeshift_chunk_duration = fields.IntegerField(default=constants.DEFAULT_TIMESHIFT_CHUNK_DURATION, required=True)
     timeshift_chunk_life_time = fields.IntegerField(default=constants.DEFAULT_TIMESHIFT_CHUNK_LIFE_TIME, required=True)
@@ -320,14 +401,13 @@ class TimeshiftRecorderStream(RelayStream):
     def __init__(self, *args, **kwargs):
         super(TimeshiftRecorderStream, self).__init__(*args, **kwargs)
 
-    def get_type(self) -> constants.StreamType:
-        return constants.StreamType.TIMESHIFT_RECORDER
-
     def get_timeshift_chunk_duration(self):
         return self.timeshift_chunk_duration
 
 
 class CatchupStream(TimeshiftRecorderStream):
+    STREAM_TYPE = constants.StreamType.CATCHUP
+
     start = fields.DateTimeField(default=datetime.utcfromtimestamp(0))
     stop = fields.DateTimeField(default=datetime.utcfromtimestamp(0))
 
@@ -336,9 +416,6 @@ class CatchupStream(TimeshiftRecorderStream):
         self.timeshift_chunk_duration = constants.DEFAULT_CATCHUP_CHUNK_DURATION
         self.auto_exit_time = constants.DEFAULT_CATCHUP_EXIT_TIME
 
-    def get_type(self) -> constants.StreamType:
-        return constants.StreamType.CATCHUP
-
     def to_front_dict(self) -> dict:
         base = super(CatchupStream, self).to_front_dict()
         start_utc = date_to_utc_msec(self.start)
@@ -349,41 +426,37 @@ class CatchupStream(TimeshiftRecorderStream):
 
 
 class TimeshiftPlayerStream(RelayStream):
+    STREAM_TYPE = constants.StreamType.TIMESHIFT_PLAYER
+
     timeshift_dir = fields.CharField(required=True)  # FIXME default
     timeshift_delay = fields.IntegerField(default=constants.DEFAULT_TIMESHIFT_DELAY, required=True)
 
     def __init__(self, *args, **kwargs):
         super(TimeshiftPlayerStream, self).__init__(*args, **kwargs)
 
-    def get_type(self) -> constants.StreamType:
-        return constants.StreamType.TIMESHIFT_PLAYER
-
 
 class TestLifeStream(RelayStream):
+    STREAM_TYPE = constants.StreamType.TEST_LIFE
+
     output = fields.EmbeddedDocumentListField(OutputUrl, default=[], blank=True)
 
     def __init__(self, *args, **kwargs):
         super(TestLifeStream, self).__init__(*args, **kwargs)
 
-    def get_type(self) -> constants.StreamType:
-        return constants.StreamType.TEST_LIFE
-
 
 class CodRelayStream(RelayStream):
+    STREAM_TYPE = constants.StreamType.COD_RELAY
+
     def __init__(self, *args, **kwargs):
         super(CodRelayStream, self).__init__(*args, **kwargs)
 
-    def get_type(self) -> constants.StreamType:
-        return constants.StreamType.COD_RELAY
-
 
 class CodEncodeStream(EncodeStream):
+    STREAM_TYPE = constants.StreamType.COD_ENCODE
+
     def __init__(self, *args, **kwargs):
         super(CodEncodeStream, self).__init__(*args, **kwargs)
 
-    def get_type(self) -> constants.StreamType:
-        return constants.StreamType.COD_ENCODE
-
 
 # VODS
 
@@ -410,35 +483,216 @@ class VodBasedStream(EmbeddedMongoModel):
 
 
 class ProxyVodStream(ProxyStream, VodBasedStream):
+    STREAM_TYPE = constants.StreamType.VOD_PROXY
+
     def __init__(self, *args, **kwargs):
         super(ProxyVodStream, self).__init__(*args, **kwargs)
         self.tvg_logo = constants.DEFAULT_STREAM_PREVIEW_ICON_URL
 
-    def get_type(self) -> constants.StreamType:
-        return constants.StreamType.VOD_PROXY
-
 
 class VodRelayStream(RelayStream, VodBasedStream):
+    STREAM_TYPE = constants.StreamType.VOD_RELAY
+
     def __init__(self, *args, **kwargs):
         super(VodRelayStream, self).__init__(*args, **kwargs)
         self.tvg_logo = constants.DEFAULT_STREAM_PREVIEW_ICON_URL
 
-    def get_type(self) -> constants.StreamType:
-        return constants.StreamType.VOD_RELAY
-
 
 class VodEncodeStream(EncodeStream, VodBasedStream):
+    STREAM_TYPE = constants.StreamType.VOD_ENCODE
+
     def __init__(self, *args, **kwargs):
         super(VodEncodeStream, self).__init__(*args, **kwargs)
         self.tvg_logo = constants.DEFAULT_STREAM_PREVIEW_ICON_URL
 
-    def get_type(self) -> constants.StreamType:
-        return constants.StreamType.VOD_ENCODE
-
 
 class EventStream(VodEncodeStream):
-    def get_type(self) -> constants.StreamType:
-        return constants.StreamType.EVENT
+    STREAM_TYPE = constants.StreamType.EVENT
 
 
 IStream.register_delete_rule(IStream, 'IStream.parts', fields.ReferenceField.PULL)
+
+
+def get_stream_class_by_class_name(cls_name: str):
+    return STREAM_CLASSES_BY_CLS_NAME.get(cls_name)
+
+
+def get_stream_type_by_class_name(cls_name: str):
+    cls = get_stream_class_by_class_name(cls_name)
+    return cls.STREAM_TYPE if cls else None
+
+
+def get_document_stream_type(document: dict):
+    # stream type of a raw stream document, without building the model
+    return get_stream_type_by_class_name(document.get('_cls'))
+
+
+def make_stream_from_document(document: dict):
+    # like IStream.from_document, but the class is taken from the registry by _cls
+    # classes without STREAM_TYPE are resolved by pymodm, ValueError if _cls is not a known model
+    cls = get_stream_class_by_class_name(document.get('_cls'))
+    if cls is None:
+        try:
+            return IStream.from_document(document)
+        except ModelDoesNotExist:
+            raise ValueError('unknown stream class: {0}'.format(document.get('_cls')))
+
+    stream = cls()
+    stream._set_attributes(document)
+    return stream
+
+
+def get_device_playlist_templates(sids: [ObjectId]) -> dict:
+    # stream id -> device playlist template of the stored streams, one projected query for the current versions,
+    # only streams without a cached template of their version are loaded
+    templates = {}
+    missing = []
+    for doc in IStream._mongometa.collection.find({'_id': {'$in': sids}}, {'version': 1}):
+        template = DEVICE_PLAYLIST_TEMPLATES_CACHE.get((doc['_id'], doc.get('version')))
+        if template is None:
+            missing.append(doc['_id'])
+        else:
+            templates[doc['_id']] = template
+
+    if missing:
+        for stream in IStream.objects.raw({'_id': {'$in': missing}}):
+            template = templates[stream.pk] = stream.get_device_playlist_template()
+            DEVICE_PLAYLIST_TEMPLATES_CACHE.put((stream.pk, stream.version), template)
+    return templates
+
+
+def make_stream_types_query(stream_types) -> dict:
+    # MongoDB filter on _cls matching streams of the given types, e.g. constants.VOD_STREAM_TYPES
+    names = set()
+    for stream_type in stream_types:
+        names.update(cls._mongometa.object_name for cls in STREAM_CLASSES_BY_TYPE.get(stream_type, ()))
+    return {'_cls': {'$in': sorted(names)}}
+
+
+def _load_stream_catchups(sid: ObjectId):
+    doc = IStream._mongometa.collection.find_one({'_id': sid}, {'parts': 1})
+    parts = doc.get('parts') if doc else None
+    if not parts:
+        return []
+
+    query = make_stream_types_query([constants.StreamType.CATCHUP])
+    query['_id'] = {'$in': parts}
+    cursor = IStream._mongometa.collection.find(query, {'start': 1, 'stop': 1})
+    return [(catchup['start'], catchup['stop'], catchup['_id'], None) for catchup in cursor]
+
+
+# stream id -> catchup parts ids, loaded on first query of the stream
+CATCHUPS_INDEX = IntervalIndex(_load_stream_catchups, CATCHUPS_INDEX_TTL)
+
+
+def invalidate_streams_caches(sids: [ObjectId]):
+    # before a bulk delete of streams, which skips IStream.delete
+    # catchup intervals of the streams are dropped, parent channels catchups are reloaded on next query
+    for sid in sids:
+        CATCHUPS_INDEX.remove(sid)
+        CATCHUPS_INDEX.invalidate(sid)
+    for doc in IStream._mongometa.collection.find({'parts': {'$in': sids}}, {'_id': 1}):
+        CATCHUPS_INDEX.invalidate(doc['_id'])
+
+
+def get_stream_catchups_ids(sid: ObjectId, start: datetime, stop: datetime) -> [ObjectId]:
+    # catchup parts of the stream overlapping [start, stop), ordered by start
+    return CATCHUPS_INDEX.overlapping(sid, start, stop)
+
+
+def find_channel_catchups(tvg_id: str, start: datetime, stop: datetime):
+    # database query of the channel catchups overlapping [start, stop)
+    return CatchupStream.objects.raw({'tvg_id': tvg_id, 'start': {'$lt': stop}, 'stop': {'$gt': start}}).order_by(
+        [('start', ASCENDING)])
+
+
+class StreamFrontView:
+    # read-only front part of a stream document, loaded with PROJECTION without building the model
+    PROJECTION = {'_cls': 1, 'name': 1, 'tvg_logo': 1, 'price': 1, 'visible': 1, 'iarc': 1, 'group': 1, 'start': 1,
+                  'stop': 1}
+    EPOCH = datetime.utcfromtimestamp(0)
+
+    __slots__ = ('id', 'type', 'name', 'tvg_logo', 'price', 'visible', 'iarc', 'group', 'start', 'stop')
+
+    def __init__(self, document: dict):
+        self.id = document['_id']
+        self.type = get_document_stream_type(document)
+        self.name = document.get('name', constants.DEFAULT_STREAM_NAME)
+        self.tvg_logo = document.get('tvg_logo', constants.DEFAULT_STREAM_ICON_URL)
+        self.price = document.get('price', 0.0)
+        self.visible = document.get('visible', True)
+        self.iarc = document.get('iarc', 21)
+        self.group = document.get('group', constants.DEFAULT_STREAM_GROUP_TITLE)
+        self.start = document.get('start', StreamFrontView.EPOCH)
+        self.stop = document.get('stop', StreamFrontView.EPOCH)
+
+    def get_id(self) -> str:
+        return str(self.id)
+
+    def get_type(self) -> constants.StreamType:
+        return self.type
+
+    def to_front_dict(self) -> dict:
+        front = {StreamFields.NAME_FIELD: self.name, StreamFields.ID_FIELD: self.get_id(),
+                 StreamFields.TYPE_FIELD: self.type,
+                 StreamFields.ICON_FIELD: self.tvg_logo, StreamFields.PRICE_FIELD: self.price,
+                 StreamFields.VISIBLE_FIELD: self.visible,
+                 StreamFields.IARC_FIELD: self.iarc, StreamFields.GROUP_FIELD: self.group}
+        if self.type == constants.StreamType.CATCHUP:
+            front[CatchupsFields.START_RECORD_FIELD] = date_to_utc_msec(self.start)
+            front[CatchupsFields.STOP_RECORD_FIELD] = date_to_utc_msec(self.stop)
+        return front
+
+
+def find_stream_front_views(sids: [ObjectId]) -> dict:
+    # stream id -> StreamFrontView, one query
+    cursor = IStream._mongometa.collection.find({'_id': {'$in': list(sids)}}, StreamFrontView.PROJECTION)
+    return {doc['_id']: StreamFrontView(doc) for doc in cursor}
+
+
+def iter_streams_by_ids(sids: [ObjectId], chunk_size=PLAYLIST_STREAMS_CHUNK_SIZE):
+    # streams in sids order, one query per chunk, missing streams are skipped
+    for start in range(0, len(sids), chunk_size):
+        chunk = sids[start:start + chunk_size]
+        cursor = IStream._mongometa.collection.find({'_id': {'$in': chunk}})
+        loaded = {doc['_id']: make_stream_from_document(doc) for doc in cursor}
+        for sid in chunk:
+            stream = loaded.get(sid)
+            if stream:
+                yield stream
+
+
+def renumber_streams_urls_ids(duplicates_only=True, chunk_size=PLAYLIST_STREAMS_CHUNK_SIZE) -> int:
+    # migration of ids generated by the old per process counter, returns the number of renumbered urls
+    # duplicates_only: keep the first url with an id, renumber the next ones (device links of them change)
+    seen = set()
+    updates = []
+    changed_sids = []
+    renumbered = 0
+    for doc in IStream._mongometa.collection.find({}, {'input.id': 1, 'output.id': 1}):
+        changes = {}
+        for field_name in ('input', 'output'):
+            for pos, url in enumerate(doc.get(field_name) or []):
+                url_id = url.get('id')
+                if not duplicates_only or url_id is None or url_id in seen:
+                    url_id = Url.generate_id()
+                    changes['{0}.{1}.id'.format(field_name, pos)] = url_id
+                seen.add(url_id)
+
+        if changes:
+            renumbered += len(changes)
+            changes['version'] = ObjectId()
+            updates.append(UpdateOne({'_id': doc['_id']}, {'$set': changes}))
+            changed_sids.append(doc['_id'])
+        if len(updates) >= chunk_size:
+            IStream._mongometa.collection.bulk_write(updates, ordered=False)
+            updates = []
+
+    if updates:
+        IStream._mongometa.collection.bulk_write(updates, ordered=False)
+
+    if changed_sids:
+        from pyfastocloud_models.service.entry import ServiceSettings
+        for start in range(0, len(changed_sids), chunk_size):
+            ServiceSettings.touch_content_by_streams(changed_sids[start:start + chunk_size])
+    return renumbered
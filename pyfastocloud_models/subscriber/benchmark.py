@@ -0,0 +1,140 @@
+import argparse
+
+from pyfastocloud_models.service.entry import ServiceSettings
+from pyfastocloud_models.stream.entry import DEVICE_PLAYLIST_TEMPLATES_CACHE
+from pyfastocloud_models.subscriber.entry import Device, Subscriber, UserStream
+from pyfastocloud_models.utils.benchmark import DEFAULT_BENCHMARK_MONGODB_URI, connect_benchmark_database, \
+    drop_benchmark_database, insert_benchmark_streams, measure
+from pyfastocloud_models.utils.prefetch import prefetch
+
+DEFAULT_SIZES = (1000, 10000)
+DEFAULT_OPERATIONS = 100
+DEFAULT_PLAYLIST_STREAMS = 5000
+DEFAULT_PLAYLIST_REQUESTS = 20
+DEFAULT_PREFETCH_SERVERS = 5
+DEFAULT_PREFETCH_STREAMS = 5000
+BENCHMARKS = ('streams', 'playlist', 'prefetch')
+
+
+def make_benchmark_subscriber(count: int) -> Subscriber:
+    # subscriber with one server of count streams, all of them selected
+    server = ServiceSettings()
+    server.streams = insert_benchmark_streams(count)
+    server.save()
+    subscriber = Subscriber.make_subscriber('benchmark{0}@example.com'.format(count), 'first', 'last', 'password',
+                                            'US', 'en')
+    subscriber.servers = [server]
+    subscriber.streams = [UserStream(sid=stream.id) for stream in server.streams]
+    subscriber.save()
+    return subscriber
+
+
+def benchmark_user_streams(counter, count: int, operations: int):
+    # add_official/remove_official of operations streams and select_all of a subscriber with count selected streams
+    subscriber = make_benchmark_subscriber(count)
+    extra = insert_benchmark_streams(operations, 'extra{0}'.format(count))
+    subscriber = Subscriber.objects.get({'_id': subscriber.pk})
+
+    def add():
+        for stream in extra:
+            subscriber.add_official_stream_by_id(stream.id)
+
+    def remove():
+        for stream in extra:
+            subscriber.remove_official_stream(stream)
+
+    def select_all():
+        subscriber.select_all_streams(True)
+
+    for name, func, calls in (('add_official', add, operations), ('remove_official', remove, operations),
+                              ('select_all', select_all, 1)):
+        counter.reset()
+        elapsed = measure(func)
+        print('{0} entries, {1}: {2:.3f}ms per call, {3} queries'.format(count, name, elapsed * 1000 / calls,
+                                                                          counter.queries))
+
+
+def benchmark_generate_playlist(counter, count: int, requests: int):
+    # generate_playlist of a device of a subscriber with count channels, the first request fills the templates cache
+    subscriber = make_benchmark_subscriber(count)
+    device = Device(name='benchmark')
+    subscriber.add_device(device)
+    subscriber = Subscriber.objects.get({'_id': subscriber.pk})
+    did = device.get_id()
+    DEVICE_PLAYLIST_TEMPLATES_CACHE.clear()
+
+    def request():
+        subscriber.generate_playlist(did, 'lb.example.com:81')
+
+    counter.reset()
+    elapsed = measure(request)
+    print('{0} channels, cold cache: {1:.1f} requests/s, {2} queries'.format(count, 1 / elapsed, counter.queries))
+    counter.reset()
+    elapsed = measure(lambda: [request() for _ in range(requests)])
+    print('{0} channels, warm cache: {1:.1f} requests/s, {2} queries per request'.format(
+        count, requests / elapsed, counter.queries / requests))
+
+
+def benchmark_prefetch(counter, servers_count: int, streams_count: int):
+    # queries of a subscriber graph walk with and without prefetch
+    servers = []
+    per_server = max(1, streams_count // servers_count)
+    for pos in range(servers_count):
+        server = ServiceSettings()
+        server.streams = insert_benchmark_streams(per_server, 'server{0}'.format(pos))
+        server.save()
+        servers.append(server)
+    subscriber = Subscriber.make_subscriber('prefetch@example.com', 'first', 'last', 'password', 'US', 'en')
+    subscriber.servers = servers
+    subscriber.streams = [UserStream(sid=stream) for server in servers for stream in server.streams]
+    subscriber.save()
+
+    def walk(with_prefetch: bool):
+        loaded = Subscriber.objects.get({'_id': subscriber.pk})
+        if with_prefetch:
+            prefetch(loaded, 'servers.streams', 'streams.sid')
+        for server in loaded.servers:
+            for stream in server.streams:
+                stream.get_type()
+        for user_stream in loaded.streams:
+            user_stream.sid.get_type()
+
+    for with_prefetch in (False, True):
+        counter.reset()
+        elapsed = measure(lambda: walk(with_prefetch))
+        print('{0} servers, {1} streams, {2}: {3} queries, {4:.2f}s'.format(
+            servers_count, per_server * servers_count, 'prefetch' if with_prefetch else 'lazy', counter.queries,
+            elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Subscriber streams benchmarks.')
+    parser.add_argument('--mongodb_uri', default=DEFAULT_BENCHMARK_MONGODB_URI, help='empty MongoDB database uri')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='selected streams counts')
+    parser.add_argument('--operations', type=int, default=DEFAULT_OPERATIONS, help='add/remove calls per size')
+    parser.add_argument('--playlist_streams', type=int, default=DEFAULT_PLAYLIST_STREAMS,
+                        help='channels of the playlist subscriber')
+    parser.add_argument('--playlist_requests', type=int, default=DEFAULT_PLAYLIST_REQUESTS,
+                        help='warm generate_playlist requests')
+    parser.add_argument('--prefetch_servers', type=int, default=DEFAULT_PREFETCH_SERVERS,
+                        help='servers of the prefetch subscriber')
+    parser.add_argument('--prefetch_streams', type=int, default=DEFAULT_PREFETCH_STREAMS,
+                        help='streams of the prefetch subscriber, split between servers')
+    parser.add_argument('--benchmarks', nargs='+', choices=BENCHMARKS, default=BENCHMARKS, help='benchmarks to run')
+    args = parser.parse_args()
+
+    counter = connect_benchmark_database(args.mongodb_uri)
+    try:
+        if 'streams' in args.benchmarks:
+            for count in args.sizes:
+                benchmark_user_streams(counter, count, args.operations)
+        if 'playlist' in args.benchmarks:
+            benchmark_generate_playlist(counter, args.playlist_streams, args.playlist_requests)
+        if 'prefetch' in args.benchmarks:
+            benchmark_prefetch(counter, args.prefetch_servers, args.prefetch_streams)
+    finally:
+        drop_benchmark_database()
+
+
+if __name__ == '__main__':
+    main()
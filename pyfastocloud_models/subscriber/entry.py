@@ -1,14 +1,28 @@
+import hmac
 from datetime import datetime
-from hashlib import md5
 from bson.objectid import ObjectId
+from bson.errors import InvalidId
 from enum import IntEnum
 
 from pymodm import MongoModel, fields, EmbeddedMongoModel
+from pymongo import IndexModel
+from pymodm.context_managers import no_auto_dereference
 
 from pyfastocloud_models.service.entry import ServiceSettings
-from pyfastocloud_models.stream.entry import IStream
+from pyfastocloud_models.stream.entry import IStream, make_stream_types_query, make_stream_from_document, \
+    find_stream_front_views, make_device_playlist_link_prefix, render_device_playlist_template, write_playlist, \
+    M3U_HEADER, PLAYLIST_STREAMS_CHUNK_SIZE, get_device_playlist_templates
 import pyfastocloud_models.constants as constants
 from pyfastocloud_models.utils.utils import date_to_utc_msec
+from pyfastocloud_models.utils.prefetch import prefetch
+from pyfastocloud_models.utils.cache import LRUCache
+from pyfastocloud_models.utils.hashers import PasswordHashers, VerificationCache, MD5PasswordHasher, \
+    PBKDF2PasswordHasher, ScryptPasswordHasher, check_password
+
+
+DEVICES_AUTH_CACHE_SIZE = 100000
+DEVICES_AUTH_CACHE_TTL = 60
+DEVICES_AUTH_NEGATIVE_CACHE_TTL = 5
 
 
 def is_vod_stream(stream: IStream):
@@ -16,9 +30,7 @@ def is_vod_stream(stream: IStream):
         return False
     if not stream.visible:
         return False
-    stream_type = stream.get_type()
-    return stream_type == constants.StreamType.VOD_PROXY or stream_type == constants.StreamType.VOD_RELAY or \
-           stream_type == constants.StreamType.VOD_ENCODE
+    return stream.get_type() in constants.VOD_STREAM_TYPES
 
 
 def is_live_stream(stream: IStream):
@@ -26,11 +38,7 @@ def is_live_stream(stream: IStream):
         return False
     if not stream.visible:
         return False
-    stream_type = stream.get_type()
-    return stream_type == constants.StreamType.PROXY or stream_type == constants.StreamType.RELAY or \
-           stream_type == constants.StreamType.ENCODE or stream_type == constants.StreamType.TIMESHIFT_PLAYER or \
-           stream_type == constants.StreamType.COD_RELAY or stream_type == constants.StreamType.COD_ENCODE or \
-           stream_type == constants.StreamType.EVENT
+    return stream.get_type() in constants.LIVE_STREAM_TYPES
 
 
 def is_catchup(stream: IStream):
@@ -38,8 +46,7 @@ def is_catchup(stream: IStream):
         return False
     if not stream.visible:
         return False
-    stream_type = stream.get_type()
-    return stream_type == constants.StreamType.CATCHUP
+    return stream.get_type() in constants.CATCHUP_STREAM_TYPES
 
 
 def for_subscribers_stream(stream: IStream):
@@ -47,7 +54,7 @@ def for_subscribers_stream(stream: IStream):
         return False
     if not stream.visible:
         return False
-    return is_vod_stream(stream) or is_live_stream(stream) or is_catchup(stream)
+    return stream.get_type() in constants.SUBSCRIBERS_STREAM_TYPES
 
 
 class Device(EmbeddedMongoModel):
@@ -105,18 +112,143 @@ class UserStream(EmbeddedMongoModel):
     def get_id(self) -> str:
         return str(self.pk)
 
-    def to_front_dict(self):
-        res = self.sid.to_front_dict()
+    def get_stream_id(self) -> ObjectId:
+        # without dereferencing sid
+        with no_auto_dereference(UserStream):
+            sid = self.sid
+        return sid.pk if isinstance(sid, IStream) else sid
+
+    def to_front_dict(self, stream=None):
+        # stream: already loaded sid model or StreamFrontView
+        res = (stream if stream else self.sid).to_front_dict()
         res[UserStream.FAVORITE_FIELD] = self.favorite
         res[UserStream.PRIVATE_FIELD] = self.private
         res[UserStream.RECENT_FIELD] = date_to_utc_msec(self.recent)
         return res
 
 
+def make_user_streams_front_dicts(user_streams: [UserStream]) -> [dict]:
+    # front dicts via StreamFrontView, one projected query, missing streams are skipped
+    views = find_stream_front_views([user_stream.get_stream_id() for user_stream in user_streams])
+    result = []
+    for user_stream in user_streams:
+        view = views.get(user_stream.get_stream_id())
+        if view:
+            result.append(user_stream.to_front_dict(view))
+    return result
+
+
+class UserStreamsIndex:
+    # (private, stream id) -> UserStream over one of the subscriber content lists
+    def __init__(self, user_streams: list):
+        self.user_streams = user_streams
+        self._size = len(user_streams)
+        self._index = {}
+        for user_stream in user_streams:
+            self._index.setdefault((user_stream.private, user_stream.get_stream_id()), user_stream)
+
+    def is_actual(self, user_streams: list) -> bool:
+        return self.user_streams is user_streams and self._size == len(user_streams)
+
+    def find(self, sid: ObjectId, private: bool):
+        return self._index.get((private, sid))
+
+    def add(self, user_stream: UserStream):
+        self.user_streams.append(user_stream)
+        self._size += 1
+        self._index.setdefault((user_stream.private, user_stream.get_stream_id()), user_stream)
+
+    def remove(self, sid: ObjectId, private: bool):
+        user_stream = self._index.pop((private, sid), None)
+        if user_stream is None:
+            return None
+
+        for idx, stream in enumerate(self.user_streams):
+            if stream is user_stream:
+                del self.user_streams[idx]
+                self._size -= 1
+                break
+        return user_stream
+
+
+class SubscriberDevicesAuth:
+    # authorization relevant part of a subscriber document
+    __slots__ = ('status', 'exp_date', 'password', 'devices')
+
+    PROJECTION = {'status': 1, 'exp_date': 1, 'password': 1, 'devices._id': 1, 'devices.status': 1}
+
+    def __init__(self, status: int, exp_date: datetime, password: str, devices: dict):
+        self.status = status
+        self.exp_date = exp_date
+        self.password = password
+        self.devices = devices  # device id -> Device.Status
+
+    @classmethod
+    def from_document(cls, doc: dict):
+        devices = {dev['_id']: dev.get('status', Device.Status.NOT_ACTIVE) for dev in doc.get('devices', [])}
+        return cls(doc.get('status', Subscriber.Status.NOT_ACTIVE), doc.get('exp_date', Subscriber.MAX_DATE),
+                   doc['password'], devices)
+
+    def is_authorized(self, pass_hash: str, did: ObjectId) -> bool:
+        if self.status != Subscriber.Status.ACTIVE or self.exp_date <= datetime.now():
+            return False
+        # NOT_ACTIVE is the status of a device added by the subscriber until the server marks it ACTIVE on its
+        # first connection, so refusing it would lock out new devices, only BANNED ones are refused
+        device_status = self.devices.get(did)
+        if device_status is None or device_status == Device.Status.BANNED:
+            return False
+        return hmac.compare_digest(pass_hash.encode('utf-8'), self.password.encode('utf-8'))
+
+
+class DevicesRegistry:
+    # subscriber id -> SubscriberDevicesAuth, LRU+TTL cache in front of the subscribers collection
+    # a subscriber invalidates its entry on every save or atomic update, ttl bounds other writers
+    _UNKNOWN = object()
+
+    def __init__(self, max_size=DEVICES_AUTH_CACHE_SIZE, ttl=DEVICES_AUTH_CACHE_TTL,
+                 negative_ttl=DEVICES_AUTH_NEGATIVE_CACHE_TTL):
+        self.negative_ttl = negative_ttl
+        self._cache = LRUCache(max_size, ttl)
+
+    def get(self, sid: ObjectId):
+        # SubscriberDevicesAuth or None if there is no such subscriber
+        auth = self._cache.get(sid)
+        if auth is None:
+            doc = Subscriber._mongometa.collection.find_one({'_id': sid}, SubscriberDevicesAuth.PROJECTION)
+            if doc is None:
+                self._cache.put(sid, DevicesRegistry._UNKNOWN, self.negative_ttl)
+                return None
+            auth = SubscriberDevicesAuth.from_document(doc)
+            self._cache.put(sid, auth)
+        return None if auth is DevicesRegistry._UNKNOWN else auth
+
+    def authorize(self, uid, pass_hash: str, did) -> bool:
+        # per request check of (subscriber id, stored password hash, device id), ids as ObjectId or str
+        try:
+            sid = uid if isinstance(uid, ObjectId) else ObjectId(uid)
+            did = did if isinstance(did, ObjectId) else ObjectId(did)
+        except (InvalidId, TypeError):
+            return False
+
+        auth = self.get(sid)
+        return auth is not None and auth.is_authorized(pass_hash, did)
+
+    def invalidate(self, sid: ObjectId):
+        self._cache.pop(sid)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
 class Subscriber(MongoModel):
     class Meta:
         collection_name = 'subscribers'
         allow_inheritance = True
+        indexes = [IndexModel('streams.sid'), IndexModel('vods.sid'), IndexModel('catchups.sid'),
+                   IndexModel('devices._id')]
 
     MAX_DATE = datetime(2100, 1, 1)
     ID_FIELD = 'id'
@@ -140,25 +272,36 @@ class Subscriber(MongoModel):
             return str(self.value)
 
     SUBSCRIBER_HASH_LENGTH = 32
+    MAX_PASSWORD_HASH_LENGTH = 256
+    # md5 stays the default, device links and clients use the stored hash, other formats are verified
+    # set PBKDF2PasswordHasher as default to migrate, passwords are rehashed on login
+    PASSWORD_HASHERS = PasswordHashers(MD5PasswordHasher(), PBKDF2PasswordHasher(), ScryptPasswordHasher())
+    PASSWORD_VERIFICATION_CACHE = VerificationCache()
+    DEVICES_REGISTRY = DevicesRegistry()
 
     email = fields.CharField(max_length=64, required=True)
     first_name = fields.CharField(max_length=64, required=True)
     last_name = fields.CharField(max_length=64, required=True)
-    password = fields.CharField(min_length=SUBSCRIBER_HASH_LENGTH, max_length=SUBSCRIBER_HASH_LENGTH, required=True)
+    password = fields.CharField(min_length=SUBSCRIBER_HASH_LENGTH, max_length=MAX_PASSWORD_HASH_LENGTH, required=True)
     created_date = fields.DateTimeField(default=datetime.now)
     exp_date = fields.DateTimeField(default=MAX_DATE)
     status = fields.IntegerField(default=Status.NOT_ACTIVE)
-    country = fields.CharField(min_length=2, max_length=3, required=True)
+    country = fields.CharField(min_length=2, max_length=3, required=True, validators=[constants.validate_country_code])
     language = fields.CharField(default=constants.DEFAULT_LOCALE, required=True)
 
-    servers = fields.ListField(fields.ReferenceField(ServiceSettings, on_delete=fields.ReferenceField.PULL), default=[],
+    servers = fields.ListField(fields.ReferenceField(ServiceSettings, on_delete=fields.ReferenceField.PULL), default=list,
                                blank=True)
-    devices = fields.EmbeddedDocumentListField(Device, default=[], blank=True)
+    devices = fields.EmbeddedDocumentListField(Device, default=list, blank=True)
     max_devices_count = fields.IntegerField(default=constants.DEFAULT_DEVICES_COUNT)
     # content
-    streams = fields.EmbeddedDocumentListField(UserStream, default=[], blank=True)
-    vods = fields.EmbeddedDocumentListField(UserStream, default=[], blank=True)
-    catchups = fields.EmbeddedDocumentListField(UserStream, default=[], blank=True)
+    streams = fields.EmbeddedDocumentListField(UserStream, default=list, blank=True)
+    vods = fields.EmbeddedDocumentListField(UserStream, default=list, blank=True)
+    catchups = fields.EmbeddedDocumentListField(UserStream, default=list, blank=True)
+
+    def __init__(self, *args, **kwargs):
+        super(Subscriber, self).__init__(*args, **kwargs)
+        self._user_streams_indexes = {}
+        self._devices_index = None
 
     def get_id(self) -> str:
         return str(self.pk)
@@ -174,42 +317,57 @@ class Subscriber(MongoModel):
         return date_to_utc_msec(self.exp_date)
 
     def add_server(self, server: ServiceSettings):
-        self.servers.append(server)
-        self.save()
+        self._update({'$addToSet': {'servers': server.id}}, lambda: self.servers.append(server),
+                     {'servers': {'$ne': server.id}})
 
-    def add_device(self, device: Device):
-        if len(self.devices) < self.max_devices_count:
-            self.devices.append(device)
-            self.save()
+    def add_device(self, device: Device) -> bool:
+        if len(self.devices) >= self.max_devices_count:
+            return False
+
+        # devices count limit is checked by the server too
+        limit = {'devices.{0}'.format(self.max_devices_count - 1): {'$exists': False}}
+        device.full_clean()
+        return self._update({'$push': {'devices': device.to_son()}}, lambda: self.devices.append(device), limit)
 
     def remove_device(self, did: ObjectId):
-        for dev in self.devices:
-            if dev.id == did:
+        def remove():
+            dev = self.find_device(did)
+            if dev is not None:
                 self.devices.remove(dev)
-                break
-        self.save()
+
+        self._update({'$pull': {'devices': {'_id': did}}}, remove)
 
         # devices = self.devices.get({'id': sid})
         # if devices:
         #    devices.delete()
 
     def find_device(self, did: ObjectId):
-        for dev in self.devices:
-            if dev.id == did:
-                return dev
+        return self._get_devices_index().get(did)
 
-        return None
+    @classmethod
+    def find_by_device_id(cls, did: ObjectId):
+        try:
+            return cls.objects.get({'devices._id': did})
+        except cls.DoesNotExist:
+            return None
+
+    @staticmethod
+    def authorize_device(uid, pass_hash: str, did) -> bool:
+        return Subscriber.DEVICES_REGISTRY.authorize(uid, pass_hash, did)
 
     def generate_playlist(self, did: str, lb_server_host_and_port: str) -> str:
-        result = '#EXTM3U\n'
-        sid = str(self.id)
-        for stream in self.streams:
-            if stream.private:
-                result += stream.sid.generate_playlist(False)
-            else:
-                result += stream.sid.generate_device_playlist(sid, self.password, did, lb_server_host_and_port, False)
+        return ''.join(self.iter_playlist(did, lb_server_host_and_port))
 
-        return result
+    def iter_playlist(self, did: str, lb_server_host_and_port: str):
+        # one fragment per chunk of streams, official streams are rendered from cached templates
+        yield M3U_HEADER
+        link_prefix = make_device_playlist_link_prefix(str(self.id), self.password, did, lb_server_host_and_port)
+        user_streams = self.streams
+        for start in range(0, len(user_streams), PLAYLIST_STREAMS_CHUNK_SIZE):
+            yield self._render_playlist_chunk(user_streams[start:start + PLAYLIST_STREAMS_CHUNK_SIZE], link_prefix)
+
+    def write_playlist(self, fp, did: str, lb_server_host_and_port: str):
+        write_playlist(fp, self.iter_playlist(did, lb_server_host_and_port))
 
     def all_streams(self):
         return self.streams
@@ -220,24 +378,10 @@ class Subscriber(MongoModel):
         self.add_official_stream(user_stream)
 
     def add_official_stream(self, user_stream: UserStream):
-        if not user_stream:
-            return
-
-        for stream in self.streams:
-            if not stream.private and stream.sid == user_stream.sid:
-                return
-
-        self.streams.append(user_stream)
-        self.save()
+        self._add_official_user_stream('streams', user_stream)
 
     def remove_official_stream(self, ostream: IStream):
-        if not ostream:
-            return
-
-        for stream in self.streams:
-            if not stream.private and stream.sid == ostream:
-                self.streams.remove(stream)
-        self.save()
+        self._remove_official_user_stream('streams', ostream)
 
     def remove_official_stream_by_id(self, sid: ObjectId):
         original_stream = IStream.get_stream_by_id(sid)
@@ -249,24 +393,10 @@ class Subscriber(MongoModel):
         self.add_official_vod(user_stream)
 
     def add_official_vod(self, user_stream: UserStream):
-        if not user_stream:
-            return
-
-        for vod in self.vods:
-            if not vod.private and vod.sid == user_stream.sid:
-                return
-
-        self.vods.append(user_stream)
-        self.save()
+        self._add_official_user_stream('vods', user_stream)
 
     def remove_official_vod(self, ostream: IStream):
-        if not ostream:
-            return
-
-        for vod in self.vods:
-            if not vod.private and vod.sid == ostream:
-                self.vods.remove(vod)
-        self.save()
+        self._remove_official_user_stream('vods', ostream)
 
     def remove_official_vod_by_id(self, sid: ObjectId):
         original_stream = IStream.get_stream_by_id(sid)
@@ -278,24 +408,10 @@ class Subscriber(MongoModel):
         self.add_official_catchup(user_stream)
 
     def add_official_catchup(self, user_stream: UserStream):
-        if not user_stream:
-            return
-
-        for catchup in self.catchups:
-            if not catchup.private and catchup.sid == user_stream.sid:
-                return
-
-        self.catchups.append(user_stream)
-        self.save()
+        self._add_official_user_stream('catchups', user_stream)
 
     def remove_official_catchup(self, ostream: IStream):
-        if not ostream:
-            return
-
-        for catchup in self.catchups:
-            if not catchup.private and catchup.sid == ostream:
-                self.catchups.remove(catchup)
-        self.save()
+        self._remove_official_user_stream('catchups', ostream)
 
     def remove_official_catchup_by_id(self, sid: ObjectId):
         original_stream = IStream.get_stream_by_id(sid)
@@ -303,52 +419,22 @@ class Subscriber(MongoModel):
 
     # own
     def add_own_stream(self, user_stream: UserStream):
-        for stream in self.streams:
-            if stream.private and stream.sid == user_stream:
-                return
-
-        user_stream.private = True
-        self.streams.append(user_stream)
-        self.save()
+        self._add_own_user_stream('streams', user_stream)
 
     def remove_own_stream_by_id(self, sid: ObjectId):
-        stream = IStream.get_stream_by_id(sid)
-        if stream:
-            for stream in self.streams:
-                if stream.sid == sid:
-                    self.stream.remove(stream)
-            stream.delete()
-            self.save()
+        self._remove_own_user_stream('streams', sid)
 
     def remove_all_own_streams(self):
-        for stream in self.streams:
-            if stream.private:
-                self.streams.remove(stream)
-        self.save()
+        self._remove_all_own_user_streams('streams')
 
     def add_own_vod(self, user_stream: UserStream):
-        for vod in self.vod:
-            if vod.private and vod.sid == user_stream.sid:
-                return
-
-        user_stream.private = True
-        self.vod.append(user_stream)
-        self.save()
+        self._add_own_user_stream('vods', user_stream)
 
     def remove_own_vod_by_id(self, sid: ObjectId):
-        vod = IStream.get_stream_by_id(sid)
-        if vod:
-            for vod in self.vod:
-                if vod.private and vod.sid == sid:
-                    self.vod.remove(vod)
-            vod.delete()
-            self.save()
+        self._remove_own_user_stream('vods', sid)
 
     def remove_all_own_vods(self):
-        for stream in self.vods:
-            if stream.private:
-                self.vods.remove(stream)
-        self.save()
+        self._remove_all_own_user_streams('vods')
 
     # available
     def official_streams(self):
@@ -387,6 +473,7 @@ class Subscriber(MongoModel):
         return self.servers
 
     def all_available_official_streams(self) -> [IStream]:
+        prefetch(self, 'servers.streams')
         streams = []
         for serv in self.servers:
             for stream in serv.streams:
@@ -396,6 +483,7 @@ class Subscriber(MongoModel):
         return streams
 
     def all_available_official_vods(self) -> [IStream]:
+        prefetch(self, 'servers.streams')
         streams = []
         for serv in self.servers:
             for stream in serv.streams:
@@ -405,6 +493,7 @@ class Subscriber(MongoModel):
         return streams
 
     def all_available_official_catchups(self) -> [IStream]:
+        prefetch(self, 'servers.streams')
         streams = []
         for serv in self.servers:
             for stream in serv.streams:
@@ -413,90 +502,231 @@ class Subscriber(MongoModel):
 
         return streams
 
-    # select
-    def select_all_streams(self, select: bool):
-        if not select:
-            self.streams = []
-            self.save()
-            return
-
-        ustreams = []
-        for stream in self.all_available_official_streams():
-            user_stream = UserStream(sid=stream.id)
-            for stream in self.streams:
-                if not stream.private and stream.sid == user_stream.sid:
-                    user_stream = stream
-                    break
-            ustreams.append(user_stream)
+    # server side variants of all_available_official_*, same order, a stream of several servers is repeated
+    # projection: list of field names to load, skip/limit: pagination
+    def find_available_official_streams(self, projection=None, skip=0, limit=0):
+        return self._find_available_official(constants.LIVE_STREAM_TYPES, projection, skip, limit)
 
-        self.streams = ustreams
-        self.save()
+    def find_available_official_vods(self, projection=None, skip=0, limit=0):
+        return self._find_available_official(constants.VOD_STREAM_TYPES, projection, skip, limit)
 
-    def select_all_vods(self, select: bool):
-        if not select:
-            self.vods = []
-            self.save()
-            return
+    def find_available_official_catchups(self, projection=None, skip=0, limit=0):
+        return self._find_available_official(constants.CATCHUP_STREAM_TYPES, projection, skip, limit)
 
-        ustreams = []
-        for ovod in self.all_available_official_vods():
-            user_vod = UserStream(sid=ovod.id)
-            for vod in self.vods:
-                if not vod.private and vod.sid == user_vod.sid:
-                    user_vod = vod
-                    break
-            ustreams.append(user_vod)
+    # select
+    def select_all_streams(self, select: bool):
+        self._select_all_user_streams('streams', self.all_available_official_streams() if select else [])
 
-        self.vods = ustreams
-        self.save()
+    def select_all_vods(self, select: bool):
+        self._select_all_user_streams('vods', self.all_available_official_vods() if select else [])
 
     def select_all_catchups(self, select: bool):
-        if not select:
-            self.catchups = []
-            self.save()
-            return
+        self._select_all_user_streams('catchups', self.all_available_official_catchups() if select else [])
 
-        ustreams = []
-        for ocatchup in self.all_available_official_catchups():
-            user_catchup = UserStream(sid=ocatchup.id)
-            for catchup in self.catchups:
-                if not catchup.private and catchup.sid == user_catchup.sid:
-                    user_catchup = catchup
-                    break
-            ustreams.append(user_catchup)
-
-        self.catchups = ustreams
-        self.save()
+    def save(self, *args, **kwargs):
+        result = super(Subscriber, self).save(*args, **kwargs)
+        Subscriber.DEVICES_REGISTRY.invalidate(self.pk)
+        return result
 
     def delete(self, *args, **kwargs):
         self.remove_all_own_streams()
         self.remove_all_own_vods()
+        Subscriber.DEVICES_REGISTRY.invalidate(self.pk)
         return super(Subscriber, self).delete(*args, **kwargs)
 
     def delete_fake(self, *args, **kwargs):
         self.remove_all_own_streams()
         self.remove_all_own_vods()
-        self.status = Subscriber.Status.DELETED
-        self.save()
+
+        def apply():
+            self.status = Subscriber.Status.DELETED
+
+        self._update({'$set': {'status': Subscriber.Status.DELETED}}, apply)
         # return Document.delete(self, *args, **kwargs)
 
     @staticmethod
     def make_md5_hash_from_password(password: str) -> str:
-        m = md5()
-        m.update(password.encode())
-        return m.hexdigest()
+        return MD5PasswordHasher().encode(password)
 
     @staticmethod
     def generate_password_hash(password: str) -> str:
-        return Subscriber.make_md5_hash_from_password(password)
+        return Subscriber.PASSWORD_HASHERS.encode(password)
 
     @staticmethod
     def check_password_hash(hash_str: str, password: str) -> bool:
-        return hash_str == Subscriber.generate_password_hash(password)
+        return Subscriber.PASSWORD_HASHERS.verify(password, hash_str)
+
+    def check_password(self, password: str) -> bool:
+        # cached verification, a hash in an outdated format is replaced on success
+        hashers = Subscriber.PASSWORD_HASHERS
+        if not check_password(hashers, Subscriber.PASSWORD_VERIFICATION_CACHE, self.pk, password, self.password):
+            return False
+
+        if hashers.needs_rehash(self.password):
+            old_hash, new_hash = self.password, hashers.encode(password)
+            self._update({'$set': {'password': new_hash}}, lambda: setattr(self, 'password', new_hash),
+                         {'password': old_hash})
+        return True
+
+    # private
+    @staticmethod
+    def _render_playlist_chunk(user_streams: [UserStream], link_prefix: str) -> str:
+        # official streams are rendered from cached templates, private streams are loaded
+        templates = get_device_playlist_templates(
+            [stream.get_stream_id() for stream in user_streams if not stream.private])
+        private = [stream.get_stream_id() for stream in user_streams if stream.private]
+        loaded = {stream.id: stream for stream in IStream.objects.raw({'_id': {'$in': private}})} if private else {}
+        result = []
+        for stream in user_streams:
+            stream_id = stream.get_stream_id()
+            if stream.private:
+                original = loaded.get(stream_id)
+                if original:
+                    result.extend(original.iter_playlist(False))
+                continue
+
+            template = templates.get(stream_id)
+            if template is not None:
+                render_device_playlist_template(result, template, link_prefix)
+
+        return ''.join(result)
+
+    def _get_available_stream_ids(self) -> [ObjectId]:
+        # stream ids of the servers in servers order, a stream of several servers is repeated
+        with no_auto_dereference(Subscriber):
+            servers = list(self.servers)
+
+        server_ids = [server for server in servers if not isinstance(server, ServiceSettings)]
+        loaded = {}
+        if server_ids:
+            for doc in ServiceSettings._mongometa.collection.find({'_id': {'$in': server_ids}}, {'streams': 1}):
+                loaded[doc['_id']] = doc.get('streams', [])
+
+        sids = []
+        for server in servers:
+            if isinstance(server, ServiceSettings):
+                sids.extend(server.get_stream_ids())
+            else:
+                sids.extend(loaded.get(server, []))
+        return sids
+
+    def _find_available_official(self, stream_types, projection=None, skip=0, limit=0) -> [IStream]:
+        # same streams in the same order as the all_available_official_* loops
+        # projection: MongoDB field names to load (_cls is always loaded), skip/limit: pagination
+        sids = self._get_available_stream_ids()
+        query = {'_id': {'$in': list(set(sids))}, 'visible': {'$ne': False}}
+        query.update(make_stream_types_query(stream_types))
+        fields_projection = None
+        if projection:
+            fields_projection = {field: 1 for field in projection}
+            fields_projection['_cls'] = 1
+
+        collection = IStream._mongometa.collection
+        if skip or limit:
+            # matching ids first, only the streams of the page are loaded
+            matched = {doc['_id'] for doc in collection.find(query, {'_id': 1})}
+            sids = [sid for sid in sids if sid in matched]
+            sids = sids[skip:skip + limit] if limit else sids[skip:]
+            query = {'_id': {'$in': list(set(sids))}}
+
+        streams = {doc['_id']: make_stream_from_document(doc) for doc in collection.find(query, fields_projection)}
+        return [streams[sid] for sid in sids if sid in streams]
+
+    def _update(self, update: dict, apply, condition=None) -> bool:
+        # atomic update of the stored document, apply mirrors it on the instance
+        # returns False if the document did not match the condition
+        if self.pk is None:
+            apply()
+            self.save()
+            return True
+
+        query = {'_id': self.pk}
+        if condition:
+            query.update(condition)
+        result = self._mongometa.collection.update_one(query, update)
+        if not result.matched_count:
+            return False
+
+        apply()
+        Subscriber.DEVICES_REGISTRY.invalidate(self.pk)
+        return True
+
+    def _get_devices_index(self) -> dict:
+        # device id -> Device, rebuilt when the devices list is replaced or resized
+        devices = self.devices
+        index = self._devices_index
+        if index is None or index[0] is not devices or index[1] != len(devices):
+            index = self._devices_index = (devices, len(devices), {dev.id: dev for dev in devices})
+        return index[2]
+
+    def _get_user_streams_index(self, field_name: str) -> UserStreamsIndex:
+        user_streams = getattr(self, field_name)
+        index = self._user_streams_indexes.get(field_name)
+        if index is None or not index.is_actual(user_streams):
+            index = UserStreamsIndex(user_streams)
+            self._user_streams_indexes[field_name] = index
+        return index
+
+    def _add_user_stream(self, field_name: str, user_stream: UserStream, private: bool):
+        index = self._get_user_streams_index(field_name)
+        sid = user_stream.get_stream_id()
+        if index.find(sid, private):
+            return
+
+        private = True if private else {'$ne': True}
+        absent = {field_name: {'$not': {'$elemMatch': {'sid': sid, 'private': private}}}}
+        user_stream.full_clean()
+        self._update({'$push': {field_name: user_stream.to_son()}}, lambda: index.add(user_stream), absent)
+
+    def _add_official_user_stream(self, field_name: str, user_stream: UserStream):
+        if not user_stream:
+            return
+
+        self._add_user_stream(field_name, user_stream, False)
+
+    def _remove_official_user_stream(self, field_name: str, ostream: IStream):
+        if not ostream:
+            return
+
+        index = self._get_user_streams_index(field_name)
+        self._update({'$pull': {field_name: {'sid': ostream.id, 'private': {'$ne': True}}}},
+                     lambda: index.remove(ostream.id, False))
+
+    def _add_own_user_stream(self, field_name: str, user_stream: UserStream):
+        user_stream.private = True
+        self._add_user_stream(field_name, user_stream, True)
+
+    def _remove_own_user_stream(self, field_name: str, sid: ObjectId):
+        stream = IStream.get_stream_by_id(sid)
+        if not stream:
+            return
+
+        index = self._get_user_streams_index(field_name)
+        self._update({'$pull': {field_name: {'sid': sid, 'private': True}}}, lambda: index.remove(sid, True))
+        stream.delete()
+
+    def _remove_all_own_user_streams(self, field_name: str):
+        def apply():
+            setattr(self, field_name, [stream for stream in getattr(self, field_name) if not stream.private])
+
+        self._update({'$pull': {field_name: {'private': True}}}, apply)
+
+    def _select_all_user_streams(self, field_name: str, available: [IStream]):
+        index = self._get_user_streams_index(field_name)
+        ustreams = []
+        for stream in available:
+            user_stream = index.find(stream.id, False)
+            if not user_stream:
+                user_stream = UserStream(sid=stream.id)
+                user_stream.full_clean()
+            ustreams.append(user_stream)
+
+        self._update({'$set': {field_name: [user_stream.to_son() for user_stream in ustreams]}},
+                     lambda: setattr(self, field_name, ustreams))
 
     @classmethod
     def make_subscriber(cls, email: str, first_name: str, last_name: str, password: str, country: str, language: str,
                         exp_date=MAX_DATE):
         return cls(email=email, first_name=first_name, last_name=last_name,
-                   password=Subscriber.make_md5_hash_from_password(password), country=country,
+                   password=Subscriber.generate_password_hash(password), country=country,
                    language=language, exp_date=exp_date)
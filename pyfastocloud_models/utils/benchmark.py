@@ -0,0 +1,238 @@
+import argparse
+import multiprocessing
+import os
+import re
+import tempfile
+import time
+
+from pymongo import monitoring
+
+from pyfastocloud_models.constants import AVAILABLE_COUNTRIES, is_valid_country_code
+from pyfastocloud_models.utils.email_validator import DEFAULT_DISPOSABLE_DOMAINS, EmailValidator
+from pyfastocloud_models.utils.hashers import MD5PasswordHasher, PBKDF2PasswordHasher, PasswordHashers, \
+    ScryptPasswordHasher, VerificationCache, check_password
+from pyfastocloud_models.utils.m3u_parser import EXTINF_TAG, EXTM3U_TAG, UNKNOWN_VALUE, M3uParser, iter_entries
+
+DEFAULT_BENCHMARK_MONGODB_URI = 'mongodb://localhost:27017/pyfastocloud_models_benchmark'
+DEFAULT_M3U_ENTRIES = (10000, 100000, 1000000)
+DEFAULT_COUNTRY_CODES = 1000000
+DEFAULT_LOGINS = 20
+DEFAULT_EMAILS = 100000
+DEFAULT_EMAIL_DOMAINS = 1000
+
+
+class QueryCounter(monitoring.CommandListener):
+    # counts queries sent to MongoDB, registered by connect_benchmark_database
+    QUERY_COMMANDS = frozenset(('find', 'getMore', 'aggregate', 'count', 'distinct'))
+
+    def __init__(self):
+        self.queries = 0
+
+    def reset(self):
+        self.queries = 0
+
+    def started(self, event):
+        if event.command_name in QueryCounter.QUERY_COMMANDS:
+            self.queries += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def connect_benchmark_database(mongodb_uri: str) -> QueryCounter:
+    # benchmarks fill the database with synthetic documents and drop it, it should be empty
+    from pymodm import connect
+    from pymodm.connection import _get_db
+
+    counter = QueryCounter()
+    connect(mongodb_uri, event_listeners=[counter])
+    database = _get_db()
+    if database.list_collection_names():
+        raise ValueError('benchmark database {0} is not empty'.format(database.name))
+    return counter
+
+
+def drop_benchmark_database():
+    from pymodm.connection import _get_db
+
+    database = _get_db()
+    database.client.drop_database(database.name)
+
+
+def insert_benchmark_streams(count: int, prefix='stream') -> list:
+    # proxy streams with one output url, inserted in one batch
+    from pyfastocloud_models.common_entries import OutputUrl
+    from pyfastocloud_models.service.entry import ServiceSettings
+    from pyfastocloud_models.stream.entry import ProxyStream
+
+    streams = [ProxyStream(name='{0} {1}'.format(prefix, num), group='group',
+                           output=[OutputUrl(uri='http://origin/{0}/{1}/index.m3u8'.format(prefix, num))])
+               for num in range(count)]
+    ServiceSettings._bulk_insert_streams(streams)
+    return streams
+
+
+def measure(func, repeat=1) -> float:
+    # best wall time of repeat calls, in seconds
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+# m3u parser
+def generate_m3u(path: str, entries_count: int):
+    # synthetic playlist
+    with open(path, 'w') as file:
+        file.write(EXTM3U_TAG + '\n')
+        for pos in range(entries_count):
+            file.write('{0}:-1 tvg-id="id{1}" tvg-name="Channel {1}" tvg-logo="http://logos/{1}.png" '
+                       'group-title="Group {2}",Channel {1}\nhttp://origin/{1}/index.m3u8\n'.format(
+                           EXTINF_TAG, pos, pos % 100))
+
+
+def legacy_parse_m3u(path: str) -> list:
+    # the former whole file parser (read, split, five re.search per entry), the reference of the m3u benchmark
+    with open(path) as file:
+        lines = [line.rstrip() for line in file.read().split('\n')]
+    lines = [line for line in lines if line and (line[0] != '#' or line.startswith(EXTINF_TAG) or
+                                                  line.startswith(EXTM3U_TAG))]
+    result = []
+    for n, line_info in enumerate(lines[:-1]):
+        if line_info.startswith(EXTINF_TAG):
+            values = []
+            for pattern in ('tvg-name=\"(.*?)\"', 'tvg-id=\"(.*?)\"', 'tvg-logo=\"(.*?)\"', 'group-title=\"(.*?)\"',
+                            '[,](?!.*[,])(.*?)$'):
+                m = re.search(pattern, line_info)
+                values.append(m.group(1) if m else UNKNOWN_VALUE)
+            result.append({'title': values[4], 'tvg-name': values[0], 'tvg-id': values[1], 'tvg-logo': values[2],
+                           'tvg-group': values[3], 'link': lines[n + 1]})
+    return result
+
+
+def _parse_m3u_list(path: str) -> list:
+    parser = M3uParser()
+    parser.read_m3u(path)
+    parser.parse()
+    return parser.get_list()
+
+
+M3U_BENCHMARK_MODES = {'legacy': lambda path: len(legacy_parse_m3u(path)),
+                       'list': lambda path: len(_parse_m3u_list(path)),
+                       'iter': lambda path: sum(1 for _ in iter_entries(path))}
+
+
+def benchmark_m3u(args):
+    # each run in a fresh interpreter, so peak rss is its own
+    context = multiprocessing.get_context('spawn')
+    for entries_count in args.entries:
+        fd, path = tempfile.mkstemp(suffix='.m3u')
+        os.close(fd)
+        try:
+            generate_m3u(path, entries_count)
+            size = os.path.getsize(path) // 1024
+            for mode in args.modes:
+                results = context.Queue()
+                process = context.Process(target=_run_m3u_mode, args=(mode, path, results))
+                process.start()
+                count, elapsed, peak_rss = results.get()
+                process.join()
+                print('{0} entries ({1} KB), {2}: {3:.2f}s, {4:.0f} entries/s, peak rss {5} KB'.format(
+                    count, size, mode, elapsed, count / elapsed, peak_rss))
+        finally:
+            os.remove(path)
+
+
+# countries
+def benchmark_countries(args):
+    # every valid code and an unknown one, repeated up to count
+    samples = [code for code, _ in AVAILABLE_COUNTRIES] + ['XX']
+    codes = [samples[pos % len(samples)] for pos in range(args.count)]
+
+    def scan():
+        for code in codes:
+            any(code == country for country, _ in AVAILABLE_COUNTRIES)
+
+    def lookup():
+        for code in codes:
+            is_valid_country_code(code)
+
+    for name, func in (('list scan', scan), ('set lookup', lookup)):
+        elapsed = measure(func)
+        print('{0} codes, {1}: {2:.3f}s, {3:.0f} codes/s'.format(args.count, name, elapsed, args.count / elapsed))
+
+
+# passwords
+def measure_logins(hashers: PasswordHashers, cache=None, logins=DEFAULT_LOGINS, password='password') -> float:
+    # logins per second of the same user, after a first login
+    encoded = hashers.encode(password)
+    check_password(hashers, cache, 'uid', password, encoded)
+    return logins / measure(lambda: [check_password(hashers, cache, 'uid', password, encoded) for _ in range(logins)])
+
+
+def benchmark_hashers(args):
+    configurations = [('md5', PasswordHashers(MD5PasswordHasher())),
+                      ('pbkdf2_sha256', PasswordHashers(PBKDF2PasswordHasher())),
+                      ('scrypt', PasswordHashers(ScryptPasswordHasher()))]
+    for name, hashers in configurations:
+        uncached = measure_logins(hashers, None, args.logins)
+        cached = measure_logins(hashers, VerificationCache(), args.logins)
+        print('{0}: {1:.1f} logins/s, cached: {2:.1f} logins/s'.format(name, uncached, cached))
+
+
+# emails
+def benchmark_emails(args):
+    domains = ['example{0}.com'.format(i) for i in range(args.domains)] + list(DEFAULT_DISPOSABLE_DOMAINS)
+    emails = ['user{0}@{1}'.format(i, domains[i % len(domains)]) for i in range(args.count)]
+    validator = EmailValidator(check_mx=args.check_mx)
+    result = {}
+    elapsed = measure(lambda: result.update(validator.validate_many(emails)))
+    print('{0} addresses, {1} valid, {2:.2f}s, {3:.0f} addresses/s'.format(len(result), sum(result.values()), elapsed,
+                                                                             len(result) / elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks without database.')
+    benchmarks = parser.add_subparsers(dest='benchmark')
+    benchmarks.required = True
+
+    m3u = benchmarks.add_parser('m3u', help='M3U parser throughput and peak RSS on synthetic playlists')
+    m3u.add_argument('--entries', type=int, nargs='+', default=DEFAULT_M3U_ENTRIES, help='entries counts')
+    m3u.add_argument('--modes', nargs='+', choices=sorted(M3U_BENCHMARK_MODES), default=['legacy', 'list', 'iter'],
+                     help='legacy: former parser, list: M3uParser.get_list, iter: iter_entries')
+    m3u.set_defaults(func=benchmark_m3u)
+
+    countries = benchmarks.add_parser('countries', help='country codes validation, list scan and set lookup')
+    countries.add_argument('--count', type=int, default=DEFAULT_COUNTRY_CODES, help='validated codes count')
+    countries.set_defaults(func=benchmark_countries)
+
+    hashers = benchmarks.add_parser('hashers', help='passwords verification, logins per second')
+    hashers.add_argument('--logins', type=int, default=DEFAULT_LOGINS, help='logins per configuration')
+    hashers.set_defaults(func=benchmark_hashers)
+
+    emails = benchmarks.add_parser('emails', help='emails validation, offline by default')
+    emails.add_argument('--count', type=int, default=DEFAULT_EMAILS, help='addresses count')
+    emails.add_argument('--domains', type=int, default=DEFAULT_EMAIL_DOMAINS, help='distinct domains count')
+    emails.add_argument('--check_mx', action='store_true', help='resolve MX records')
+    emails.set_defaults(func=benchmark_emails)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+# private
+def _run_m3u_mode(mode: str, path: str, results):
+    import resource
+    start = time.perf_counter()
+    count = M3U_BENCHMARK_MODES[mode](path)
+    results.put((count, time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+
+if __name__ == '__main__':
+    main()
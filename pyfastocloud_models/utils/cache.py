@@ -0,0 +1,65 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    # sizeof(value) -> size of the value, max_size bounds the total size of the values instead of their count
+    def __init__(self, max_size: int, ttl=None, sizeof=None):
+        self.max_size = max_size
+        self.ttl = ttl  # seconds, None means entries never expire
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()  # key -> (value, expire, size)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                value, expire, _ = item
+                if expire is None or expire > time.monotonic():
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+            self.misses += 1
+            return default
+
+    def put(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expire = time.monotonic() + ttl if ttl is not None else None
+        size = self.sizeof(value) if self.sizeof else 1
+        with self._lock:
+            self._remove(key)
+            if size > self.max_size:
+                return
+            self._items[key] = (value, expire, size)
+            self._size += size
+            while self._size > self.max_size:
+                self._remove(next(iter(self._items)))
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._remove(key)
+            return item[0] if item is not None else default
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._items), 'total_size': self._size}
+
+    def __len__(self):
+        return len(self._items)
+
+    # private
+    def _remove(self, key):
+        item = self._items.pop(key, None)
+        if item is not None:
+            self._size -= item[2]
+        return item
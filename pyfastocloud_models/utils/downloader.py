@@ -0,0 +1,258 @@
+import hashlib
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_WORKERS = 8
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_TIMEOUT = 10
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5  # seconds before the first retry, doubled for each next one
+DEFAULT_MAX_BACKOFF = 8
+PARTIAL_EXTENSION = '.part'
+VALIDATOR_EXTENSION = '.validator'
+
+
+class DownloadResult:
+    __slots__ = ('url', 'full_path', 'file_name', 'size', 'elapsed', 'resumed', 'error')
+
+    def __init__(self, url: str, full_path=None, file_name=None, size=0, elapsed=0.0, resumed=False, error=None):
+        self.url = url
+        self.full_path = full_path
+        self.file_name = file_name
+        self.size = size  # bytes
+        self.elapsed = elapsed  # seconds
+        self.resumed = resumed
+        self.error = error
+
+    def is_ok(self) -> bool:
+        return self.error is None
+
+    def get_throughput(self) -> float:
+        # bytes per second
+        return self.size / self.elapsed if self.elapsed else 0.0
+
+    def to_dict(self) -> dict:
+        return {'url': self.url, 'full_path': self.full_path, 'file_name': self.file_name, 'size': self.size,
+                'elapsed': self.elapsed, 'resumed': self.resumed, 'error': self.error}
+
+    def __repr__(self):
+        return 'DownloadResult({0})'.format(self.to_dict())
+
+
+def make_download_file_name(url: str, extension: str) -> str:
+    file_name = urlparse(url).path.split('/')[-1]
+    if not file_name:
+        file_name = '{0}{1}'.format(uuid.uuid4(), extension)
+    return file_name
+
+
+def make_partial_path(full_path: str, url: str) -> str:
+    # per url, downloads of different urls with the same file name do not share a partial file
+    return '{0}.{1}{2}'.format(full_path, hashlib.sha1(url.encode('utf-8')).hexdigest()[:16], PARTIAL_EXTENSION)
+
+
+def get_content_range_start(content_range):
+    # 'bytes 100-199/200' -> 100, None if missing or malformed
+    try:
+        unit, _, byte_range = content_range.partition(' ')
+        return int(byte_range.split('-', 1)[0]) if unit == 'bytes' else None
+    except (AttributeError, ValueError):
+        return None
+
+
+def get_response_validator(response):
+    # strong ETag or Last-Modified, sent back as If-Range so a changed file is downloaded again
+    etag = response.headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return response.headers.get('Last-Modified')
+
+
+class DownloadManager:
+    # downloads through a shared pooled session into '<path>.<url hash>.part', renamed once complete
+    # an interrupted download is resumed with Range and If-Range requests by the next attempt or call,
+    # it is restarted if the server has no validator for the file or the file changed
+    def __init__(self, workers=DEFAULT_WORKERS, chunk_size=DEFAULT_CHUNK_SIZE, timeout=DEFAULT_TIMEOUT,
+                 retries=DEFAULT_RETRIES, progress=None, session=None, backoff=DEFAULT_BACKOFF,
+                 max_backoff=DEFAULT_MAX_BACKOFF):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.progress = progress  # callable(url, downloaded bytes, total bytes or None)
+        self.downloaded_bytes = 0
+        self.downloaded_files = 0
+        self._lock = threading.Lock()
+        self._partial_locks = {}  # partial path -> [lock, downloads using it]
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+
+    def download(self, url: str, path: str, extension='', file_name=None, timeout=None) -> DownloadResult:
+        file_name = file_name or make_download_file_name(url, extension)
+        full_path = os.path.join(path, file_name)
+        partial_path = make_partial_path(full_path, url)
+        start = time.monotonic()
+        lock = self._acquire_partial_lock(partial_path)
+        try:
+            return self._download(url, full_path, file_name, partial_path, timeout or self.timeout, start)
+        finally:
+            self._release_partial_lock(partial_path, lock)
+
+    def download_all(self, urls, path: str, extension='') -> [DownloadResult]:
+        # parallel downloads into path, results in urls order
+        urls = list(urls)
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(urls)))) as executor:
+            return list(executor.map(lambda url: self.download(url, path, extension), urls))
+
+    def stats(self) -> dict:
+        return {'files': self.downloaded_files, 'bytes': self.downloaded_bytes}
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    # private
+    def _acquire_partial_lock(self, partial_path: str):
+        # concurrent downloads of the same url into the same file are serialized
+        with self._lock:
+            lock = self._partial_locks.get(partial_path)
+            if lock is None:
+                lock = self._partial_locks[partial_path] = [threading.Lock(), 0]
+            lock[1] += 1
+        lock[0].acquire()
+        return lock
+
+    def _release_partial_lock(self, partial_path: str, lock: list):
+        lock[0].release()
+        with self._lock:
+            lock[1] -= 1
+            if not lock[1]:
+                del self._partial_locks[partial_path]
+
+    def _download(self, url: str, full_path: str, file_name: str, partial_path: str, timeout, start: float):
+        resumed = False
+        error = None
+        for attempt in range(max(1, self.retries)):
+            if attempt:
+                time.sleep(self._get_backoff(attempt))
+            try:
+                resumed = self._download_to(url, partial_path, timeout) or resumed
+            except requests.HTTPError as ex:
+                error = str(ex)
+                if ex.response is not None and ex.response.status_code < 500:  # not retried
+                    break
+                continue
+            except (requests.RequestException, OSError) as ex:
+                error = str(ex)
+                continue
+
+            os.replace(partial_path, full_path)
+            self._remove_partial(partial_path, validator_only=True)
+            size = os.path.getsize(full_path)
+            with self._lock:
+                self.downloaded_files += 1
+            return DownloadResult(url, full_path, file_name, size, time.monotonic() - start, resumed)
+
+        return DownloadResult(url, None, file_name, elapsed=time.monotonic() - start, resumed=resumed, error=error)
+
+    def _get_backoff(self, attempt: int) -> float:
+        # seconds to wait before the attempt (1 for the first retry), with jitter so retries of many downloads spread
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _download_to(self, url: str, partial_path: str, timeout) -> bool:
+        # returns True if an existing partial file was continued
+        offset = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+        validator = self._read_validator(partial_path) if offset else None
+        headers = {'Range': 'bytes={0}-'.format(offset), 'If-Range': validator} if validator else {}
+        with self.session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+            if response.status_code == 416 and headers:  # partial file does not match the file any more
+                self._remove_partial(partial_path)
+                response.close()
+                return self._download_to(url, partial_path, timeout)
+            response.raise_for_status()
+
+            resumed = bool(headers) and response.status_code == 206
+            if resumed and get_content_range_start(response.headers.get('Content-Range')) != offset:
+                self._remove_partial(partial_path)
+                raise requests.RequestException('unexpected Content-Range {0} for offset {1}'.format(
+                    response.headers.get('Content-Range'), offset))
+            if not resumed:
+                offset = 0
+                self._write_validator(partial_path, get_response_validator(response))
+            length = response.headers.get('Content-Length')
+            total = offset + int(length) if length is not None else None
+
+            downloaded = offset
+            with open(partial_path, 'ab' if resumed else 'wb') as file:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    file.write(chunk)
+                    downloaded += len(chunk)
+                    with self._lock:
+                        self.downloaded_bytes += len(chunk)
+                    if self.progress:
+                        self.progress(url, downloaded, total)
+
+            if total is not None and downloaded < total:
+                raise requests.exceptions.ChunkedEncodingError(
+                    'incomplete download {0} of {1} bytes'.format(downloaded, total))
+            return resumed
+
+    @staticmethod
+    def _read_validator(partial_path: str):
+        try:
+            with open(partial_path + VALIDATOR_EXTENSION) as file:
+                return file.read().strip() or None
+        except OSError:
+            return None
+
+    @staticmethod
+    def _write_validator(partial_path: str, validator):
+        # without validator an interrupted download can not be resumed safely, it is restarted
+        if validator:
+            with open(partial_path + VALIDATOR_EXTENSION, 'w') as file:
+                file.write(validator)
+        else:
+            DownloadManager._remove_partial(partial_path, validator_only=True)
+
+    @staticmethod
+    def _remove_partial(partial_path: str, validator_only=False):
+        paths = [partial_path + VALIDATOR_EXTENSION] if validator_only else [partial_path,
+                                                                             partial_path + VALIDATOR_EXTENSION]
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+_DOWNLOAD_MANAGER = None
+_DOWNLOAD_MANAGER_LOCK = threading.Lock()
+
+
+def get_download_manager() -> DownloadManager:
+    # shared by utils.download_file
+    global _DOWNLOAD_MANAGER
+    with _DOWNLOAD_MANAGER_LOCK:
+        if _DOWNLOAD_MANAGER is None:
+            _DOWNLOAD_MANAGER = DownloadManager()
+        return _DOWNLOAD_MANAGER
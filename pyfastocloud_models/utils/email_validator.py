@@ -0,0 +1,141 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from validate_email import VALID_ADDRESS_REGEXP
+
+from pyfastocloud_models.utils.cache import LRUCache
+
+MX_CACHE_SIZE = 100000
+MX_CACHE_TTL = 3600
+DISPOSABLE_CACHE_TTL = 24 * 3600
+REMOTE_TIMEOUT = 2
+DEFAULT_WORKERS = 32
+
+# well known disposable domains, extended by load_disposable_domains
+DEFAULT_DISPOSABLE_DOMAINS = frozenset((
+    '10minutemail.com', '20minutemail.com', 'anonbox.net', 'discard.email', 'dispostable.com', 'dropmail.me',
+    'emailondeck.com', 'fakeinbox.com', 'getairmail.com', 'getnada.com', 'guerrillamail.biz', 'guerrillamail.com',
+    'guerrillamail.de', 'guerrillamail.net', 'guerrillamail.org', 'guerrillamailblock.com', 'harakirimail.com',
+    'incognitomail.org', 'jetable.org', 'mailcatch.com', 'maildrop.cc', 'mailinator.com', 'mailinator.net',
+    'mailnesia.com', 'mintemail.com', 'moakt.com', 'mohmal.com', 'mytemp.email', 'mytrashmail.com', 'nada.email',
+    'sharklasers.com', 'spam4.me', 'spambox.us', 'spamgourmet.com', 'tempail.com', 'tempinbox.com', 'temp-mail.org',
+    'tempmail.net', 'tempmailo.com', 'tempr.email', 'throwawaymail.com', 'trashmail.com', 'trashmail.de',
+    'trashmail.net', 'yopmail.com', 'yopmail.fr', 'yopmail.net', 'zetmail.com'))
+
+_ADDRESS_REGEX = re.compile(VALID_ADDRESS_REGEXP)
+
+
+def load_disposable_domains(path: str) -> frozenset:
+    # one domain per line, '#' comments
+    with open(path) as file:
+        domains = (line.split('#', 1)[0].strip().lower() for line in file)
+        return frozenset(domain for domain in domains if domain)
+
+
+def get_email_domain(email: str) -> str:
+    return email.rsplit('@', 1)[-1].lower()
+
+
+def lookup_mx(domain: str):
+    # True if the domain has MX records, False if it has none or does not exist, None if unknown: lookup failure
+    # or dnspython (the dns extra) not installed, addresses of the domain say nothing about its MX records
+    try:
+        import dns.resolver
+    except ImportError:
+        return None
+
+    try:
+        return bool(dns.resolver.resolve(domain, 'MX'))
+    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+        return False
+    except dns.exception.DNSException:
+        return None
+
+
+class EmailValidator:
+    # syntax -> local disposable list -> MX (cached per domain) -> remote disposable check (cached per domain)
+    # check_mx=False, remote=False for offline and test environments
+    # domains with unknown MX (lookup_mx returned None) are not rejected, such results are not cached
+    KICKBOX_URL = 'https://open.kickbox.com/v1/disposable/{0}'
+
+    def __init__(self, check_mx=True, remote=False, disposable_domains=DEFAULT_DISPOSABLE_DOMAINS,
+                 workers=DEFAULT_WORKERS, mx_ttl=MX_CACHE_TTL, timeout=REMOTE_TIMEOUT):
+        self.check_mx = check_mx
+        self.remote = remote
+        self.disposable_domains = frozenset(disposable_domains)
+        self.workers = workers
+        self.timeout = timeout
+        self._mx_cache = LRUCache(MX_CACHE_SIZE, mx_ttl)
+        self._disposable_cache = LRUCache(MX_CACHE_SIZE, DISPOSABLE_CACHE_TTL)
+        self._session = requests.Session() if remote else None
+
+    def validate(self, email: str) -> bool:
+        if not email or not _ADDRESS_REGEX.match(email):
+            return False
+        return self._validate_domain(get_email_domain(email))
+
+    def validate_many(self, emails) -> dict:
+        # email -> bool, each domain is checked once
+        emails = list(dict.fromkeys(emails))
+        valid_syntax = [email for email in emails if email and _ADDRESS_REGEX.match(email)]
+        domains = list(dict.fromkeys(get_email_domain(email) for email in valid_syntax))
+        if self.check_mx or self.remote:
+            with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(domains)))) as executor:
+                valid_domains = dict(zip(domains, executor.map(self._validate_domain, domains)))
+        else:
+            valid_domains = {domain: self._validate_domain(domain) for domain in domains}
+
+        result = dict.fromkeys(emails, False)
+        for email in valid_syntax:
+            result[email] = valid_domains[get_email_domain(email)]
+        return result
+
+    def close(self):
+        if self._session:
+            self._session.close()
+
+    # private
+    def _validate_domain(self, domain: str) -> bool:
+        if domain in self.disposable_domains:
+            return False
+        if self.check_mx and not self._has_mx(domain):
+            return False
+        if self.remote and self._is_remote_disposable(domain):
+            return False
+        return True
+
+    def _has_mx(self, domain: str) -> bool:
+        has_mx = self._mx_cache.get(domain)
+        if has_mx is None:
+            has_mx = lookup_mx(domain)
+            if has_mx is None:
+                return True
+            self._mx_cache.put(domain, has_mx)
+        return has_mx
+
+    def _is_remote_disposable(self, domain: str) -> bool:
+        # errors are not cached and treated as not disposable
+        disposable = self._disposable_cache.get(domain)
+        if disposable is None:
+            try:
+                response = self._session.get(EmailValidator.KICKBOX_URL.format(domain), timeout=self.timeout)
+                disposable = bool(response.json()['disposable']) if response.status_code == 200 else None
+            except (requests.RequestException, ValueError, KeyError):
+                disposable = None
+            if disposable is None:
+                return False
+            self._disposable_cache.put(domain, disposable)
+        return disposable
+
+
+_EMAIL_VALIDATORS = {}
+
+
+def get_email_validator(check_mx: bool, remote: bool) -> EmailValidator:
+    # shared by utils.is_valid_email, caches survive between calls
+    key = (check_mx, remote)
+    validator = _EMAIL_VALIDATORS.get(key)
+    if validator is None:
+        validator = _EMAIL_VALIDATORS.setdefault(key, EmailValidator(check_mx=check_mx, remote=remote))
+    return validator
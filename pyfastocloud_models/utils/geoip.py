@@ -0,0 +1,264 @@
+import bisect
+import csv
+import ipaddress
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from pyfastocloud_models.utils.cache import LRUCache
+
+COUNTRY_CACHE_SIZE = 100000
+COUNTRY_CACHE_TTL = 24 * 3600
+COUNTRY_NEGATIVE_CACHE_TTL = 600
+REMOTE_TIMEOUT = 1
+REMOTE_WORKERS = 16
+
+
+def ip_to_bytes(address) -> bytes:
+    # 16 bytes big endian, ipv4 as ipv4-mapped ipv6, so ranges compare as bytes
+    if isinstance(address, int) or (isinstance(address, str) and address.isdigit()):
+        value = int(address)
+        address = ipaddress.IPv4Address(value) if value <= 0xFFFFFFFF else ipaddress.IPv6Address(value)
+    elif not isinstance(address, (ipaddress.IPv4Address, ipaddress.IPv6Address)):
+        address = ipaddress.ip_address(address)
+
+    if address.version == 4:
+        return b'\x00' * 10 + b'\xff\xff' + address.packed
+    return address.packed
+
+
+class CountryLookupError(Exception):
+    # transient backend failure (timeout, error response), the country of the address is not known to be unknown
+    pass
+
+
+class CountryResolver:
+    def lookup(self, remote_addr: str):
+        # ISO country code or None, raises CountryLookupError on transient failures
+        raise NotImplementedError('subclasses must override lookup()!')
+
+    def lookup_many(self, remote_addrs) -> dict:
+        # address -> country code or None, addresses of failed lookups are left out
+        result = {}
+        for addr in remote_addrs:
+            try:
+                result[addr] = self.lookup(addr)
+            except CountryLookupError:
+                pass
+        return result
+
+    def resolve(self, remote_addr: str):
+        # ISO country code or None
+        try:
+            return self.lookup(remote_addr)
+        except CountryLookupError:
+            return None
+
+    def resolve_many(self, remote_addrs) -> dict:
+        # address -> country code or None
+        remote_addrs = list(remote_addrs)
+        found = self.lookup_many(remote_addrs)
+        return {addr: found.get(addr) for addr in remote_addrs}
+
+    def close(self):
+        pass
+
+
+class RangeIndexCountryResolver(CountryResolver):
+    # memory mapped file of sorted fixed size records: first ip (16 bytes) | last ip (16 bytes) | country (2 bytes)
+    # build the index once from a CSV ranges file (first ip, last ip, country code) with build_index
+    ADDRESS_SIZE = 16
+    COUNTRY_SIZE = 2
+    RECORD_SIZE = 2 * ADDRESS_SIZE + COUNTRY_SIZE
+
+    class _FirstAddresses:
+        def __init__(self, data, count: int):
+            self._data = data
+            self._count = count
+
+        def __getitem__(self, pos: int) -> bytes:
+            offset = pos * RangeIndexCountryResolver.RECORD_SIZE
+            return self._data[offset:offset + RangeIndexCountryResolver.ADDRESS_SIZE]
+
+        def __len__(self):
+            return self._count
+
+    def __init__(self, index_path: str):
+        self._file = open(index_path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        count = size // RangeIndexCountryResolver.RECORD_SIZE
+        self._first_addresses = RangeIndexCountryResolver._FirstAddresses(self._data, count)
+
+    @staticmethod
+    def build_index(csv_path: str, index_path: str) -> int:
+        # returns the number of ranges, rows with other columns count are skipped (headers, comments)
+        records = []
+        with open(csv_path, newline='') as file:
+            for row in csv.reader(file):
+                if len(row) < 3:
+                    continue
+                try:
+                    first, last = ip_to_bytes(row[0].strip()), ip_to_bytes(row[1].strip())
+                except ValueError:
+                    continue
+                country = row[2].strip().upper()
+                if len(country) != RangeIndexCountryResolver.COUNTRY_SIZE or country == '-':
+                    continue
+                records.append(first + last + country.encode('ascii'))
+
+        records.sort()
+        tmp_path = index_path + '.tmp'
+        with open(tmp_path, 'wb') as file:
+            for record in records:
+                file.write(record)
+        os.replace(tmp_path, index_path)
+        return len(records)
+
+    def lookup(self, remote_addr: str):
+        try:
+            key = ip_to_bytes(remote_addr)
+        except ValueError:
+            return None
+
+        pos = bisect.bisect_right(self._first_addresses, key) - 1
+        if pos < 0:
+            return None
+
+        offset = pos * RangeIndexCountryResolver.RECORD_SIZE + RangeIndexCountryResolver.ADDRESS_SIZE
+        last = self._data[offset:offset + RangeIndexCountryResolver.ADDRESS_SIZE]
+        if key > last:
+            return None
+        offset += RangeIndexCountryResolver.ADDRESS_SIZE
+        return self._data[offset:offset + RangeIndexCountryResolver.COUNTRY_SIZE].decode('ascii')
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+
+class MMDBCountryResolver(CountryResolver):
+    # MaxMind database, needs the optional maxminddb package
+    def __init__(self, mmdb_path: str):
+        import maxminddb
+        self._reader = maxminddb.open_database(mmdb_path, maxminddb.MODE_MMAP)
+
+    def lookup(self, remote_addr: str):
+        try:
+            record = self._reader.get(remote_addr)
+        except ValueError:
+            return None
+        if not record:
+            return None
+        country = record.get('country') or record.get('registered_country') or {}
+        return country.get('iso_code')
+
+    def close(self):
+        self._reader.close()
+
+
+class IpInfoCountryResolver(CountryResolver):
+    URL = 'http://ipinfo.io/{0}/country'
+
+    def __init__(self, timeout=REMOTE_TIMEOUT, workers=REMOTE_WORKERS, token=None):
+        self.timeout = timeout
+        self.workers = workers
+        self.session = requests.Session()
+        if token:
+            self.session.headers['Authorization'] = 'Bearer ' + token
+
+    def lookup(self, remote_addr: str):
+        try:
+            response = self.session.get(IpInfoCountryResolver.URL.format(remote_addr), timeout=self.timeout)
+        except requests.RequestException as ex:
+            raise CountryLookupError(str(ex)) from ex
+        if response.status_code != 200:
+            raise CountryLookupError('ipinfo status code {0}'.format(response.status_code))
+        country = response.text.strip()
+        return country if len(country) == 2 else None
+
+    def lookup_many(self, remote_addrs) -> dict:
+        remote_addrs = list(dict.fromkeys(remote_addrs))
+        if not remote_addrs:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(remote_addrs))) as executor:
+            futures = {addr: executor.submit(self.lookup, addr) for addr in remote_addrs}
+
+        result = {}
+        for addr, future in futures.items():
+            try:
+                result[addr] = future.result()
+            except CountryLookupError:
+                pass
+        return result
+
+    def close(self):
+        self.session.close()
+
+
+class CachedCountryResolver(CountryResolver):
+    # LRU+TTL cache in front of a backend, unknown addresses are cached for negative_ttl, failed lookups are not cached
+    _UNKNOWN = object()
+
+    def __init__(self, backend: CountryResolver, max_size=COUNTRY_CACHE_SIZE, ttl=COUNTRY_CACHE_TTL,
+                 negative_ttl=COUNTRY_NEGATIVE_CACHE_TTL):
+        self.backend = backend
+        self.negative_ttl = negative_ttl
+        self._cache = LRUCache(max_size, ttl)
+
+    def lookup(self, remote_addr: str):
+        cached = self._cache.get(remote_addr)
+        if cached is not None:
+            return None if cached is CachedCountryResolver._UNKNOWN else cached
+
+        country = self.backend.lookup(remote_addr)
+        self._put(remote_addr, country)
+        return country
+
+    def lookup_many(self, remote_addrs) -> dict:
+        result = {}
+        missing = []
+        for addr in remote_addrs:
+            cached = self._cache.get(addr)
+            if cached is None:
+                missing.append(addr)
+            else:
+                result[addr] = None if cached is CachedCountryResolver._UNKNOWN else cached
+
+        if missing:
+            for addr, country in self.backend.lookup_many(missing).items():
+                self._put(addr, country)
+                result[addr] = country
+        return result
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+    def close(self):
+        self.backend.close()
+
+    # private
+    def _put(self, remote_addr: str, country):
+        if country is None:
+            self._cache.put(remote_addr, CachedCountryResolver._UNKNOWN, self.negative_ttl)
+        else:
+            self._cache.put(remote_addr, country)
+
+
+_COUNTRY_RESOLVER = None
+
+
+def get_country_resolver() -> CountryResolver:
+    # cached ipinfo.io by default, use set_country_resolver for an offline backend
+    global _COUNTRY_RESOLVER
+    if _COUNTRY_RESOLVER is None:
+        _COUNTRY_RESOLVER = CachedCountryResolver(IpInfoCountryResolver())
+    return _COUNTRY_RESOLVER
+
+
+def set_country_resolver(resolver: CountryResolver):
+    global _COUNTRY_RESOLVER
+    _COUNTRY_RESOLVER = resolver
@@ -0,0 +1,183 @@
+import hashlib
+import hmac
+import secrets
+
+from pyfastocloud_models.utils.cache import LRUCache
+
+HASH_SEPARATOR = '$'
+
+VERIFICATION_CACHE_SIZE = 100000
+VERIFICATION_CACHE_TTL = 300  # seconds, a changed password is always rechecked, ttl bounds memory of old secrets
+
+
+class PasswordHasher:
+    # encoded hashes start with '<algorithm>$', except legacy formats which override identify
+    algorithm = None
+
+    def identify(self, encoded: str) -> bool:
+        return encoded.startswith(self.algorithm + HASH_SEPARATOR)
+
+    def encode(self, password: str) -> str:
+        raise NotImplementedError('subclasses must override encode()!')
+
+    def verify(self, password: str, encoded: str) -> bool:
+        raise NotImplementedError('subclasses must override verify()!')
+
+    def must_update(self, encoded: str) -> bool:
+        # encoded with outdated parameters of this algorithm
+        return False
+
+
+class MD5PasswordHasher(PasswordHasher):
+    # legacy unsalted hex digest without prefix, kept for subscribers created before hashers
+    algorithm = 'md5'
+    LENGTH = 32
+
+    def identify(self, encoded: str) -> bool:
+        return len(encoded) == MD5PasswordHasher.LENGTH and HASH_SEPARATOR not in encoded
+
+    def encode(self, password: str) -> str:
+        return hashlib.md5(password.encode()).hexdigest()
+
+    def verify(self, password: str, encoded: str) -> bool:
+        return hmac.compare_digest(encoded, self.encode(password))
+
+
+class PBKDF2PasswordHasher(PasswordHasher):
+    # pbkdf2_<digest>$<iterations>$<salt>$<hex hash>
+    DEFAULT_ITERATIONS = 260000
+    SALT_LENGTH = 16
+
+    def __init__(self, iterations=DEFAULT_ITERATIONS, digest='sha256'):
+        self.iterations = iterations
+        self.digest = digest
+        self.algorithm = 'pbkdf2_' + digest
+
+    def encode(self, password: str, salt=None, iterations=None) -> str:
+        salt = salt or secrets.token_hex(PBKDF2PasswordHasher.SALT_LENGTH)
+        iterations = iterations or self.iterations
+        hash_hex = hashlib.pbkdf2_hmac(self.digest, password.encode(), salt.encode(), iterations).hex()
+        return HASH_SEPARATOR.join((self.algorithm, str(iterations), salt, hash_hex))
+
+    def verify(self, password: str, encoded: str) -> bool:
+        _, iterations, salt, _ = encoded.split(HASH_SEPARATOR, 3)
+        return hmac.compare_digest(encoded, self.encode(password, salt, int(iterations)))
+
+    def must_update(self, encoded: str) -> bool:
+        return int(encoded.split(HASH_SEPARATOR, 2)[1]) != self.iterations
+
+
+class ScryptPasswordHasher(PasswordHasher):
+    # scrypt$<n>$<r>$<p>$<salt>$<hex hash>
+    algorithm = 'scrypt'
+    SALT_LENGTH = 16
+
+    def __init__(self, n=2 ** 14, r=8, p=1):
+        self.n = n
+        self.r = r
+        self.p = p
+
+    def encode(self, password: str, salt=None, n=None, r=None, p=None) -> str:
+        salt = salt or secrets.token_hex(ScryptPasswordHasher.SALT_LENGTH)
+        n, r, p = n or self.n, r or self.r, p or self.p
+        hash_hex = hashlib.scrypt(password.encode(), salt=salt.encode(), n=n, r=r, p=p, maxmem=256 * n * r).hex()
+        return HASH_SEPARATOR.join((self.algorithm, str(n), str(r), str(p), salt, hash_hex))
+
+    def verify(self, password: str, encoded: str) -> bool:
+        _, n, r, p, salt, _ = encoded.split(HASH_SEPARATOR, 5)
+        return hmac.compare_digest(encoded, self.encode(password, salt, int(n), int(r), int(p)))
+
+    def must_update(self, encoded: str) -> bool:
+        _, n, r, p, _ = encoded.split(HASH_SEPARATOR, 4)
+        return (int(n), int(r), int(p)) != (self.n, self.r, self.p)
+
+
+class WerkzeugPasswordHasher(PasswordHasher):
+    # legacy werkzeug formats: '<method>$<salt>$<hash>' (hmac, e.g. 'sha256') and 'pbkdf2:<digest>:<iterations>$...'
+    algorithm = 'werkzeug'
+
+    def identify(self, encoded: str) -> bool:
+        return encoded.count(HASH_SEPARATOR) == 2
+
+    def encode(self, password: str) -> str:
+        raise NotImplementedError('werkzeug hashes are only verified, use another default hasher')
+
+    def verify(self, password: str, encoded: str) -> bool:
+        method, salt, hash_hex = encoded.split(HASH_SEPARATOR)
+        if method.startswith('pbkdf2:'):
+            args = method.split(':')
+            digest = args[1]
+            iterations = int(args[2]) if len(args) > 2 else 260000
+            actual = hashlib.pbkdf2_hmac(digest, password.encode(), salt.encode(), iterations).hex()
+        elif method in hashlib.algorithms_available:
+            actual = hmac.new(salt.encode(), password.encode(), method).hexdigest()
+        else:
+            from werkzeug.security import check_password_hash
+            return check_password_hash(encoded, password)
+        return hmac.compare_digest(hash_hex, actual)
+
+
+class PasswordHashers:
+    # default hasher encodes new passwords, the others only verify and are replaced on login (rehash)
+    def __init__(self, default: PasswordHasher, *legacy):
+        self.default = default
+        self.hashers = (default,) + legacy
+
+    def find(self, encoded: str):
+        for hasher in self.hashers:
+            if hasher.identify(encoded):
+                return hasher
+        return None
+
+    def encode(self, password: str) -> str:
+        return self.default.encode(password)
+
+    def verify(self, password: str, encoded: str) -> bool:
+        hasher = self.find(encoded) if encoded else None
+        if hasher is None:
+            return False
+        try:
+            return hasher.verify(password, encoded)
+        except ValueError:  # malformed hash
+            return False
+
+    def needs_rehash(self, encoded: str) -> bool:
+        hasher = self.find(encoded)
+        return hasher is not self.default or self.default.must_update(encoded)
+
+
+class VerificationCache:
+    # (user id, keyed digest of the supplied secret) -> encoded hash it was verified against
+    # secrets are never stored, the digest key is random per process
+    def __init__(self, max_size=VERIFICATION_CACHE_SIZE, ttl=VERIFICATION_CACHE_TTL):
+        self._cache = LRUCache(max_size, ttl)
+        self._key = secrets.token_bytes(32)
+
+    def is_verified(self, uid, password: str, encoded: str) -> bool:
+        return self._cache.get(self._make_key(uid, password)) == encoded
+
+    def add(self, uid, password: str, encoded: str):
+        self._cache.put(self._make_key(uid, password), encoded)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+    # private
+    def _make_key(self, uid, password: str):
+        return uid, hashlib.blake2b(password.encode(), key=self._key, digest_size=16).digest()
+
+
+def check_password(hashers: PasswordHashers, cache: VerificationCache, uid, password: str, encoded: str) -> bool:
+    # verification through the cache, uid None skips it
+    if uid is not None and cache is not None and cache.is_verified(uid, password, encoded):
+        return True
+
+    if not hashers.verify(password, encoded):
+        return False
+
+    if uid is not None and cache is not None:
+        cache.add(uid, password, encoded)
+    return True
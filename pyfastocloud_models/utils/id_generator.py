@@ -0,0 +1,78 @@
+import os
+import threading
+import time
+
+from pymodm import MongoModel, fields
+from pymongo import ReturnDocument
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class IdCounter(MongoModel):
+    # next free id of a named sequence
+    class Meta:
+        collection_name = 'counters'
+        final = True
+
+    name = fields.CharField(primary_key=True)
+    next = fields.IntegerField(required=True)
+
+
+class CounterIdGenerator:
+    # ids unique across processes and hosts, batches are reserved from an IdCounter document with an atomic $inc
+    # ids of the local batch are served under a lock, a forked child drops the batch inherited from its parent
+    # the sequence starts above ids of the previous generators (per process counter, seconds since 2020 << 22)
+    # and stays within 53 bits (safe in json doubles)
+    # without connect() ids are only unique in the process (time seeded), e.g. playlists of unsaved streams
+    SEED_EPOCH = 1577836800  # 2020-01-01 UTC
+    SEED_SHIFT = 22
+
+    def __init__(self, name: str, batch_size=DEFAULT_BATCH_SIZE):
+        if batch_size < 1:
+            raise ValueError('batch_size should be positive')
+
+        self.name = name
+        self.batch_size = batch_size
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def generate(self) -> int:
+        with self._lock:
+            if self._next >= self._end:
+                try:
+                    collection = IdCounter._mongometa.collection
+                except ValueError:  # no connection
+                    return self._generate_offline()
+                self._reserve(collection)
+            value = self._next
+            self._next += 1
+            return value
+
+    # private
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._next = self._end = 0
+        self._seeded = False
+        self._offline = 0
+
+    @staticmethod
+    def _make_seed(seconds: int) -> int:
+        return (seconds - CounterIdGenerator.SEED_EPOCH) << CounterIdGenerator.SEED_SHIFT
+
+    def _generate_offline(self) -> int:
+        value = max(self._offline, CounterIdGenerator._make_seed(int(time.time())))
+        self._offline = value + 1
+        return value
+
+    def _reserve(self, collection):
+        if not self._seeded:
+            # $max never lowers the counter, so batches of other processes are not reused
+            seed = CounterIdGenerator._make_seed(int(time.time()) + 1)
+            collection.update_one({'_id': self.name}, {'$max': {'next': seed}}, upsert=True)
+            self._seeded = True
+
+        doc = collection.find_one_and_update({'_id': self.name}, {'$inc': {'next': self.batch_size}}, upsert=True,
+                                             return_document=ReturnDocument.AFTER)
+        self._end = doc['next']
+        self._next = self._end - self.batch_size
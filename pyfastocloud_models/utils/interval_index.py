@@ -0,0 +1,180 @@
+import bisect
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_KEYS = 10000
+
+
+class _KeyIntervals:
+    __slots__ = ('starts', 'items', 'max_length', 'loaded')
+
+    def __init__(self, intervals=()):
+        self.starts = []  # sorted
+        self.items = []  # (start, stop, vid, payload) in starts order
+        self.max_length = None  # longest stop - start, bounds the overlap search
+        self.loaded = time.monotonic()
+        for start, stop, vid, payload in sorted(intervals, key=lambda interval: interval[0]):
+            self.starts.append(start)
+            self.items.append((start, stop, vid, vid if payload is None else payload))
+            self.update_max_length(start, stop)
+
+    def update_max_length(self, start, stop):
+        length = stop - start
+        if self.max_length is None or length > self.max_length:
+            self.max_length = length
+
+
+class IntervalIndex:
+    # key (channel, stream id) -> [start, stop) intervals sorted by start, O(log n + k) queries
+    # loader(key) -> iterable of (start, stop, vid, payload), called for unknown or expired (ttl seconds) keys
+    # at most max_keys keys are kept, the least recently used are evicted
+    # the loader runs without the lock, its result is not kept if the key changed during the load
+    def __init__(self, loader=None, ttl=None, max_keys=DEFAULT_MAX_KEYS):
+        self.loader = loader
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._keys = OrderedDict()
+        self._locations = {}  # vid -> (key, start)
+        self._loading = {}  # key -> [running loads, changes]
+        self._lock = threading.RLock()
+
+    def replace(self, key, intervals):
+        entry = _KeyIntervals(intervals)
+        with self._lock:
+            self._changed(key)
+            self._publish(key, entry)
+
+    def add(self, key, start, stop, vid, payload=None):
+        # upsert of the vid interval, ignored if the key is not loaded (the loader reads it later)
+        with self._lock:
+            self.remove(vid)
+            self._changed(key)
+            entry = self._keys.get(key)
+            if entry is None:
+                return
+
+            pos = bisect.bisect_right(entry.starts, start)
+            entry.starts.insert(pos, start)
+            entry.items.insert(pos, (start, stop, vid, vid if payload is None else payload))
+            self._locations[vid] = (key, start)
+            entry.update_max_length(start, stop)
+
+    def update(self, vid, start, stop, payload=None):
+        # moves a known vid interval, ignored if the vid is not indexed
+        with self._lock:
+            location = self._locations.get(vid)
+            if location is not None:
+                self.add(location[0], start, stop, vid, payload)
+            else:
+                self._changed(None)
+
+    def remove(self, vid):
+        with self._lock:
+            location = self._locations.pop(vid, None)
+            entry = self._keys.get(location[0]) if location is not None else None
+            if entry is None:
+                self._changed(None)
+                return
+
+            pos = bisect.bisect_left(entry.starts, location[1])
+            while pos < len(entry.items) and entry.starts[pos] == location[1]:
+                if entry.items[pos][2] == vid:
+                    del entry.starts[pos]
+                    del entry.items[pos]
+                    break
+                pos += 1
+
+    def invalidate(self, key=None):
+        # drops the key (all keys if None), reloaded on next query
+        with self._lock:
+            self._changed(key)
+            keys = [key] if key is not None else list(self._keys)
+            for k in keys:
+                self._drop(k)
+
+    def at(self, key, moment) -> list:
+        # payloads of intervals containing moment
+        return self.overlapping(key, moment, moment, inclusive=True)
+
+    def next(self, key, moment, count=1) -> list:
+        # payloads of the count intervals starting at or after moment
+        entry = self._get(key)
+        if entry is None:
+            return []
+        with self._lock:
+            pos = bisect.bisect_left(entry.starts, moment)
+            return [item[3] for item in entry.items[pos:pos + count]]
+
+    def overlapping(self, key, start, stop, inclusive=False) -> list:
+        # payloads of intervals overlapping [start, stop), ordered by start
+        entry = self._get(key)
+        if entry is None:
+            return []
+        with self._lock:
+            if not entry.items:
+                return []
+            end = bisect.bisect_right(entry.starts, stop) if inclusive else bisect.bisect_left(entry.starts, stop)
+            begin = bisect.bisect_left(entry.starts, start - entry.max_length) if entry.max_length else 0
+            return [item[3] for item in entry.items[begin:end] if item[1] > start]
+
+    def keys(self) -> list:
+        with self._lock:
+            return list(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    # private
+    def _get(self, key):
+        with self._lock:
+            entry = self._keys.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry.loaded > self.ttl:
+                self._drop(key)
+                entry = None
+            if entry is not None:
+                self._keys.move_to_end(key)
+                return entry
+            if self.loader is None:
+                return None
+
+            loading = self._loading.setdefault(key, [0, 0])
+            loading[0] += 1
+            changes = loading[1]
+
+        try:
+            entry = _KeyIntervals(self.loader(key))
+        finally:
+            with self._lock:
+                loading[0] -= 1
+                if not loading[0]:
+                    del self._loading[key]
+
+        with self._lock:
+            if loading[1] == changes:
+                self._publish(key, entry)
+        return entry
+
+    def _publish(self, key, entry: _KeyIntervals):
+        self._drop(key)
+        self._keys[key] = entry
+        for item in entry.items:
+            self._locations[item[2]] = (key, item[0])
+        while len(self._keys) > self.max_keys:
+            self._drop(next(iter(self._keys)))
+
+    def _drop(self, key):
+        entry = self._keys.pop(key, None)
+        if entry:
+            for item in entry.items:
+                self._locations.pop(item[2], None)
+
+    def _changed(self, key):
+        # marks running loads of the key (of all keys if None) as outdated
+        if key is None:
+            for loading in self._loading.values():
+                loading[1] += 1
+        else:
+            loading = self._loading.get(key)
+            if loading is not None:
+                loading[1] += 1
@@ -1,36 +1,76 @@
 import re
 
+EXTM3U_TAG = '#EXTM3U'
+EXTINF_TAG = '#EXTINF'
+UNKNOWN_VALUE = 'Unknown'
+
+TVG_NAME_ATTR = 'tvg-name'
+TVG_ID_ATTR = 'tvg-id'
+TVG_LOGO_ATTR = 'tvg-logo'
+GROUP_TITLE_ATTR = 'group-title'
+
+_ATTRIBUTES_SCANNER = re.compile('(tvg-name|tvg-id|tvg-logo|group-title)=\"(.*?)\"')
+
+
+def _significant_lines(lines):
+    for line in lines:
+        ln = line.rstrip()
+        if ln and (ln[0] != '#' or ln.startswith(EXTINF_TAG) or ln.startswith(EXTM3U_TAG)):
+            yield ln
+
+
+def _parse_entry(line_info: str, line_link: str) -> dict:
+    attrs = {}
+    for key, value in _ATTRIBUTES_SCANNER.findall(line_info):
+        attrs.setdefault(key, value)
+
+    _, comma, title = line_info.rpartition(',')
+    return {'title': title if comma else UNKNOWN_VALUE, 'tvg-name': attrs.get(TVG_NAME_ATTR, UNKNOWN_VALUE),
+            'tvg-id': attrs.get(TVG_ID_ATTR, UNKNOWN_VALUE), 'tvg-logo': attrs.get(TVG_LOGO_ATTR, UNKNOWN_VALUE),
+            'tvg-group': attrs.get(GROUP_TITLE_ATTR, UNKNOWN_VALUE), 'link': line_link}
+
+
+def _iter_lines_entries(lines):
+    line_info = None
+    for line in _significant_lines(lines):
+        if line_info is not None:
+            yield _parse_entry(line_info, line)
+        line_info = line if line.startswith(EXTINF_TAG) else None
+
+
+def iter_entries(path_or_fileobj):
+    # path_or_fileobj: file path or any iterable of lines (opened file, list)
+    if isinstance(path_or_fileobj, str):
+        with open(path_or_fileobj) as file:
+            yield from _iter_lines_entries(file)
+    else:
+        yield from _iter_lines_entries(path_or_fileobj)
+
 
 class M3uParser:
     def __init__(self):
         self.files = []
         self.lines = []
+        self._source = None
 
-    # Read the file from the given path
+    # Set the file from the given path, it will be read lazily by parse
     def read_m3u(self, file_path):
-        file = open(file_path)
-        self.load_content(file.read())
+        self.lines = []
+        self._source = file_path
 
     def load_content(self, content):
-        lines = []
-        for line in content.split('\n'):
-            ln = line.rstrip()
-            if ln:
-                if ln.startswith('#EXTM3U'):
-                    lines.append(ln)
-                elif ln.startswith('#EXTINF'):
-                    lines.append(ln)
-                elif ln[0] != '#':
-                    lines.append(ln)
-        self.lines = lines
+        self.lines = list(_significant_lines(content.split('\n')))
+        self._source = self.lines
         return len(self.lines)
 
     def parse(self):
-        numLine = len(self.lines)
-        for n in range(numLine):
-            line = self.lines[n]
-            if line[0] == '#':
-                self._manage_line(n)
+        if self._source is not None:
+            self.files.extend(iter_entries(self._source))
+
+    # Lazy parse of the given path or file object, entries are not stored
+    @staticmethod
+    def iter_entries(path_or_fileobj):
+        return iter_entries(path_or_fileobj)
 
     # Getter for the list
     def get_list(self):
@@ -55,25 +95,3 @@ class M3uParser:
                     new.append(file)
                     break
         self.files = new
-
-    # private
-    def _manage_line(self, n):
-        if n + 1 < len(self.lines):
-            line_info = self.lines[n]
-            line_link = self.lines[n + 1]
-            if not line_info.startswith('#EXTM3U'):
-                m = re.search('tvg-name=\"(.*?)\"', line_info)
-                name = m.group(1) if m else 'Unknown'
-                m = re.search('tvg-id=\"(.*?)\"', line_info)
-                tid = m.group(1) if m else 'Unknown'
-                m = re.search('tvg-logo=\"(.*?)\"', line_info)
-                logo = m.group(1) if m else 'Unknown'
-                m = re.search('group-title=\"(.*?)\"', line_info)
-                group = m.group(1) if m else 'Unknown'
-                m = re.search('[,](?!.*[,])(.*?)$', line_info)
-                title = m.group(1) if m else 'Unknown'
-                # ~ print(name+"||"+id+"||"+logo+"||"+group+"||"+title)
-
-                test = {'title': title, 'tvg-name': name, 'tvg-id': tid, 'tvg-logo': logo, 'tvg-group': group,
-                        'link': line_link}
-                self.files.append(test)
@@ -0,0 +1,94 @@
+from collections import defaultdict
+
+from pymodm import fields
+from pymodm.base.models import MongoModelBase
+from pymodm.context_managers import no_auto_dereference
+
+
+def prefetch(models, *paths, identity_map=None):
+    # resolve reference paths (dot notation, e.g. 'servers.streams') with one $in query per collection and level
+    # identity_map: {(collection name, id): model}, can be shared between calls
+    if not isinstance(models, (list, tuple)):
+        models = [models]
+    if identity_map is None:
+        identity_map = {}
+
+    for path in paths:
+        level = [model for model in models if model is not None]
+        for name in path.split('.'):
+            level = _prefetch_level(level, name, identity_map)
+    return models
+
+
+# private
+def _get_raw_value(model, name: str):
+    field = model._mongometa.get_field_from_attname(name)
+    if field is None:
+        raise ValueError('{0} has no field {1}'.format(type(model).__name__, name))
+
+    with no_auto_dereference(type(model)):
+        return field, getattr(model, name)
+
+
+def _is_reference_list(field) -> bool:
+    return isinstance(field, fields.ListField) and isinstance(field._field, fields.ReferenceField)
+
+
+def _prefetch_level(models: list, name: str, identity_map: dict) -> list:
+    values = []
+    related_models = {}
+    missing = defaultdict(set)
+    for model in models:
+        field, value = _get_raw_value(model, name)
+        values.append((model, field, value))
+        if isinstance(field, fields.ReferenceField):
+            refs, related_model = [value], field.related_model
+        elif _is_reference_list(field):
+            refs, related_model = value, field._field.related_model
+        else:
+            continue
+
+        collection_name = related_model._mongometa.collection_name
+        related_models.setdefault(collection_name, related_model)
+        for ref in refs:
+            if isinstance(ref, related_model):
+                identity_map.setdefault((collection_name, ref.pk), ref)
+            elif ref is not None:
+                missing[collection_name].add(ref)
+
+    for collection_name in missing:
+        missing[collection_name] = [ref for ref in missing[collection_name]
+                                    if (collection_name, ref) not in identity_map]
+
+    for collection_name, ids in missing.items():
+        if not ids:
+            continue
+        for obj in related_models[collection_name].objects.raw({'_id': {'$in': ids}}):
+            identity_map[(collection_name, obj.pk)] = obj
+
+    next_level = []
+    for model, field, value in values:
+        if isinstance(field, fields.ReferenceField):
+            resolved = _resolve(value, field.related_model, identity_map)
+            if resolved is not value:
+                setattr(model, name, resolved)
+            next_level.append(resolved)
+        elif _is_reference_list(field):
+            resolved = [_resolve(ref, field._field.related_model, identity_map) for ref in value]
+            setattr(model, name, resolved)
+            next_level.extend(resolved)
+        elif isinstance(field, fields.EmbeddedDocumentListField):
+            next_level.extend(value)
+        elif isinstance(field, fields.EmbeddedDocumentField):
+            next_level.append(value)
+        else:
+            raise ValueError('{0}.{1} is not a reference or embedded field'.format(type(model).__name__, name))
+
+    # unresolved ids (dangling references) are not descended into
+    return [model for model in next_level if isinstance(model, MongoModelBase)]
+
+
+def _resolve(ref, related_model, identity_map: dict):
+    if ref is None or isinstance(ref, related_model):
+        return ref
+    return identity_map.get((related_model._mongometa.collection_name, ref), ref)
@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_WORKERS = 64
+DEFAULT_PER_HOST_LIMIT = 8
+DEFAULT_TIMEOUT = 5
+
+
+class UrlCheckResult:
+    __slots__ = ('url', 'status', 'latency', 'redirect', 'error')
+
+    def __init__(self, url: str, status=None, latency=None, redirect=None, error=None):
+        self.url = url
+        self.status = status  # http status code, None if the request failed
+        self.latency = latency  # seconds
+        self.redirect = redirect  # final url if redirected
+        self.error = error
+
+    def is_valid(self) -> bool:
+        return self.status == 200
+
+    def to_dict(self) -> dict:
+        return {'url': self.url, 'status': self.status, 'latency': self.latency, 'redirect': self.redirect,
+                'error': self.error}
+
+    def __repr__(self):
+        return 'UrlCheckResult({0})'.format(self.to_dict())
+
+
+class RateLimiter:
+    # token bucket, rate requests per second shared by all threads
+    def __init__(self, rate: float, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class UrlChecker:
+    # checks urls with a bounded thread pool, keep-alive connections are pooled per host in one session
+    def __init__(self, workers=DEFAULT_WORKERS, per_host_limit=DEFAULT_PER_HOST_LIMIT, rate=None,
+                 timeout=DEFAULT_TIMEOUT, allow_redirects=True, session=None):
+        self.workers = workers
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.allow_redirects = allow_redirects
+        self._rate_limiter = RateLimiter(rate, max(1, int(rate))) if rate else None
+        self._hosts_semaphores = defaultdict(lambda: threading.BoundedSemaphore(per_host_limit))
+        self._hosts_lock = threading.Lock()
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=per_host_limit)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+
+    def check(self, url: str) -> UrlCheckResult:
+        host = urlparse(url).netloc
+        with self._hosts_lock:
+            semaphore = self._hosts_semaphores[host]
+
+        with semaphore:
+            if self._rate_limiter:
+                self._rate_limiter.acquire()
+            start = time.monotonic()
+            try:
+                response = self.session.head(url, timeout=self.timeout, allow_redirects=self.allow_redirects)
+            except Exception as ex:
+                return UrlCheckResult(url, latency=time.monotonic() - start, error=str(ex))
+
+            latency = time.monotonic() - start
+            response.close()
+            if response.history:
+                redirect = response.url
+            else:
+                redirect = response.headers.get('Location') if response.is_redirect else None
+            return UrlCheckResult(url, response.status_code, latency, redirect)
+
+    def check_urls(self, urls) -> [UrlCheckResult]:
+        # results in urls order, each distinct url is checked once
+        urls = list(urls)
+        unique = list(dict.fromkeys(urls))
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(unique)))) as executor:
+            checked = dict(zip(unique, executor.map(self.check, unique)))
+        return [checked[url] for url in urls]
+
+    def check_streams(self, streams, field_name='input') -> dict:
+        # stream id -> [UrlCheckResult] of the stream urls list field (input or output)
+        urls_by_stream = {stream.id: [url.uri for url in getattr(stream, field_name, None) or []] for stream in
+                          streams}
+        results = iter(self.check_urls(uri for uris in urls_by_stream.values() for uri in uris))
+        return {sid: [next(results) for _ in uris] for sid, uris in urls_by_stream.items()}
+
+    def check_service(self, service, field_name='input') -> dict:
+        # streams are loaded by chunks with $in queries, not dereferenced one by one
+        from pyfastocloud_models.stream.entry import iter_streams_by_ids
+        return self.check_streams(iter_streams_by_ids(service.get_stream_ids()), field_name)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def check_urls(urls, **kwargs) -> [UrlCheckResult]:
+    with UrlChecker(**kwargs) as checker:
+        return checker.check_urls(urls)
@@ -1,13 +1,8 @@
-import requests
-import json
-import ssl
-import os
-import uuid
-
 from urllib.parse import urlparse
 from datetime import datetime
-from validate_email import validate_email
-from urllib.request import urlopen
+
+
+# network helpers import their modules (requests, dns, ...) on first use, models only need the date helpers
 
 
 def date_to_utc_msec(date: datetime):
@@ -24,24 +19,19 @@ def remove_port_from_url(url: str) -> str:
 
 
 def download_file(url: str, path: str, extension: str, timeout=1):
-    get_response = requests.get(url, stream=True, timeout=timeout)
-    parsed_url = urlparse(url)
-    file_name = parsed_url.path.split('/')[-1]
-    if not file_name:
-        ts = datetime.now()
-        # msec = int(ts.timestamp() * 1000)
-        unique_filename = str(uuid.uuid4())
-        file_name = '{0}{1}'.format(unique_filename, extension)
-    full_path = os.path.join(path, file_name)
-    with open(full_path, 'wb') as f:
-        for chunk in get_response.iter_content(chunk_size=1024):
-            if chunk:  # filter out keep-alive new chunks
-                f.write(chunk)
+    import requests
+    from pyfastocloud_models.utils.downloader import get_download_manager
+
+    result = get_download_manager().download(url, path, extension, timeout=timeout)
+    if not result.is_ok():
+        raise requests.RequestException(result.error)
 
-    return full_path, file_name
+    return result.full_path, result.file_name
 
 
 def is_valid_http_url(url: str, timeout=1) -> bool:
+    import requests
+
     try:
         response = requests.head(url, timeout=timeout)
         return response.status_code == 200
@@ -49,25 +39,22 @@ def is_valid_http_url(url: str, timeout=1) -> bool:
         return False
 
 
-def is_valid_email(email: str, check_mx: bool) -> bool:
-    dns_valid = validate_email(email, check_mx=check_mx)
-    if not dns_valid:
-        return False
+def is_valid_email(email: str, check_mx: bool, remote=True) -> bool:
+    # remote=False skips the disposable domains web service, the local list is always checked
+    from pyfastocloud_models.utils.email_validator import get_email_validator
+    return get_email_validator(check_mx, remote).validate(email)
 
-    validate_url = 'https://open.kickbox.com/v1/disposable/' + email
-    context = ssl._create_unverified_context()
-    response = urlopen(validate_url, context=context)
-    if response.status != 200:
-        return False
 
-    data = response.read()
-    json_object = json.loads(data.decode('utf-8'))
-    is_disposable = json_object['disposable']
-    return not is_disposable
+def are_valid_emails(emails, check_mx: bool, remote=True) -> dict:
+    from pyfastocloud_models.utils.email_validator import get_email_validator
+    return get_email_validator(check_mx, remote).validate_many(emails)
 
 
 def get_country_code_by_remote_addr(remote_addr: str):
-    url = 'http://ipinfo.io/' + remote_addr
-    response = requests.get(url)
-    data = response.json()
-    return data.get('country', None)
+    from pyfastocloud_models.utils.geoip import get_country_resolver
+    return get_country_resolver().resolve(remote_addr)
+
+
+def get_country_codes_by_remote_addrs(remote_addrs) -> dict:
+    from pyfastocloud_models.utils.geoip import get_country_resolver
+    return get_country_resolver().resolve_many(remote_addrs)
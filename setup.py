@@ -23,6 +23,11 @@ VERSION = '1.0.0'
 # What packages are required for this module to be executed?
 REQUIRED = ['pymodm']
 
+# What packages are optional?
+EXTRAS = {
+    'dns': ['dnspython>=2.0'],  # MX records check of emails, dns.resolver.resolve
+}
+
 # The rest you shouldn't have to touch too much :)
 # ------------------------------------------------
 # Except, perhaps the License and Trove Classifiers!
@@ -95,10 +100,11 @@ setup(
     # If your package is a single module, use this instead of 'packages':
     # py_modules=['mypackage'],
 
-    # entry_points={
-    #     'console_scripts': ['mycli=mymodule:cli'],
-    # },
+    entry_points={
+        'console_scripts': ['pyfastocloud_materialize_playlists=pyfastocloud_models.service.materializer:main'],
+    },
     install_requires=REQUIRED,
+    extras_require=EXTRAS,
     include_package_data=True,
     license='LGPL',
     classifiers=[
@@ -0,0 +1,98 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class LocalHttpServer:
+    # in process http server for tests, files: path -> bytes, served with a strong ETag and Range/If-Range support
+    # redirects: path -> location, statuses: path -> status code, breaks: path -> bytes sent before the connection
+    # of the next GET is dropped
+    def __init__(self):
+        self.files = {}
+        self.etags = {}
+        self.redirects = {}
+        self.statuses = {}
+        self.breaks = {}
+        self.requests = []  # (method, path, headers)
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def url(self, path: str) -> str:
+        return 'http://127.0.0.1:{0}{1}'.format(self._server.server_address[1], path)
+
+    def set_file(self, path: str, data: bytes, etag=None):
+        self.files[path] = data
+        self.etags[path] = etag or '"{0}-{1}"'.format(len(data), hash(data) & 0xFFFFFFFF)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                self._respond(False)
+
+            def do_GET(self):
+                self._respond(True)
+
+            def _respond(self, with_body: bool):
+                server.requests.append((self.command, self.path, dict(self.headers)))
+                if self.path in server.redirects:
+                    self._send_empty(302, {'Location': server.redirects[self.path]})
+                    return
+                if self.path in server.statuses:
+                    self._send_empty(server.statuses[self.path])
+                    return
+                data = server.files.get(self.path)
+                if data is None:
+                    self._send_empty(404)
+                    return
+
+                etag = server.etags[self.path]
+                start = 0
+                byte_range = self.headers.get('Range')
+                if_range = self.headers.get('If-Range')
+                if byte_range and (if_range is None or if_range == etag):
+                    start = int(byte_range.split('=', 1)[1].split('-', 1)[0])
+                    if start >= len(data):
+                        self._send_empty(416, {'Content-Range': 'bytes */{0}'.format(len(data))})
+                        return
+
+                body = data[start:]
+                self.send_response(206 if start else 200)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(len(body)))
+                if start:
+                    self.send_header('Content-Range', 'bytes {0}-{1}/{2}'.format(start, len(data) - 1, len(data)))
+                self.end_headers()
+                if not with_body:
+                    return
+
+                limit = server.breaks.pop(self.path, None) if self.command == 'GET' else None
+                if limit is not None:
+                    self.wfile.write(body[:limit])
+                    self.wfile.flush()
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+            def _send_empty(self, status: int, headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+        return Handler
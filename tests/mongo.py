@@ -0,0 +1,19 @@
+import pymodm.connection
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+TEST_DATABASE_URI = 'mongodb://localhost:27017/pyfastocloud_models_tests'
+
+
+def connect_test_database():
+    # models on an in memory mongomock database, tests using it are skipped without mongomock
+    pymodm.connection.MongoClient = mongomock.MongoClient
+    pymodm.connect(TEST_DATABASE_URI)
+
+
+def drop_test_database():
+    database = pymodm.connection._get_db()
+    database.client.drop_database(database.name)
@@ -0,0 +1,74 @@
+import unittest
+
+from pyfastocloud_models.service.entry import ServiceSettings
+from pyfastocloud_models.stream.entry import CatchupStream, ProxyStream, ProxyVodStream
+from pyfastocloud_models.subscriber.entry import Subscriber
+from tests.mongo import mongomock, connect_test_database, drop_test_database
+
+
+@unittest.skipIf(mongomock is None, 'mongomock is not installed')
+class AvailableOfficialTest(unittest.TestCase):
+    def setUp(self):
+        connect_test_database()
+        self.live = [self.save(ProxyStream(name='live{0}'.format(pos), group='group')) for pos in range(3)]
+        self.hidden = self.save(ProxyStream(name='hidden', group='group', visible=False))
+        self.vod = self.save(ProxyVodStream(name='vod', group='group'))
+        self.catchup = self.save(CatchupStream(name='catchup', group='group'))
+        self.dangling = self.save(ProxyStream(name='dangling', group='group'))
+
+        first = self.save(ServiceSettings(streams=[self.live[2], self.vod, self.hidden, self.live[0], self.dangling]))
+        second = self.save(ServiceSettings(streams=[self.catchup, self.live[1], self.live[2]]))
+        # removed without the PULL rule, the first server keeps the reference
+        self.dangling._mongometa.collection.delete_one({'_id': self.dangling.pk})
+        self.subscriber = Subscriber.make_subscriber('official@example.com', 'first', 'last', 'password', 'US', 'en')
+        self.subscriber.servers = [first, second]
+        self.subscriber.save()
+
+    def tearDown(self):
+        drop_test_database()
+
+    @staticmethod
+    def save(model):
+        model.save()
+        return model
+
+    def assertSameStreams(self, found: list, expected: list):
+        self.assertEqual([stream.pk for stream in found], [stream.pk for stream in expected])
+        self.assertEqual([type(stream) for stream in found], [type(stream) for stream in expected])
+
+    def loaded(self) -> Subscriber:
+        return Subscriber.objects.get({'_id': self.subscriber.pk})
+
+    def test_matches_python_filtering(self):
+        subscriber = self.loaded()
+        for find, available in ((subscriber.find_available_official_streams,
+                                 self.loaded().all_available_official_streams),
+                                (subscriber.find_available_official_vods, self.loaded().all_available_official_vods),
+                                (subscriber.find_available_official_catchups,
+                                 self.loaded().all_available_official_catchups)):
+            self.assertSameStreams(find(), available())
+
+        self.assertSameStreams(subscriber.find_available_official_streams(),
+                               [self.live[2], self.live[0], self.live[1], self.live[2]])
+
+    def test_pagination(self):
+        subscriber = self.loaded()
+        expected = self.loaded().all_available_official_streams()
+        self.assertSameStreams(subscriber.find_available_official_streams(skip=1, limit=2), expected[1:3])
+        self.assertSameStreams(subscriber.find_available_official_streams(skip=3), expected[3:])
+
+    def test_projection(self):
+        streams = self.loaded().find_available_official_streams(projection=['name'])
+        self.assertEqual([stream.name for stream in streams], ['live2', 'live0', 'live1', 'live2'])
+
+    def test_no_servers(self):
+        subscriber = Subscriber.make_subscriber('empty@example.com', 'first', 'last', 'password', 'US', 'en')
+        subscriber.save()
+        subscriber = Subscriber.objects.get({'_id': subscriber.pk})
+        self.assertEqual(subscriber.find_available_official_streams(), [])
+        self.assertEqual(subscriber.all_available_official_streams(), [])
+        self.assertEqual(subscriber.find_available_official_vods(skip=1, limit=1), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
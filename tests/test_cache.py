@@ -0,0 +1,44 @@
+import unittest
+from unittest import mock
+
+from pyfastocloud_models.utils.cache import LRUCache
+
+
+class LRUCacheTest(unittest.TestCase):
+    def test_max_count(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), (1, 3))
+
+    def test_max_total_size(self):
+        cache = LRUCache(10, sizeof=len)
+        cache.put('a', 'x' * 4)
+        cache.put('b', 'x' * 4)
+        cache.put('a', 'x' * 5)  # replaced, the old size is released
+        self.assertEqual(cache.stats()['total_size'], 9)
+        cache.put('c', 'x' * 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats()['total_size'], 8)
+        cache.put('d', 'x' * 11)  # larger than the whole cache, not kept
+        self.assertIsNone(cache.get('d'))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.pop('a'), 'x' * 5)
+        self.assertEqual(cache.stats()['total_size'], 3)
+        cache.clear()
+        self.assertEqual(cache.stats()['total_size'], 0)
+
+    def test_expired_size_is_released(self):
+        cache = LRUCache(10, ttl=5, sizeof=len)
+        with mock.patch('time.monotonic', return_value=100):
+            cache.put('a', 'x' * 4)
+        with mock.patch('time.monotonic', return_value=106):
+            self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['total_size'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
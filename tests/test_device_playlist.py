@@ -0,0 +1,97 @@
+import os
+import unittest
+from urllib.parse import urlparse
+
+from bson.objectid import ObjectId
+
+from pyfastocloud_models.common_entries import OutputUrl
+from pyfastocloud_models.stream.entry import IStream, ProxyStream
+from pyfastocloud_models.subscriber.entry import Subscriber, UserStream
+from tests.mongo import mongomock, connect_test_database, drop_test_database
+
+
+@unittest.skipIf(mongomock is None, 'mongomock is not installed')
+class DevicePlaylistTest(unittest.TestCase):
+    LB = 'lb.example.com:8000'
+    DID = 'did'
+
+    def setUp(self):
+        connect_test_database()
+        self.streams = []
+        for pos in range(5):
+            stream = ProxyStream(name='stream{0}'.format(pos), group='group',
+                                 output=[OutputUrl(uri='http://origin/{0}/index.m3u8'.format(pos))])
+            stream.save()
+            self.streams.append(stream)
+        # several outputs, only http(s) ones are listed
+        self.streams[3].tvg_id = 'news.tv'
+        self.streams[3].tvg_name = 'News'
+        self.streams[3].output = [OutputUrl(uri='rtmp://origin/3/live'), OutputUrl(uri='https://origin/3/a/b.ts?x=1'),
+                                  OutputUrl(uri='http://origin/3/master.m3u8')]
+        self.streams[3].save()
+        self.subscriber = Subscriber.make_subscriber('user@example.com', 'first', 'last', 'password', 'US', 'en')
+        self.subscriber.streams = [UserStream(sid=stream.pk) for stream in self.streams]
+        self.subscriber.save()
+
+    def tearDown(self):
+        drop_test_database()
+
+    def expected_playlist(self, streams) -> str:
+        # rendered the way generate_device_playlist did before the templates
+        result = '#EXTM3U\n'
+        for stream in streams:
+            for out in stream.output:
+                parsed_uri = urlparse(out.uri)
+                if parsed_uri.scheme == 'http' or parsed_uri.scheme == 'https':
+                    file_name = os.path.basename(parsed_uri.path)
+                    url = 'http://{0}/{1}/{2}/{3}/{4}/{5}/{6}'.format(self.LB, self.subscriber.id,
+                                                                      self.subscriber.password, self.DID, stream.id,
+                                                                      out.id, file_name)
+                    result += ('#EXTINF:-1 tvg-id="{0}" tvg-name="{1}" tvg-logo="{2}" group-title="{3}",{4}\n'
+                               '{5}\n').format(stream.tvg_id, stream.tvg_name, stream.tvg_logo, stream.group,
+                                                stream.name, url)
+        return result
+
+    def test_literal_playlist(self):
+        stream = self.streams[3]
+        playlist = self.subscriber.generate_playlist(self.DID, self.LB)
+        prefix = 'http://lb.example.com:8000/{0}/{1}/did/{2}/'.format(self.subscriber.id, self.subscriber.password,
+                                                                      stream.id)
+        extinf = '#EXTINF:-1 tvg-id="news.tv" tvg-name="News" tvg-logo="{0}" group-title="group",stream3\n'.format(
+            stream.tvg_logo)
+        self.assertIn('{0}{1}{2}/b.ts\n{0}{1}{3}/master.m3u8\n'.format(extinf, prefix, stream.output[1].id,
+                                                                        stream.output[2].id), playlist)
+        self.assertTrue(playlist.startswith('#EXTM3U\n#EXTINF:-1 tvg-id="" tvg-name="" tvg-logo="'))
+        self.assertNotIn('rtmp', playlist)
+
+    def test_matches_per_stream_playlists(self):
+        playlist = self.subscriber.generate_playlist(self.DID, self.LB)
+        self.assertEqual(playlist, self.expected_playlist(self.streams))
+        self.assertEqual(playlist, self.subscriber.generate_playlist(self.DID, self.LB))
+
+    def test_change_by_other_process(self):
+        self.subscriber.generate_playlist(self.DID, self.LB)
+        # another process saves the stream, only the stored document changes
+        IStream._mongometa.collection.update_one({'_id': self.streams[2].pk},
+                                                 {'$set': {'name': 'renamed', 'version': ObjectId()}})
+        self.streams[2].name = 'renamed'
+        self.assertEqual(self.subscriber.generate_playlist(self.DID, self.LB), self.expected_playlist(self.streams))
+
+    def test_save_and_unsaved_changes(self):
+        self.subscriber.generate_playlist(self.DID, self.LB)
+        stream = self.streams[0]
+        stream.name = 'unsaved'
+        self.assertIn(',unsaved\n', stream.generate_device_playlist('uid', 'hash', self.DID, self.LB))
+
+        stream.save()
+        self.assertIn(',unsaved\n', self.subscriber.generate_playlist(self.DID, self.LB))
+
+    def test_deleted_stream_is_skipped(self):
+        self.subscriber.generate_playlist(self.DID, self.LB)
+        self.streams[1].delete()
+        self.assertEqual(self.subscriber.generate_playlist(self.DID, self.LB),
+                         self.expected_playlist(self.streams[:1] + self.streams[2:]))
+
+
+if __name__ == '__main__':
+    unittest.main()
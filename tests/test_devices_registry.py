@@ -0,0 +1,74 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from bson.objectid import ObjectId
+
+from pyfastocloud_models.subscriber.entry import Device, Subscriber
+from tests.mongo import mongomock, connect_test_database, drop_test_database
+
+
+@unittest.skipIf(mongomock is None, 'mongomock is not installed')
+class DevicesRegistryTest(unittest.TestCase):
+    def setUp(self):
+        connect_test_database()
+        Subscriber.DEVICES_REGISTRY.clear()
+        self.subscriber = Subscriber.make_subscriber('user@example.com', 'first', 'last', 'password', 'US', 'en')
+        self.subscriber.status = Subscriber.Status.ACTIVE
+        self.subscriber.save()
+        self.device = Device(name='box')
+        self.assertTrue(self.subscriber.add_device(self.device))
+        self.collection = Subscriber._mongometa.collection
+
+    def tearDown(self):
+        Subscriber.DEVICES_REGISTRY.clear()
+        drop_test_database()
+
+    def authorize(self, did=None, pass_hash=None, uid=None) -> bool:
+        return Subscriber.authorize_device(uid or self.subscriber.get_id(), pass_hash or self.subscriber.password,
+                                           did or self.device.id)
+
+    def test_hit(self):
+        with mock.patch.object(self.collection, 'find_one', wraps=self.collection.find_one) as find_one:
+            self.assertTrue(self.authorize())
+            self.assertTrue(self.authorize())
+            self.assertFalse(self.authorize(pass_hash='wrong'))
+        self.assertEqual(find_one.call_count, 1)
+
+    def test_miss(self):
+        uid = ObjectId()
+        with mock.patch.object(self.collection, 'find_one', wraps=self.collection.find_one) as find_one:
+            self.assertFalse(self.authorize(uid=uid))
+            self.assertFalse(self.authorize(uid=uid))  # negative entry
+        self.assertEqual(find_one.call_count, 1)
+        self.assertFalse(self.authorize(did=ObjectId()))
+        self.assertFalse(self.authorize(uid='not an id'))
+
+    def test_statuses(self):
+        banned = Device(name='banned', status=Device.Status.BANNED)
+        self.subscriber.add_device(banned)
+        self.assertEqual(self.device.status, Device.Status.NOT_ACTIVE)
+        self.assertTrue(self.authorize())
+        self.assertFalse(self.authorize(did=banned.id))
+
+        self.subscriber.exp_date = datetime.now() - timedelta(days=1)
+        self.subscriber.save()
+        self.assertFalse(self.authorize())
+
+    def test_invalidation(self):
+        other = Device(name='other')
+        self.assertFalse(self.authorize(did=other.id))
+        self.subscriber.add_device(other)
+        self.assertTrue(self.authorize(did=other.id))
+
+        self.subscriber.remove_device(other.id)
+        self.assertFalse(self.authorize(did=other.id))
+        self.assertTrue(self.authorize())
+
+    def test_find_by_device_id(self):
+        self.assertEqual(Subscriber.find_by_device_id(self.device.id).pk, self.subscriber.pk)
+        self.assertIsNone(Subscriber.find_by_device_id(ObjectId()))
+
+
+if __name__ == '__main__':
+    unittest.main()
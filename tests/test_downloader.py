@@ -0,0 +1,135 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from pyfastocloud_models.utils.downloader import DownloadManager, make_partial_path
+from tests.http_server import LocalHttpServer
+
+
+class DownloadManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalHttpServer().__enter__()
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+        self.manager = DownloadManager(workers=4, chunk_size=64 * 1024, retries=1)
+
+    def tearDown(self):
+        self.manager.close()
+        self.directory.cleanup()
+        self.server.__exit__(None, None, None)
+
+    def read(self, file_name: str) -> bytes:
+        with open(os.path.join(self.path, file_name), 'rb') as file:
+            return file.read()
+
+    def test_download(self):
+        data = os.urandom(300 * 1024)
+        self.server.set_file('/files/logo.png', data)
+        result = self.manager.download(self.server.url('/files/logo.png'), self.path)
+        self.assertTrue(result.is_ok())
+        self.assertEqual(result.size, len(data))
+        self.assertEqual(self.read('logo.png'), data)
+        self.assertEqual(os.listdir(self.path), ['logo.png'])
+
+    def test_resume_after_broken_connection(self):
+        data = os.urandom(512 * 1024)
+        self.server.set_file('/video.mp4', data)
+        self.server.breaks['/video.mp4'] = 128 * 1024
+        url = self.server.url('/video.mp4')
+        first = self.manager.download(url, self.path)
+        self.assertFalse(first.is_ok())
+
+        second = self.manager.download(url, self.path)
+        self.assertTrue(second.is_ok())
+        self.assertTrue(second.resumed)
+        self.assertEqual(self.read('video.mp4'), data)
+        method, _, headers = self.server.requests[-1]
+        self.assertEqual(headers['Range'], 'bytes={0}-'.format(128 * 1024))
+        self.assertEqual(headers['If-Range'], self.server.etags['/video.mp4'])
+
+    def test_changed_file_is_restarted(self):
+        self.server.set_file('/epg.xml', os.urandom(256 * 1024))
+        self.server.breaks['/epg.xml'] = 64 * 1024
+        url = self.server.url('/epg.xml')
+        self.assertFalse(self.manager.download(url, self.path).is_ok())
+
+        data = os.urandom(256 * 1024)
+        self.server.set_file('/epg.xml', data)
+        result = self.manager.download(url, self.path)
+        self.assertTrue(result.is_ok())
+        self.assertFalse(result.resumed)
+        self.assertEqual(self.read('epg.xml'), data)
+
+    def test_stale_partial_file_is_restarted(self):
+        data = os.urandom(32 * 1024)
+        self.server.set_file('/index.m3u8', data)
+        url = self.server.url('/index.m3u8')
+        partial_path = make_partial_path(os.path.join(self.path, 'index.m3u8'), url)
+        with open(partial_path, 'wb') as file:
+            file.write(os.urandom(64 * 1024))
+        with open(partial_path + '.validator', 'w') as file:
+            file.write(self.server.etags['/index.m3u8'])
+
+        result = self.manager.download(url, self.path)
+        self.assertTrue(result.is_ok())
+        self.assertEqual(self.read('index.m3u8'), data)
+
+    def test_same_file_name_of_different_urls(self):
+        first, second = os.urandom(200 * 1024), os.urandom(100 * 1024)
+        self.server.set_file('/a/logo.png', first)
+        self.server.set_file('/b/logo.png', second)
+        self.server.breaks['/a/logo.png'] = 50 * 1024
+        self.assertFalse(self.manager.download(self.server.url('/a/logo.png'), self.path).is_ok())
+
+        self.assertTrue(self.manager.download(self.server.url('/b/logo.png'), self.path).is_ok())
+        self.assertEqual(self.read('logo.png'), second)
+        self.assertTrue(self.manager.download(self.server.url('/a/logo.png'), self.path).is_ok())
+        self.assertEqual(self.read('logo.png'), first)
+
+    def test_download_all(self):
+        files = {'/f{0}.bin'.format(i): os.urandom(20 * 1024) for i in range(10)}
+        for path, data in files.items():
+            self.server.set_file(path, data)
+        urls = [self.server.url(path) for path in files] + [self.server.url('/missing.bin')]
+        results = self.manager.download_all(urls, self.path)
+        self.assertEqual([result.url for result in results], urls)
+        self.assertTrue(all(result.is_ok() for result in results[:-1]))
+        self.assertFalse(results[-1].is_ok())
+        for path, data in files.items():
+            self.assertEqual(self.read(path[1:]), data)
+        self.assertEqual(self.manager.stats(), {'files': 10, 'bytes': 10 * 20 * 1024})
+
+    def test_retries_back_off(self):
+        self.server.statuses['/busy.bin'] = 503
+        manager = DownloadManager(retries=5, backoff=1, max_backoff=4)
+        with mock.patch('random.uniform', side_effect=lambda low, high: high), mock.patch('time.sleep') as sleep:
+            result = manager.download(self.server.url('/busy.bin'), self.path)
+        manager.close()
+        self.assertFalse(result.is_ok())
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [1, 2, 4, 4])
+        self.assertEqual(len(self.server.requests), 5)
+
+    def test_client_errors_are_not_retried(self):
+        manager = DownloadManager(retries=3)
+        with mock.patch('time.sleep') as sleep:
+            result = manager.download(self.server.url('/missing.bin'), self.path)
+        manager.close()
+        self.assertFalse(result.is_ok())
+        sleep.assert_not_called()
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_broken_connection_is_retried(self):
+        data = os.urandom(256 * 1024)
+        self.server.set_file('/video.mp4', data)
+        self.server.breaks['/video.mp4'] = 64 * 1024
+        manager = DownloadManager(chunk_size=16 * 1024, retries=2, backoff=0.01)
+        result = manager.download(self.server.url('/video.mp4'), self.path)
+        manager.close()
+        self.assertTrue(result.is_ok())
+        self.assertTrue(result.resumed)
+        self.assertEqual(self.read('video.mp4'), data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import sys
+import types
+import unittest
+from unittest import mock
+
+from pyfastocloud_models.utils.email_validator import EmailValidator, lookup_mx
+
+
+def make_dns_modules(records: dict) -> dict:
+    # dnspython stand-in: domain -> MX answers, or the exception class raised for the domain
+    dns = types.ModuleType('dns')
+    exception = types.ModuleType('dns.exception')
+    resolver = types.ModuleType('dns.resolver')
+
+    class DNSException(Exception):
+        pass
+
+    exception.DNSException = DNSException
+    resolver.NXDOMAIN = type('NXDOMAIN', (DNSException,), {})
+    resolver.NoAnswer = type('NoAnswer', (DNSException,), {})
+    resolver.LifetimeTimeout = type('LifetimeTimeout', (DNSException,), {})
+    resolver.calls = []
+
+    def resolve(domain: str, record_type: str):
+        resolver.calls.append((domain, record_type))
+        result = records.get(domain, 'NXDOMAIN')
+        if isinstance(result, str):
+            raise getattr(resolver, result)()
+        return result
+
+    resolver.resolve = resolve
+    dns.exception = exception
+    dns.resolver = resolver
+    return {'dns': dns, 'dns.exception': exception, 'dns.resolver': resolver}
+
+
+RECORDS = {'mx-only.com': ['mail.mx-only.com'], 'address-only.com': 'NoAnswer', 'slow.com': 'LifetimeTimeout'}
+
+
+class LookupMxTest(unittest.TestCase):
+    def test_records(self):
+        with mock.patch.dict(sys.modules, make_dns_modules(RECORDS)):
+            self.assertTrue(lookup_mx('mx-only.com'))
+            self.assertFalse(lookup_mx('address-only.com'))
+            self.assertFalse(lookup_mx('missing.com'))
+            self.assertIsNone(lookup_mx('slow.com'))
+
+    def test_without_dnspython(self):
+        with mock.patch.dict(sys.modules, {'dns': None, 'dns.resolver': None, 'dns.exception': None}):
+            self.assertIsNone(lookup_mx('mx-only.com'))
+
+
+class EmailValidatorTest(unittest.TestCase):
+    def test_offline(self):
+        validator = EmailValidator(check_mx=False)
+        self.assertTrue(validator.validate('user@example.com'))
+        self.assertFalse(validator.validate('user@mailinator.com'))
+        self.assertFalse(validator.validate('not an email'))
+        self.assertEqual(validator.validate_many(['a@example.com', 'b@yopmail.com', '', 'a@example.com']),
+                         {'a@example.com': True, 'b@yopmail.com': False, '': False})
+
+    def test_mx(self):
+        modules = make_dns_modules(RECORDS)
+        validator = EmailValidator(check_mx=True)
+        with mock.patch.dict(sys.modules, modules):
+            self.assertTrue(validator.validate('user@mx-only.com'))
+            self.assertFalse(validator.validate('user@address-only.com'))
+            self.assertFalse(validator.validate('user@missing.com'))
+            self.assertTrue(validator.validate('user@slow.com'))  # unknown, not rejected
+
+            calls = len(modules['dns.resolver'].calls)
+            for domain in ('mx-only.com', 'address-only.com', 'slow.com'):
+                validator.validate('other@' + domain)
+        # known answers are cached, unknown ones are looked up again
+        self.assertEqual(modules['dns.resolver'].calls[calls:], [('slow.com', 'MX')])
+
+    def test_mx_unknown_without_dnspython(self):
+        validator = EmailValidator(check_mx=True)
+        with mock.patch.dict(sys.modules, {'dns': None, 'dns.resolver': None, 'dns.exception': None}):
+            self.assertTrue(validator.validate('user@mx-only.com'))
+
+
+if __name__ == '__main__':
+    unittest.main()
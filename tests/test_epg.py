@@ -0,0 +1,59 @@
+import io
+import unittest
+from datetime import datetime
+
+from pyfastocloud_models.epg.entry import Epg, PROGRAMMES_INDEX, get_current_programme, get_programmes
+from pyfastocloud_models.epg.xmltv import import_epg
+from tests.mongo import mongomock, connect_test_database, drop_test_database
+
+GUIDE = b'''<?xml version="1.0" encoding="UTF-8"?>
+<tv>
+<channel id="news"><display-name>News</display-name></channel>
+<programme start="20200101100000 +0000" channel="news"><title>Morning</title></programme>
+<programme start="20200101120000 +0000" stop="20200101130000 +0000" channel="news"><title>Noon</title></programme>
+<programme start="20200101130000 +0000" channel="news"><title>Afternoon</title></programme>
+<programme start="20200101150000 +0000" channel="news"><title>Evening</title></programme>
+<programme start="20200101100000 +0000" stop="20200101110000 +0000" channel="other"><title>Other</title></programme>
+</tv>
+'''
+
+OTHER_GUIDE = b'''<?xml version="1.0" encoding="UTF-8"?>
+<tv>
+<programme start="20200101100000 +0000" stop="20200101200000 +0000" channel="news"><title>All day</title></programme>
+</tv>
+'''
+
+
+@unittest.skipIf(mongomock is None, 'mongomock is not installed')
+class ImportEpgTest(unittest.TestCase):
+    def setUp(self):
+        connect_test_database()
+        PROGRAMMES_INDEX.invalidate()
+        self.epg = Epg(uri='http://127.0.0.1/epg.xml')
+        self.epg.save()
+
+    def tearDown(self):
+        PROGRAMMES_INDEX.invalidate()
+        drop_test_database()
+
+    def titles(self, epg: Epg) -> list:
+        programmes = get_programmes(epg.pk, 'news', datetime(2020, 1, 1), datetime(2020, 1, 2))
+        return [(programme.title, programme.start.hour, programme.stop.hour) for programme in programmes]
+
+    def test_missing_stop_is_inferred(self):
+        stats = import_epg(self.epg, io.BytesIO(GUIDE), channels={'news'})
+        self.assertEqual(stats, {'channels': 1, 'programmes': 3, 'inferred': 2, 'skipped': 2})
+        self.assertEqual(self.titles(self.epg), [('Morning', 10, 12), ('Noon', 12, 13), ('Afternoon', 13, 15)])
+
+    def test_programmes_of_epgs_are_separated(self):
+        other = Epg(uri='http://127.0.0.1/other.xml')
+        other.save()
+        import_epg(self.epg, io.BytesIO(GUIDE), channels={'news'})
+        import_epg(other, io.BytesIO(OTHER_GUIDE), channels={'news'})
+        self.assertEqual(get_current_programme(self.epg.pk, 'news', datetime(2020, 1, 1, 12, 30)).title, 'Noon')
+        self.assertEqual(get_current_programme(other.pk, 'news', datetime(2020, 1, 1, 12, 30)).title, 'All day')
+        self.assertEqual(len(self.titles(self.epg)), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
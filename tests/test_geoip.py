@@ -0,0 +1,155 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from pyfastocloud_models.utils.geoip import CachedCountryResolver, CountryLookupError, CountryResolver, \
+    IpInfoCountryResolver, RangeIndexCountryResolver
+from tests.http_server import LocalHttpServer
+
+RANGES = '''first,last,country
+# comment
+1.0.0.0,1.0.0.255,AU
+1.0.1.0,1.0.3.255,cn
+2.0.0.0,2.0.0.10,-
+bad,2.0.0.20,FR
+3.0.0.0,3.0.0.9
+16777216,16777471,au
+2001:db8::,2001:db8::ffff,DE
+2001:db9::,2001:db9:ffff:ffff:ffff:ffff:ffff:ffff,NL
+'''
+
+
+class RangeIndexCountryResolverTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        csv_path = os.path.join(self.directory.name, 'ranges.csv')
+        with open(csv_path, 'w') as file:
+            file.write(RANGES)
+        self.index_path = os.path.join(self.directory.name, 'ranges.idx')
+        self.count = RangeIndexCountryResolver.build_index(csv_path, self.index_path)
+        self.resolver = RangeIndexCountryResolver(self.index_path)
+
+    def tearDown(self):
+        self.resolver.close()
+        self.directory.cleanup()
+
+    def test_build_index(self):
+        self.assertEqual(self.count, 5)  # duplicate integer range kept, header, comment and invalid rows skipped
+        self.assertEqual(os.path.getsize(self.index_path), 5 * RangeIndexCountryResolver.RECORD_SIZE)
+        self.assertEqual(sorted(os.listdir(self.directory.name)), ['ranges.csv', 'ranges.idx'])
+
+    def test_ipv4_boundaries(self):
+        for addr, country in (('0.255.255.255', None), ('1.0.0.0', 'AU'), ('1.0.0.255', 'AU'), ('1.0.1.0', 'CN'),
+                              ('1.0.3.255', 'CN'), ('1.0.4.0', None), ('2.0.0.5', None), ('2.0.0.20', None),
+                              ('3.0.0.1', None), ('255.255.255.255', None), ('0.0.0.0', None)):
+            self.assertEqual(self.resolver.resolve(addr), country, addr)
+
+    def test_ipv6_boundaries(self):
+        for addr, country in (('2001:db7:ffff:ffff:ffff:ffff:ffff:ffff', None), ('2001:db8::', 'DE'),
+                              ('2001:db8::ffff', 'DE'), ('2001:db8::1:0', None), ('2001:db9::', 'NL'),
+                              ('2001:db9:ffff:ffff:ffff:ffff:ffff:ffff', 'NL'), ('2001:dba::', None), ('::1', None),
+                              ('::ffff:1.0.0.1', 'AU')):
+            self.assertEqual(self.resolver.resolve(addr), country, addr)
+
+    def test_invalid_address(self):
+        self.assertIsNone(self.resolver.resolve('localhost'))
+        self.assertEqual(self.resolver.resolve_many(['1.0.0.1', 'bad']), {'1.0.0.1': 'AU', 'bad': None})
+
+    def test_empty_index(self):
+        csv_path = os.path.join(self.directory.name, 'empty.csv')
+        open(csv_path, 'w').close()
+        index_path = os.path.join(self.directory.name, 'empty.idx')
+        self.assertEqual(RangeIndexCountryResolver.build_index(csv_path, index_path), 0)
+        resolver = RangeIndexCountryResolver(index_path)
+        self.assertIsNone(resolver.resolve('1.0.0.1'))
+        resolver.close()
+
+
+class FailingResolver(CountryResolver):
+    def __init__(self):
+        self.answers = {}
+        self.calls = []
+
+    def lookup(self, remote_addr: str):
+        self.calls.append(remote_addr)
+        answer = self.answers.get(remote_addr)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+class CachedCountryResolverTest(unittest.TestCase):
+    def setUp(self):
+        self.backend = FailingResolver()
+        self.resolver = CachedCountryResolver(self.backend)
+
+    def test_failures_are_not_cached(self):
+        self.backend.answers['1.1.1.1'] = CountryLookupError('timeout')
+        self.assertIsNone(self.resolver.resolve('1.1.1.1'))
+        self.backend.answers['1.1.1.1'] = 'AU'
+        self.assertEqual(self.resolver.resolve('1.1.1.1'), 'AU')
+        self.assertEqual(self.resolver.resolve('1.1.1.1'), 'AU')
+        self.assertEqual(self.backend.calls, ['1.1.1.1', '1.1.1.1'])
+
+    def test_unknown_is_cached(self):
+        self.assertIsNone(self.resolver.resolve('10.0.0.1'))
+        self.backend.answers['10.0.0.1'] = 'US'
+        self.assertIsNone(self.resolver.resolve('10.0.0.1'))
+        self.assertEqual(self.backend.calls, ['10.0.0.1'])
+
+    def test_resolve_many(self):
+        self.backend.answers.update({'1.1.1.1': 'AU', '2.2.2.2': CountryLookupError('timeout')})
+        self.assertEqual(self.resolver.resolve_many(['1.1.1.1', '2.2.2.2', '10.0.0.1']),
+                         {'1.1.1.1': 'AU', '2.2.2.2': None, '10.0.0.1': None})
+        self.backend.answers['2.2.2.2'] = 'FR'
+        self.assertEqual(self.resolver.resolve_many(['1.1.1.1', '2.2.2.2', '10.0.0.1']),
+                         {'1.1.1.1': 'AU', '2.2.2.2': 'FR', '10.0.0.1': None})
+        self.assertEqual(self.backend.calls, ['1.1.1.1', '2.2.2.2', '10.0.0.1', '2.2.2.2'])
+
+
+class IpInfoCountryResolverTest(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalHttpServer().__enter__()
+        self.url = mock.patch.object(IpInfoCountryResolver, 'URL', self.server.url('/{0}/country'))
+        self.url.start()
+        self.backend = IpInfoCountryResolver(workers=2)
+        self.resolver = CachedCountryResolver(self.backend)
+
+    def tearDown(self):
+        self.resolver.close()
+        self.url.stop()
+        self.server.__exit__(None, None, None)
+
+    def test_error_response_is_not_cached(self):
+        self.server.statuses['/1.1.1.1/country'] = 503
+        self.assertIsNone(self.resolver.resolve('1.1.1.1'))
+        del self.server.statuses['/1.1.1.1/country']
+        self.server.set_file('/1.1.1.1/country', b'AU\n')
+        self.assertEqual(self.resolver.resolve('1.1.1.1'), 'AU')
+
+    def test_unknown_answer_is_cached(self):
+        self.server.set_file('/10.0.0.1/country', b'undefined\n')
+        self.assertIsNone(self.resolver.resolve('10.0.0.1'))
+        self.server.set_file('/10.0.0.1/country', b'US\n')
+        self.assertIsNone(self.resolver.resolve('10.0.0.1'))
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_resolve_many(self):
+        self.server.set_file('/1.1.1.1/country', b'AU\n')
+        self.server.statuses['/2.2.2.2/country'] = 429
+        self.assertEqual(self.resolver.resolve_many(['1.1.1.1', '2.2.2.2', '1.1.1.1']),
+                         {'1.1.1.1': 'AU', '2.2.2.2': None})
+        with self.assertRaises(CountryLookupError):
+            self.backend.lookup('2.2.2.2')
+
+    def test_connection_error(self):
+        self.backend.timeout = 0.5
+        self.server.__exit__(None, None, None)
+        self.assertIsNone(self.resolver.resolve('1.1.1.1'))
+        self.assertEqual(self.resolver.resolve_many(['1.1.1.1']), {'1.1.1.1': None})
+        self.assertEqual(self.resolver.stats()['size'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
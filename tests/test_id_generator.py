@@ -0,0 +1,103 @@
+import time
+import unittest
+from unittest import mock
+
+import pymodm.connection
+
+from pyfastocloud_models.common_entries import OutputUrl
+from pyfastocloud_models.service.entry import ServiceSettings
+from pyfastocloud_models.stream.entry import IStream, ProxyStream, renumber_streams_urls_ids
+from pyfastocloud_models.utils.id_generator import CounterIdGenerator, IdCounter
+from tests.mongo import mongomock, connect_test_database, drop_test_database
+
+
+def current_seed() -> int:
+    return (int(time.time()) - CounterIdGenerator.SEED_EPOCH) << CounterIdGenerator.SEED_SHIFT
+
+
+@unittest.skipIf(mongomock is None, 'mongomock is not installed')
+class CounterIdGeneratorTest(unittest.TestCase):
+    def setUp(self):
+        connect_test_database()
+
+    def tearDown(self):
+        drop_test_database()
+
+    def stored_next(self, name: str) -> int:
+        return IdCounter._mongometa.collection.find_one({'_id': name})['next']
+
+    def test_batches(self):
+        seed = current_seed()
+        generator = CounterIdGenerator('test', batch_size=3)
+        ids = [generator.generate() for _ in range(7)]
+        self.assertEqual(ids, list(range(ids[0], ids[0] + 7)))
+        self.assertGreater(ids[0], seed)
+        self.assertEqual(self.stored_next('test'), ids[0] + 9)  # third batch reserved
+
+    def test_seed_does_not_lower_counter(self):
+        high = current_seed() + (1 << 30)
+        IdCounter._mongometa.collection.insert_one({'_id': 'test', 'next': high})
+        self.assertEqual(CounterIdGenerator('test', batch_size=10).generate(), high)
+
+    def test_seed_raises_counter(self):
+        IdCounter._mongometa.collection.insert_one({'_id': 'test', 'next': 5})
+        self.assertGreater(CounterIdGenerator('test').generate(), current_seed())
+
+    def test_unique_across_instances(self):
+        generators = [CounterIdGenerator('test', batch_size=4) for _ in range(3)]
+        ids = [generator.generate() for _ in range(10) for generator in generators]
+        self.assertEqual(len(set(ids)), len(ids))
+
+    def test_without_connection(self):
+        generator = CounterIdGenerator('test')
+        with mock.patch.dict(pymodm.connection._CONNECTIONS, clear=True):
+            ids = [generator.generate() for _ in range(3)]
+            stream = ProxyStream(name='offline', output=[OutputUrl(uri='http://origin/offline/index.m3u8')])
+            stream.generate_device_playlist('uid', 'hash', 'did', 'lb:81', False)
+        self.assertEqual(len(set(ids)), 3)
+        self.assertGreaterEqual(ids[0], current_seed() - (1 << CounterIdGenerator.SEED_SHIFT))
+        self.assertIsNone(IdCounter._mongometa.collection.find_one({'_id': 'test'}))
+
+
+@unittest.skipIf(mongomock is None, 'mongomock is not installed')
+class RenumberStreamsUrlsIdsTest(unittest.TestCase):
+    def setUp(self):
+        connect_test_database()
+        collection = IStream._mongometa.collection
+        self.first = collection.insert_one({'_cls': ProxyStream._mongometa.object_name, 'name': 'first',
+                                            'output': [{'id': 0, 'uri': 'http://a'}, {'id': 1, 'uri': 'http://b'}],
+                                            'version': None}).inserted_id
+        self.second = collection.insert_one({'_cls': ProxyStream._mongometa.object_name, 'name': 'second',
+                                             'output': [{'id': 0, 'uri': 'http://c'}, {'uri': 'http://d'}],
+                                             'version': None}).inserted_id
+        self.service = ServiceSettings()
+        self.service.save()
+        ServiceSettings._mongometa.collection.update_one({'_id': self.service.pk},
+                                                         {'$set': {'streams': [self.first, self.second]}})
+
+    def tearDown(self):
+        drop_test_database()
+
+    def ids(self, sid) -> list:
+        return [url.get('id') for url in IStream._mongometa.collection.find_one({'_id': sid})['output']]
+
+    def test_duplicates_only(self):
+        version = ServiceSettings._mongometa.collection.find_one({'_id': self.service.pk}).get('content_version')
+        self.assertEqual(renumber_streams_urls_ids(), 2)
+        self.assertEqual(self.ids(self.first), [0, 1])
+        second = self.ids(self.second)
+        self.assertEqual(len(set(second) | {0, 1}), 4)
+        self.assertIsNone(IStream._mongometa.collection.find_one({'_id': self.first})['version'])
+        self.assertIsNotNone(IStream._mongometa.collection.find_one({'_id': self.second})['version'])
+        stored = ServiceSettings._mongometa.collection.find_one({'_id': self.service.pk})
+        self.assertNotEqual(stored.get('content_version'), version)
+
+    def test_all(self):
+        self.assertEqual(renumber_streams_urls_ids(duplicates_only=False), 4)
+        ids = self.ids(self.first) + self.ids(self.second)
+        self.assertEqual(len(set(ids)), 4)
+        self.assertTrue(all(url_id > 1 for url_id in ids))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import unittest
+
+from pyfastocloud_models.utils.interval_index import IntervalIndex
+
+INTERVALS = [(30, 40, 'c', None), (10, 20, 'a', 'payload a'), (15, 50, 'b', None), (60, 70, 'd', None)]
+
+
+class IntervalIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.loads = []
+        self.index = IntervalIndex(self.load)
+
+    def load(self, key):
+        self.loads.append(key)
+        return INTERVALS if key == 'news' else []
+
+    def test_overlapping(self):
+        self.assertEqual(self.index.overlapping('news', 0, 100), ['payload a', 'b', 'c', 'd'])
+        self.assertEqual(self.index.overlapping('news', 20, 30), ['b'])  # [start, stop)
+        self.assertEqual(self.index.overlapping('news', 45, 60), ['b'])
+        self.assertEqual(self.index.overlapping('news', 50, 60), [])
+        self.assertEqual(self.index.overlapping('sport', 0, 100), [])
+        self.assertEqual(self.loads, ['news', 'sport'])
+
+    def test_at(self):
+        self.assertEqual(self.index.at('news', 10), ['payload a'])
+        self.assertEqual(self.index.at('news', 20), ['b'])
+        self.assertEqual(self.index.at('news', 35), ['b', 'c'])
+        self.assertEqual(self.index.at('news', 55), [])
+        self.assertEqual(self.index.at('news', 70), [])
+
+    def test_next(self):
+        self.assertEqual(self.index.next('news', 15), ['b'])
+        self.assertEqual(self.index.next('news', 16, 2), ['c', 'd'])
+        self.assertEqual(self.index.next('news', 61), [])
+
+    def test_add_update_remove(self):
+        self.index.add('news', 0, 5, 'ignored')  # not loaded key, the loader reads it later
+        self.index.at('news', 10)
+        self.index.add('news', 55, 58, 'e')
+        self.assertEqual(self.index.at('news', 56), ['e'])
+        self.index.update('c', 80, 90)
+        self.assertEqual(self.index.at('news', 35), ['b'])
+        self.assertEqual(self.index.next('news', 71), ['c'])
+        self.assertEqual(self.index.at('sport', 5), [])
+
+        # relocation to another loaded key
+        self.index.add('sport', 0, 10, 'c')
+        self.assertEqual(self.index.at('sport', 5), ['c'])
+        self.assertEqual(self.index.next('news', 71), [])
+
+        self.index.remove('b')
+        self.assertEqual(self.index.overlapping('news', 0, 100), ['payload a', 'e', 'd'])
+        self.index.update('b', 0, 100)  # unknown vid, ignored
+        self.assertEqual(self.index.overlapping('news', 0, 100), ['payload a', 'e', 'd'])
+        self.assertEqual(self.loads, ['news', 'sport'])
+
+    def test_max_length_after_add(self):
+        self.index.replace('news', [(10, 20, 'a', None)])
+        self.index.add('news', 0, 100, 'long')
+        self.assertEqual(self.index.at('news', 90), ['long'])
+
+    def test_eviction(self):
+        index = IntervalIndex(self.load, max_keys=2)
+        index.at('news', 10)
+        index.at('sport', 10)
+        index.at('news', 10)  # news is the most recently used
+        index.at('movies', 10)
+        self.assertEqual(index.keys(), ['news', 'movies'])
+        self.assertEqual(len(index), 2)
+        index.at('sport', 10)
+        self.assertEqual(self.loads, ['news', 'sport', 'movies', 'sport'])
+
+    def test_invalidate(self):
+        self.index.at('news', 10)
+        self.index.invalidate('news')
+        self.index.at('news', 10)
+        self.index.invalidate()
+        self.assertEqual(self.index.keys(), [])
+        self.assertEqual(self.loads, ['news', 'news'])
+
+    def test_ttl(self):
+        index = IntervalIndex(self.load, ttl=0)
+        index.at('news', 10)
+        index.at('news', 10)
+        self.assertEqual(self.loads, ['news', 'news'])
+
+    def test_change_during_load_is_discarded(self):
+        def load(key):
+            # the interval moves while the loader reads the old version
+            self.index.update('a', 100, 110)
+            self.index.invalidate(key)
+            return INTERVALS
+
+        self.index.loader = load
+        self.assertEqual(self.index.at('news', 10), ['payload a'])  # the caller gets the loaded data
+        self.assertEqual(self.index.keys(), [])  # but it is not kept
+        self.index.loader = self.load
+        self.assertEqual(self.index.at('news', 10), ['payload a'])
+        self.assertEqual(self.index.keys(), ['news'])
+
+    def test_add_during_load_is_discarded(self):
+        def load(key):
+            self.index.add(key, 0, 5, 'new')
+            return INTERVALS
+
+        self.index.loader = load
+        self.index.at('news', 1)
+        self.assertEqual(self.index.keys(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+
+from pyfastocloud_models.utils.benchmark import legacy_parse_m3u
+from pyfastocloud_models.utils.m3u_parser import M3uParser, iter_entries
+
+PLAYLIST = '''#EXTM3U
+#EXTINF:-1 tvg-id="first.tv" tvg-name="First" tvg-logo="http://logos/first.png" group-title="News",First, HD
+http://origin/first/index.m3u8
+
+# comment
+#EXTINF:-1 tvg-id="no.comma" group-title="Sport"
+http://origin/no_comma/index.m3u8
+#EXTINF:-1,Bare
+\t
+rtmp://origin/bare/live\r
+#EXTINF:-1 tvg-name="Dangling",Dangling
+'''
+
+ENTRIES = [
+    {'title': ' HD', 'tvg-name': 'First', 'tvg-id': 'first.tv', 'tvg-logo': 'http://logos/first.png',
+     'tvg-group': 'News', 'link': 'http://origin/first/index.m3u8'},
+    {'title': 'Unknown', 'tvg-name': 'Unknown', 'tvg-id': 'no.comma', 'tvg-logo': 'Unknown', 'tvg-group': 'Sport',
+     'link': 'http://origin/no_comma/index.m3u8'},
+    {'title': 'Bare', 'tvg-name': 'Unknown', 'tvg-id': 'Unknown', 'tvg-logo': 'Unknown', 'tvg-group': 'Unknown',
+     'link': 'rtmp://origin/bare/live'},
+]
+
+
+class M3uParserTest(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.m3u')
+        with os.fdopen(fd, 'w') as file:
+            file.write(PLAYLIST)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_iter_entries(self):
+        self.assertEqual(list(iter_entries(self.path)), ENTRIES)
+        self.assertEqual(list(iter_entries(PLAYLIST.split('\n'))), ENTRIES)
+
+    def test_matches_former_parser(self):
+        self.assertEqual(list(iter_entries(self.path)), legacy_parse_m3u(self.path))
+
+    def test_parser_list(self):
+        parser = M3uParser()
+        parser.read_m3u(self.path)
+        parser.parse()
+        self.assertEqual(parser.get_list(), ENTRIES)
+        parser.filter_in_files_of_groups_containing('News')
+        self.assertEqual([entry['tvg-id'] for entry in parser.get_list()], ['first.tv'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from bson.objectid import ObjectId
+
+from pyfastocloud_models.service.entry import ServiceSettings
+from pyfastocloud_models.service.materializer import SUBSCRIBERS_DIR_NAME, get_service_playlist_path, \
+    is_file_actual, materialize_service_playlist, prune_playlists, write_file_atomic
+from tests.mongo import mongomock, connect_test_database, drop_test_database
+
+
+class WriteFileAtomicTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'playlists', 'service.m3u')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read(self, path: str) -> str:
+        with open(path) as file:
+            return file.read()
+
+    def test_unchanged_content_is_skipped(self):
+        self.assertTrue(write_file_atomic(self.path, ['#EXTM3U\n', 'first\n'], 'v1'))
+        inode = os.stat(self.path).st_ino
+        self.assertFalse(write_file_atomic(self.path, ['#EXTM3U\nfirst\n'], 'v2'))
+        self.assertEqual(os.stat(self.path).st_ino, inode)
+        self.assertTrue(is_file_actual(self.path, 'v2'))  # the version is updated anyway
+        self.assertEqual(sorted(os.listdir(os.path.dirname(self.path))), ['service.m3u', 'service.m3u.sha1'])
+
+    def test_changed_content_is_rewritten(self):
+        write_file_atomic(self.path, ['#EXTM3U\n', 'first\n'])
+        self.assertTrue(write_file_atomic(self.path, ['#EXTM3U\n', 'second\n']))
+        self.assertEqual(self.read(self.path), '#EXTM3U\nsecond\n')
+
+    def test_missing_file_is_rewritten(self):
+        write_file_atomic(self.path, ['#EXTM3U\n'], 'v1')
+        os.remove(self.path)
+        self.assertFalse(is_file_actual(self.path, 'v1'))
+        self.assertTrue(write_file_atomic(self.path, ['#EXTM3U\n'], 'v1'))
+        self.assertEqual(self.read(self.path), '#EXTM3U\n')
+
+    def test_failed_write_keeps_the_file(self):
+        write_file_atomic(self.path, ['#EXTM3U\n'], 'v1')
+
+        def fragments():
+            yield '#EXTM3U\n'
+            raise RuntimeError('stream load failed')
+
+        with self.assertRaises(RuntimeError):
+            write_file_atomic(self.path, fragments(), 'v2')
+        self.assertEqual(self.read(self.path), '#EXTM3U\n')
+        self.assertTrue(is_file_actual(self.path, 'v1'))
+        self.assertEqual(sorted(os.listdir(os.path.dirname(self.path))), ['service.m3u', 'service.m3u.sha1'])
+
+    def test_is_file_actual(self):
+        self.assertFalse(is_file_actual(self.path, 'v1'))
+        write_file_atomic(self.path, ['#EXTM3U\n'], 'v1')
+        self.assertTrue(is_file_actual(self.path, 'v1'))
+        self.assertFalse(is_file_actual(self.path, 'v2'))
+        self.assertFalse(is_file_actual(self.path, None))
+        write_file_atomic(self.path, ['#EXTM3U\n'])  # without version
+        self.assertFalse(is_file_actual(self.path, 'v1'))
+
+
+class PrunePlaylistsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def touch(self, *names) -> str:
+        path = os.path.join(self.path, *names)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, 'w').close()
+        return path
+
+    def test_prune(self):
+        kept_service, stale_service = str(ObjectId()), str(ObjectId())
+        subscriber, stale_subscriber = str(ObjectId()), str(ObjectId())
+        kept_device, stale_device = str(ObjectId()), str(ObjectId())
+        kept = {self.touch(kept_service + '.m3u'),
+                self.touch(SUBSCRIBERS_DIR_NAME, subscriber, kept_device + '.m3u')}
+        self.touch(kept_service + '.m3u.sha1')
+        self.touch(stale_service + '.m3u')
+        self.touch(stale_service + '.m3u.sha1')
+        self.touch(SUBSCRIBERS_DIR_NAME, subscriber, kept_device + '.m3u.sha1')
+        self.touch(SUBSCRIBERS_DIR_NAME, subscriber, stale_device + '.m3u')
+        self.touch(SUBSCRIBERS_DIR_NAME, subscriber, stale_device + '.m3u.sha1')
+        self.touch(SUBSCRIBERS_DIR_NAME, stale_subscriber, stale_device + '.m3u')
+        self.touch(SUBSCRIBERS_DIR_NAME, stale_subscriber, stale_device + '.m3u.sha1')
+        # not written by the materializer
+        self.touch('custom.m3u')
+        self.touch(stale_service + '.txt')
+        self.touch(SUBSCRIBERS_DIR_NAME, 'custom', stale_device + '.m3u')
+
+        self.assertEqual(prune_playlists(self.path, kept), 3)
+        self.assertEqual(sorted(os.listdir(self.path)),
+                         sorted([kept_service + '.m3u', kept_service + '.m3u.sha1', 'custom.m3u',
+                                 stale_service + '.txt', SUBSCRIBERS_DIR_NAME]))
+        subscribers_path = os.path.join(self.path, SUBSCRIBERS_DIR_NAME)
+        self.assertEqual(sorted(os.listdir(subscribers_path)), sorted(['custom', subscriber]))
+        self.assertEqual(sorted(os.listdir(os.path.join(subscribers_path, subscriber))),
+                         [kept_device + '.m3u', kept_device + '.m3u.sha1'])
+
+    def test_missing_directory(self):
+        self.assertEqual(prune_playlists(os.path.join(self.path, 'missing'), set()), 0)
+
+
+@unittest.skipIf(mongomock is None, 'mongomock is not installed')
+class MaterializeServicePlaylistTest(unittest.TestCase):
+    def setUp(self):
+        connect_test_database()
+        self.directory = tempfile.TemporaryDirectory()
+        self.service = ServiceSettings(playlists_directory=self.directory.name)
+        self.service.save()
+
+    def tearDown(self):
+        self.directory.cleanup()
+        drop_test_database()
+
+    def test_actual_version_is_not_rendered(self):
+        self.assertTrue(materialize_service_playlist(self.service))
+        self.assertTrue(os.path.exists(get_service_playlist_path(self.service)))
+        with mock.patch.object(ServiceSettings, 'iter_playlist') as iter_playlist:
+            self.assertFalse(materialize_service_playlist(self.service))
+        iter_playlist.assert_not_called()
+
+        self.service.touch_content()
+        with mock.patch.object(ServiceSettings, 'iter_playlist', wraps=self.service.iter_playlist) as iter_playlist:
+            self.assertFalse(materialize_service_playlist(self.service))  # same content
+        iter_playlist.assert_called_once()
+        self.assertTrue(is_file_actual(get_service_playlist_path(self.service),
+                                       str(self.service.get_content_version())))
+
+
+if __name__ == '__main__':
+    unittest.main()
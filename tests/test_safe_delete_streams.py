@@ -0,0 +1,67 @@
+import unittest
+
+from pyfastocloud_models.service.entry import ServiceSettings, safe_delete_stream, safe_delete_streams
+from pyfastocloud_models.stream.entry import IStream, ProxyStream
+from pyfastocloud_models.subscriber.entry import Subscriber, UserStream
+from tests.mongo import mongomock, connect_test_database, drop_test_database
+
+
+@unittest.skipIf(mongomock is None, 'mongomock is not installed')
+class SafeDeleteStreamsTest(unittest.TestCase):
+    def setUp(self):
+        connect_test_database()
+        self.part = self.make_stream('part')
+        self.middle = self.make_stream('middle', [self.part])
+        self.stream = self.make_stream('stream', [self.middle])
+        self.other = self.make_stream('other')
+        self.service = ServiceSettings(streams=[self.stream, self.other])
+        self.service.save()
+        self.subscriber = Subscriber.make_subscriber('safe@example.com', 'first', 'last', 'password', 'US', 'en')
+        self.subscriber.servers = [self.service]
+        self.subscriber.streams = [UserStream(sid=self.stream), UserStream(sid=self.stream, private=True),
+                                   UserStream(sid=self.other)]
+        self.subscriber.vods = [UserStream(sid=self.middle)]
+        self.subscriber.catchups = [UserStream(sid=self.part), UserStream(sid=self.other)]
+        self.subscriber.save()
+
+    def tearDown(self):
+        drop_test_database()
+
+    @staticmethod
+    def make_stream(name: str, parts=None) -> IStream:
+        stream = ProxyStream(name=name, group='group', parts=parts or [])
+        stream.save()
+        return stream
+
+    def stored_entries(self, field: str) -> list:
+        doc = Subscriber._mongometa.collection.find_one({'_id': self.subscriber.pk})
+        return [(entry['sid'], entry['private']) for entry in doc[field]]
+
+    def stored_stream_ids(self) -> set:
+        return {doc['_id'] for doc in IStream._mongometa.collection.find({}, {'_id': 1})}
+
+    def test_delete_with_parts(self):
+        version = ServiceSettings._mongometa.collection.find_one({'_id': self.service.pk}).get('content_version')
+        safe_delete_streams([self.stream])
+        self.assertEqual(self.stored_stream_ids(), {self.other.pk})
+        self.assertEqual(self.stored_entries('streams'), [(self.stream.pk, True), (self.other.pk, False)])
+        self.assertEqual(self.stored_entries('vods'), [])
+        self.assertEqual(self.stored_entries('catchups'), [(self.other.pk, False)])
+        doc = ServiceSettings._mongometa.collection.find_one({'_id': self.service.pk})
+        self.assertNotEqual(doc.get('content_version'), version)
+
+    def test_delete_by_ids(self):
+        safe_delete_streams([self.middle.pk, None])
+        self.assertEqual(self.stored_stream_ids(), {self.stream.pk, self.other.pk})
+        self.assertEqual(self.stored_entries('vods'), [])
+        self.assertEqual(len(self.stored_entries('streams')), 3)
+
+    def test_delete_nothing(self):
+        safe_delete_streams([])
+        safe_delete_stream(None)
+        self.assertEqual(len(self.stored_stream_ids()), 4)
+        self.assertEqual(len(self.stored_entries('streams')), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
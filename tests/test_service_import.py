@@ -0,0 +1,54 @@
+import io
+import unittest
+
+import pyfastocloud_models.constants as constants
+from pyfastocloud_models.service.entry import ServiceSettings
+from pyfastocloud_models.stream.entry import IStream
+from tests.mongo import mongomock, connect_test_database, drop_test_database
+
+PLAYLIST = '''#EXTM3U
+#EXTINF:-1 tvg-id="first" tvg-name="First" group-title="News",First
+http://origin/first/index.m3u8
+#EXTINF:-1 tvg-id="long" group-title="News",Long
+http://origin/{0}/index.m3u8
+#EXTINF:-1 tvg-id="second" group-title="Sport",Second
+http://origin/second/index.m3u8
+'''.format('x' * constants.MAX_URL_LENGTH)
+
+
+@unittest.skipIf(mongomock is None, 'mongomock is not installed')
+class ImportM3uTest(unittest.TestCase):
+    def setUp(self):
+        connect_test_database()
+        self.service = ServiceSettings()
+        self.service.save()
+
+    def tearDown(self):
+        drop_test_database()
+
+    def test_import(self):
+        invalid = []
+        self.assertEqual(self.service.import_m3u(io.StringIO(PLAYLIST), invalid=invalid), 2)
+        self.assertEqual([entry['tvg-id'] for entry, _ in invalid], ['long'])
+
+        stored = ServiceSettings.objects.get({'_id': self.service.pk})
+        self.assertEqual(stored.get_stream_ids(), self.service.get_stream_ids())
+        streams = [IStream.objects.get({'_id': sid}) for sid in stored.get_stream_ids()]
+        self.assertEqual([stream.tvg_id for stream in streams], ['first', 'second'])
+        self.assertEqual(IStream._mongometa.collection.count_documents({}), 2)
+        for stream in streams:
+            stream.save()  # stored streams pass validation
+
+    def test_other_services_untouched(self):
+        other = ServiceSettings()
+        self.service.import_m3u(io.StringIO(PLAYLIST))
+        self.assertEqual(other.streams, [])
+
+    def test_unsaved_service(self):
+        with self.assertRaises(ValueError):
+            ServiceSettings().import_m3u(io.StringIO(PLAYLIST))
+        self.assertEqual(IStream._mongometa.collection.count_documents({}), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+import pyfastocloud_models.constants as constants
+from pyfastocloud_models.stream.entry import CatchupStream, HardwareStream, IStream, RelayStream, \
+    get_stream_class_by_class_name, get_stream_type_by_class_name, make_stream_from_document, make_stream_types_query
+
+
+class StreamClassesTest(unittest.TestCase):
+    def test_module_classes_are_registered(self):
+        self.assertIs(get_stream_class_by_class_name(CatchupStream._mongometa.object_name), CatchupStream)
+        self.assertEqual(get_stream_type_by_class_name(RelayStream._mongometa.object_name),
+                         constants.StreamType.RELAY)
+        self.assertIsNone(get_stream_class_by_class_name(IStream._mongometa.object_name))
+        self.assertIsNone(get_stream_class_by_class_name(HardwareStream._mongometa.object_name))
+
+    def test_subclass_is_registered(self):
+        class ExtraRelayStream(RelayStream):
+            pass
+
+        name = ExtraRelayStream._mongometa.object_name
+        self.assertIs(get_stream_class_by_class_name(name), ExtraRelayStream)
+        self.assertIn(name, make_stream_types_query([constants.StreamType.RELAY])['_cls']['$in'])
+        self.assertIsInstance(make_stream_from_document({'_cls': name, 'name': 'extra'}), ExtraRelayStream)
+
+    def test_subclass_without_stream_type(self):
+        class CustomStream(RelayStream):
+            STREAM_TYPE = None
+
+            def get_type(self):
+                return constants.StreamType.RELAY
+
+        name = CustomStream._mongometa.object_name
+        self.assertIsNone(get_stream_class_by_class_name(name))
+        self.assertIsInstance(make_stream_from_document({'_cls': name, 'name': 'custom'}), CustomStream)
+
+    def test_unknown_class(self):
+        with self.assertRaises(ValueError):
+            make_stream_from_document({'_cls': 'unknown.Stream', 'name': 'unknown'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+
+from pyfastocloud_models.common_entries import OutputUrl
+from pyfastocloud_models.service.entry import ServiceSettings
+from pyfastocloud_models.stream.entry import ProxyStream
+from pyfastocloud_models.subscriber.entry import Device, Subscriber, UserStream
+from tests.mongo import mongomock, connect_test_database, drop_test_database
+
+
+@unittest.skipIf(mongomock is None, 'mongomock is not installed')
+class SubscriberUpdatesTest(unittest.TestCase):
+    def setUp(self):
+        connect_test_database()
+        self.streams = []
+        for pos in range(3):
+            stream = ProxyStream(name='stream{0}'.format(pos), group='group',
+                                 output=[OutputUrl(uri='http://origin/{0}/index.m3u8'.format(pos))])
+            stream.save()
+            self.streams.append(stream)
+        self.subscriber = Subscriber.make_subscriber('user@example.com', 'first', 'last', 'password', 'US', 'en')
+        self.subscriber.max_devices_count = 2
+        self.subscriber.save()
+
+    def tearDown(self):
+        drop_test_database()
+
+    def load(self) -> Subscriber:
+        return Subscriber.objects.get({'_id': self.subscriber.pk})
+
+    def assertStored(self, subscriber: Subscriber):
+        # the instance mirrors the stored document
+        doc = Subscriber._mongometa.collection.find_one({'_id': subscriber.pk})
+        self.assertEqual([(stream.get_stream_id(), stream.private) for stream in subscriber.streams],
+                         [(stream['sid'], stream.get('private', False)) for stream in doc.get('streams', [])])
+        self.assertEqual([device.id for device in subscriber.devices],
+                         [device['_id'] for device in doc.get('devices', [])])
+
+    def test_devices_limit(self):
+        stale = self.load()
+        self.assertTrue(self.subscriber.add_device(Device(name='first')))
+        self.assertTrue(self.subscriber.add_device(Device(name='second')))
+        self.assertFalse(self.subscriber.add_device(Device(name='third')))  # checked locally
+        self.assertStored(self.subscriber)
+
+        self.assertFalse(stale.add_device(Device(name='stale')))  # checked by the server
+        self.assertEqual(stale.devices, [])
+        self.assertStored(self.load())
+
+        self.subscriber.remove_device(self.subscriber.devices[0].id)
+        self.assertStored(self.subscriber)
+        self.assertTrue(self.subscriber.add_device(Device(name='third')))
+        self.assertStored(self.subscriber)
+
+    def test_duplicate_official_stream(self):
+        stale = self.load()
+        self.subscriber.add_official_stream_by_id(self.streams[0].pk)
+        self.subscriber.add_official_stream_by_id(self.streams[0].pk)
+        self.assertStored(self.subscriber)
+        self.assertEqual(len(self.subscriber.streams), 1)
+
+        stale.add_official_stream_by_id(self.streams[0].pk)  # the stored document already has it
+        self.assertEqual(stale.streams, [])
+        self.assertStored(self.load())
+
+    def test_official_and_private_entries(self):
+        stream = self.streams[1]
+        self.subscriber.add_official_stream_by_id(stream.pk)
+        self.subscriber.add_own_stream(UserStream(sid=stream.pk))
+        self.subscriber.add_official_stream_by_id(self.streams[2].pk)
+        self.assertStored(self.subscriber)
+        self.assertEqual(len(self.subscriber.streams), 3)
+
+        self.subscriber.remove_official_stream(stream)
+        self.assertStored(self.subscriber)
+        self.assertEqual([(us.get_stream_id(), us.private) for us in self.subscriber.streams],
+                         [(stream.pk, True), (self.streams[2].pk, False)])
+
+        self.subscriber.remove_official_stream(stream)  # no-op
+        self.assertStored(self.subscriber)
+        self.assertEqual(len(self.subscriber.streams), 2)
+
+    def test_select_all(self):
+        server = ServiceSettings()
+        server.streams = self.streams
+        server.save()
+        self.subscriber.add_server(server)
+        self.subscriber.add_server(server)
+        self.subscriber.add_official_stream_by_id(self.streams[1].pk)
+        self.subscriber.streams[0].favorite = True
+
+        self.subscriber.select_all_streams(True)
+        self.assertStored(self.subscriber)
+        self.assertEqual([us.get_stream_id() for us in self.subscriber.streams], [s.pk for s in self.streams])
+        self.assertTrue(self.subscriber.streams[1].favorite)  # existing entry kept
+        self.assertEqual(len(self.load().servers), 1)
+
+        self.subscriber.select_all_streams(False)
+        self.assertStored(self.subscriber)
+        self.assertEqual(self.subscriber.streams, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import time
+import unittest
+from unittest import mock
+
+from pyfastocloud_models.common_entries import InputUrl, OutputUrl
+from pyfastocloud_models.service.entry import ServiceSettings
+from pyfastocloud_models.stream.entry import IStream, ProxyStream, RelayStream
+from pyfastocloud_models.utils.url_checker import UrlChecker, RateLimiter, check_urls
+from tests.http_server import LocalHttpServer
+from tests.mongo import mongomock, connect_test_database, drop_test_database
+
+
+class UrlCheckerTest(unittest.TestCase):
+    def setUp(self):
+        self.server = LocalHttpServer().__enter__()
+        self.server.set_file('/live/index.m3u8', b'#EXTM3U\n')
+        self.server.statuses['/down/index.m3u8'] = 503
+        self.server.redirects['/moved/index.m3u8'] = self.server.url('/live/index.m3u8')
+        self.checker = UrlChecker(workers=8, per_host_limit=2, timeout=2)
+
+    def tearDown(self):
+        self.checker.close()
+        self.server.__exit__(None, None, None)
+
+    def test_check(self):
+        result = self.checker.check(self.server.url('/live/index.m3u8'))
+        self.assertTrue(result.is_valid())
+        self.assertIsNone(result.redirect)
+        self.assertGreaterEqual(result.latency, 0)
+        self.assertEqual(self.server.requests[-1][0], 'HEAD')
+
+        self.assertEqual(self.checker.check(self.server.url('/missing.m3u8')).status, 404)
+        self.assertEqual(self.checker.check(self.server.url('/down/index.m3u8')).status, 503)
+
+    def test_redirect(self):
+        result = self.checker.check(self.server.url('/moved/index.m3u8'))
+        self.assertTrue(result.is_valid())
+        self.assertEqual(result.redirect, self.server.url('/live/index.m3u8'))
+
+        with UrlChecker(allow_redirects=False) as checker:
+            result = checker.check(self.server.url('/moved/index.m3u8'))
+        self.assertEqual(result.status, 302)
+        self.assertEqual(result.redirect, self.server.url('/live/index.m3u8'))
+
+    def test_connection_error(self):
+        result = self.checker.check('http://127.0.0.1:1/index.m3u8')
+        self.assertFalse(result.is_valid())
+        self.assertIsNone(result.status)
+        self.assertTrue(result.error)
+
+    def test_check_urls(self):
+        urls = [self.server.url('/live/index.m3u8'), self.server.url('/missing.m3u8'),
+                self.server.url('/live/index.m3u8')] * 10
+        results = self.checker.check_urls(urls)
+        self.assertEqual([result.url for result in results], urls)
+        self.assertEqual([result.status for result in results[:3]], [200, 404, 200])
+        self.assertEqual(len(self.server.requests), 2)
+
+        self.assertEqual([result.status for result in check_urls(urls[:2])], [200, 404])
+
+    def test_rate_limit(self):
+        limiter = RateLimiter(20)
+        start = time.monotonic()
+        for _ in range(11):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.45)
+
+
+@unittest.skipIf(mongomock is None, 'mongomock is not installed')
+class UrlCheckerServiceTest(unittest.TestCase):
+    def setUp(self):
+        connect_test_database()
+        self.server = LocalHttpServer().__enter__()
+        self.server.set_file('/1/index.m3u8', b'#EXTM3U\n')
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+        drop_test_database()
+
+    def test_check_service(self):
+        relays = []
+        for pos in range(5):
+            relay = RelayStream(name='relay{0}'.format(pos), group='group',
+                                input=[InputUrl(uri=self.server.url('/1/index.m3u8')),
+                                       InputUrl(uri=self.server.url('/2/index.m3u8'))])
+            relay.save()
+            relays.append(relay)
+        proxy = ProxyStream(name='proxy', group='group', output=[OutputUrl(uri=self.server.url('/1/index.m3u8'))])
+        proxy.save()
+        service = ServiceSettings()
+        service.add_streams(relays + [proxy])
+        service = ServiceSettings.objects.get({'_id': service.pk})
+
+        collection = IStream._mongometa.collection
+        with mock.patch.object(collection, 'find', wraps=collection.find) as find, UrlChecker() as checker:
+            inputs = checker.check_service(service)
+            outputs = checker.check_service(service, 'output')
+
+        self.assertEqual(find.call_count, 2)  # one query per call, not per stream
+        self.assertEqual(list(inputs), [relay.pk for relay in relays] + [proxy.pk])
+        for relay in relays:
+            self.assertEqual([result.status for result in inputs[relay.pk]], [200, 404])
+        self.assertEqual(inputs[proxy.pk], [])
+        self.assertEqual([result.status for result in outputs[proxy.pk]], [200])
+
+
+if __name__ == '__main__':
+    unittest.main()